@@ -1,17 +1,43 @@
-from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, session
+from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, session, g, make_response
 from flask_cors import CORS
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from flask_bcrypt import Bcrypt
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from io import BytesIO
-from datetime import datetime
+from werkzeug.datastructures import MultiDict
+from io import BytesIO, StringIO
+from datetime import datetime, date, timedelta
+from contextlib import contextmanager
+from functools import wraps
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+import base64
+import click
+import csv
+import gzip
+import hashlib
 import sqlite3
 import json
+import math
+import mimetypes
+import multiprocessing
 import os
+import queue
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+
+import cost_engine
+from report_renderer import render_report_pdf, render_report_in_process
+from sales_rebuild import rebuild_slice
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; assets are then precompressed with gzip only
+    brotli = None
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
@@ -20,21 +46,380 @@ bcrypt = Bcrypt(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 
-# Disable caching for static files to prevent outdated JavaScript/CSS
+# Pages and API responses must not be cached, except that responses with an
+# ETag may be kept if they are revalidated on every use. Fingerprinted assets
+# set their own long-lived headers.
 @app.after_request
 def add_header(response):
-    response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, post-check=0, pre-check=0, max-age=0'
+    if request.endpoint == 'asset':
+        return response
+    if response.get_etag()[0]:
+        response.headers['Cache-Control'] = 'private, no-cache'
+    else:
+        response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, post-check=0, pre-check=0, max-age=0'
     response.headers['Pragma'] = 'no-cache'
     response.headers['Expires'] = '-1'
     return response
 
+# Fingerprinted static assets. Every file in static/ is content-hashed at
+# startup and served as /assets/<name>.<hash>.<ext>, which never changes, so
+# browsers keep it for a year and only download what a deploy changed.
+# Text assets are compressed once here instead of on every request.
+app.config['ASSET_MAX_AGE'] = int(os.environ.get('ASSET_MAX_AGE', 365 * 24 * 3600))
+ASSET_COMPRESSIBLE = ('.js', '.css', '.svg', '.json', '.html', '.txt', '.map')
+
+class AssetManifest:
+    """Hashed names of the static files with their precompressed variants"""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._names = {}   # {name: hashed name}
+        self._assets = {}  # {hashed name: (path, digest, {encoding: bytes})}
+        self.build()
+
+    def build(self):
+        names = {}
+        assets = {}
+        for root, _, files in os.walk(self.folder):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                name = os.path.relpath(path, self.folder).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    content = f.read()
+                digest = hashlib.sha256(content).hexdigest()[:16]
+                stem, extension = os.path.splitext(name)
+                hashed = f'{stem}.{digest}{extension}'
+
+                variants = {}
+                if extension in ASSET_COMPRESSIBLE:
+                    if brotli is not None:
+                        variants['br'] = brotli.compress(content, quality=11)
+                    variants['gzip'] = gzip.compress(content, compresslevel=9, mtime=0)
+                    variants = {encoding: data for encoding, data in variants.items() if len(data) < len(content)}
+
+                names[name] = hashed
+                assets[hashed] = (path, digest, variants)
+        self._names, self._assets = names, assets
+
+    def url(self, name):
+        """URL of a static file under its hashed name (its plain /static URL if unknown)"""
+        if app.debug:
+            self.build()
+        hashed = self._names.get(name)
+        if hashed is None:
+            return url_for('static', filename=name)
+        return url_for('asset', filename=hashed)
+
+    def get(self, hashed):
+        return self._assets.get(hashed)
+
+    def stats(self):
+        assets = list(self._assets.values())
+        return {
+            'files': len(assets),
+            'bytes': sum(os.path.getsize(path) for path, _, _ in assets),
+            'gzip_bytes': sum(len(variants.get('gzip', b'')) for _, _, variants in assets),
+            'br_bytes': sum(len(variants.get('br', b'')) for _, _, variants in assets),
+            'brotli_available': brotli is not None
+        }
+
+asset_manifest = AssetManifest(app.static_folder)
+app.jinja_env.globals['asset_url'] = asset_manifest.url
+
+@app.route('/assets/<path:filename>')
+def asset(filename):
+    """Serve a fingerprinted static file, precompressed when the client accepts it"""
+    entry = asset_manifest.get(filename)
+    if entry is None:
+        return 'Not found', 404
+    path, digest, variants = entry
+
+    # Brotli first (smaller), then gzip, then the file as it is
+    encoding = next((encoding for encoding in ('br', 'gzip')
+                     if encoding in variants and request.accept_encodings[encoding]), None)
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if encoding:
+        response = app.response_class(variants[encoding], mimetype=mimetype)
+        response.headers['Content-Encoding'] = encoding
+        response.set_etag(f'{digest}-{encoding}')
+        response.make_conditional(request)
+    else:
+        response = send_file(path, mimetype=mimetype, etag=digest, max_age=app.config['ASSET_MAX_AGE'])
+
+    response.vary.add('Accept-Encoding')
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config['ASSET_MAX_AGE']
+    response.cache_control.immutable = True
+    return response
+
+# Response compression. JSON, NDJSON and CSV API responses are sent gzip or
+# brotli encoded when the client accepts it: buffered bodies above a size
+# threshold are compressed whole, streamed ones chunk by chunk as they are
+# produced.
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', 6))
+app.config['COMPRESS_BROTLI_QUALITY'] = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5))
+COMPRESS_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/csv', 'text/plain')
+
+class ResponseCompressor:
+    """Per-worker gzip/brotli encoder counting bytes before and after compression"""
+
+    def __init__(self, config):
+        self.config = config
+        self._lock = threading.Lock()
+        self._stats = {
+            'compressed': 0,
+            'streamed': 0,
+            'below_threshold': 0,
+            'not_accepted': 0,
+            'bytes_in': 0,
+            'bytes_out': 0,
+            'gzip': 0,
+            'br': 0
+        }
+
+    def encoding(self, accept_encodings):
+        """Brotli if it is installed and accepted, else gzip if accepted, else None"""
+        if brotli is not None and accept_encodings['br']:
+            return 'br'
+        if accept_encodings['gzip']:
+            return 'gzip'
+        self._count('not_accepted')
+        return None
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            compressed = brotli.compress(data, quality=self.config['COMPRESS_BROTLI_QUALITY'])
+        else:
+            compressed = gzip.compress(data, compresslevel=self.config['COMPRESS_LEVEL'], mtime=0)
+        self._record(encoding, len(data), len(compressed), streamed=False)
+        return compressed
+
+    def stream(self, chunks, encoding):
+        """Compress an iterable of chunks, flushing after each so rows reach the client as they are produced"""
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.config['COMPRESS_BROTLI_QUALITY'])
+            compress, flush, finish = compressor.process, compressor.flush, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.config['COMPRESS_LEVEL'], zlib.DEFLATED, 31)
+            compress, flush, finish = compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+        bytes_in = 0
+        bytes_out = 0
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                if not chunk:
+                    continue
+                bytes_in += len(chunk)
+                data = compress(chunk) + flush()
+                bytes_out += len(data)
+                yield data
+            data = finish()
+            bytes_out += len(data)
+            yield data
+        finally:
+            # Closing the original iterable releases what it holds (e.g. an export's connection)
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            self._record(encoding, bytes_in, bytes_out, streamed=True)
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _record(self, encoding, bytes_in, bytes_out, streamed):
+        with self._lock:
+            self._stats['streamed' if streamed else 'compressed'] += 1
+            self._stats[encoding] += 1
+            self._stats['bytes_in'] += bytes_in
+            self._stats['bytes_out'] += bytes_out
+
+    def below_threshold(self):
+        self._count('below_threshold')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['ratio'] = round(stats['bytes_out'] / stats['bytes_in'], 4) if stats['bytes_in'] else 0
+        stats['saved_bytes'] = stats['bytes_in'] - stats['bytes_out']
+        stats['brotli_available'] = brotli is not None
+        stats['min_size'] = self.config['COMPRESS_MIN_SIZE']
+        return stats
+
+response_compressor = ResponseCompressor(app.config)
+
+@app.after_request
+def compress_response(response):
+    """Encode API responses with gzip or brotli when the client accepts it"""
+    if (not request.path.startswith('/api/') or response.status_code != 200
+            or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if not response.is_streamed and response.content_length is not None \
+            and response.content_length < app.config['COMPRESS_MIN_SIZE']:
+        response_compressor.below_threshold()
+        return response
+    encoding = response_compressor.encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = response_compressor.stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        response.set_data(response_compressor.compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+
+    # A strong ETag names exact bytes, which differ per encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
 # Database configuration
-DATABASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DATABASE_DIR = os.environ.get('DATABASE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
 DATABASE_PATH = os.path.join(DATABASE_DIR, 'coffee_calculator.db')
 
 # Ensure data directory exists
 os.makedirs(DATABASE_DIR, exist_ok=True)
 
+# SQLite connection tuning (can be overridden through environment variables)
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 8))
+app.config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+app.config['SQLITE_CACHE_SIZE_KB'] = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 16384))
+app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 64 * 1024 * 1024))
+
+class ConnectionPool:
+    """Per-worker pool of SQLite connections opened once in WAL mode"""
+
+    def __init__(self, database_path, config):
+        self.database_path = database_path
+        self.config = config
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Connections must never be shared across a fork, so every worker
+        # process starts with its own empty pool
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total_ms': 0.0,
+            'wait_time_max_ms': 0.0,
+            'connections_opened': 0,
+            'connections_discarded': 0
+        }
+
+    def _open(self):
+        busy_timeout_ms = self.config['SQLITE_BUSY_TIMEOUT_MS']
+        conn = sqlite3.connect(self.database_path, timeout=busy_timeout_ms / 1000,
+                               check_same_thread=False)
+        conn.execute(f'PRAGMA busy_timeout = {busy_timeout_ms}')
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f"PRAGMA cache_size = -{self.config['SQLITE_CACHE_SIZE_KB']}")
+        conn.execute(f"PRAGMA mmap_size = {self.config['SQLITE_MMAP_SIZE']}")
+        return conn
+
+    def checkout(self):
+        """Take an idle connection, opening or waiting for one if none is free"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+        start = time.perf_counter()
+        waited = False
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._opened < self.config['DB_POOL_SIZE']
+                if can_open:
+                    self._opened += 1
+
+            if can_open:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+                with self._lock:
+                    self._stats['connections_opened'] += 1
+            else:
+                waited = True
+                try:
+                    conn = self._idle.get(timeout=self.config['DB_POOL_TIMEOUT'])
+                except queue.Empty:
+                    raise RuntimeError('Timed out waiting for a database connection')
+
+        wait_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._stats['wait_time_total_ms'] += wait_ms
+            self._stats['wait_time_max_ms'] = max(self._stats['wait_time_max_ms'], wait_ms)
+            if waited:
+                self._stats['waits'] += 1
+        return conn
+
+    def checkin(self, conn):
+        """Return a connection to the pool, discarding it if it is unusable"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+                self._stats['connections_discarded'] += 1
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.checkout()
+        try:
+            yield conn
+        finally:
+            self.checkin(conn)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open_connections'] = self._opened
+        stats['idle_connections'] = self._idle.qsize()
+        stats['max_size'] = self.config['DB_POOL_SIZE']
+        checkouts = stats['checkouts']
+        stats['wait_time_avg_ms'] = round(stats['wait_time_total_ms'] / checkouts, 3) if checkouts else 0
+        stats['wait_time_total_ms'] = round(stats['wait_time_total_ms'], 3)
+        stats['wait_time_max_ms'] = round(stats['wait_time_max_ms'], 3)
+        return stats
+
+db_pool = ConnectionPool(DATABASE_PATH, app.config)
+
+def get_db():
+    """Get the pooled connection for the current request"""
+    if 'db' not in g:
+        g.db = db_pool.checkout()
+    return g.db
+
+@app.teardown_appcontext
+def release_db(exception):
+    """Hand the request's connection back to the pool, rolling back uncommitted work"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        db_pool.checkin(conn)
+
 # User class for Flask-Login
 class User(UserMixin):
     def __init__(self, id, email, name):
@@ -42,21 +427,1007 @@ class User(UserMixin):
         self.email = email
         self.name = name
 
+app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 1024))
+app.config['USER_CACHE_TTL'] = float(os.environ.get('USER_CACHE_TTL', 300))
+
+class UserCache:
+    """In-process LRU cache of User objects with a time-to-live
+
+    Each worker has its own cache, so the TTL bounds how long another worker
+    can keep serving a user record after it was changed.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # {user_id: (expires_at, user)}
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] <= now:
+                del self._entries[user_id]
+                self._stats['expired'] += 1
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def put(self, user):
+        user_id = int(user.id)
+        expires_at = time.monotonic() + self.config['USER_CACHE_TTL']
+        with self._lock:
+            self._entries[user_id] = (expires_at, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.config['USER_CACHE_SIZE']:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(int(user_id), None)
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0
+        stats['max_size'] = self.config['USER_CACHE_SIZE']
+        stats['ttl_seconds'] = self.config['USER_CACHE_TTL']
+        return stats
+
+user_cache = UserCache(app.config)
+
+def invalidate_user(user_id):
+    """Drop a cached user; call after any change to the user's row"""
+    user_cache.invalidate(user_id)
+
 @login_manager.user_loader
 def load_user(user_id):
-    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    
+    conn = get_db()
     cursor = conn.cursor()
     cursor.execute('SELECT id, email, name FROM users WHERE id = ?', (user_id,))
     user_data = cursor.fetchone()
-    conn.close()
     
     if user_data:
-        return User(user_data[0], user_data[1], user_data[2])
+        user = User(user_data[0], user_data[1], user_data[2])
+        user_cache.put(user)
+        return user
     return None
 
+def _reading_scope(config_id, user_id):
+    """SQL filter selecting the readings that share a running revenue total"""
+    if config_id:
+        return 'config_id = ?', (config_id,)
+    return 'user_id = ? AND config_id IS NULL', (user_id,)
+
+def rebuild_reading_revenue(cursor):
+    """Recompute the whole reading_revenue rollup from sales_records
+
+    Running totals follow the readings' (reading_date, id) order, the order
+    sales intervals and the cash ledger's first/latest readings use.
+    """
+    cursor.execute('DELETE FROM reading_revenue')
+    cursor.execute('''
+        INSERT INTO reading_revenue (reading_id, user_id, config_id, revenue, item_count, cumulative_revenue)
+        SELECT 
+            cr.id,
+            cr.user_id,
+            cr.config_id,
+            COALESCE(s.revenue, 0),
+            COALESCE(s.item_count, 0),
+            SUM(COALESCE(s.revenue, 0)) OVER (
+                PARTITION BY cr.config_id, CASE WHEN cr.config_id IS NULL THEN cr.user_id END
+                ORDER BY cr.reading_date, cr.id
+            )
+        FROM counter_readings cr
+        LEFT JOIN (
+            SELECT end_reading_id, SUM(total_revenue) AS revenue, SUM(quantity_sold) AS item_count
+            FROM sales_records
+            GROUP BY end_reading_id
+        ) s ON s.end_reading_id = cr.id
+    ''')
+    return cursor.rowcount
+
+def _previous_cumulative_revenue(cursor, scope, scope_params, reading_date, reading_id):
+    """Running total at the reading just before (reading_date, reading_id) in a scope"""
+    cursor.execute(f'''
+        SELECT cumulative_revenue
+        FROM reading_revenue
+        WHERE reading_id = (
+            SELECT id FROM counter_readings
+            WHERE {scope} AND (reading_date, id) < (?, ?)
+            ORDER BY reading_date DESC, id DESC
+            LIMIT 1
+        )
+    ''', scope_params + (reading_date, reading_id))
+    previous = cursor.fetchone()
+    return previous[0] if previous else 0
+
+def update_reading_revenue(cursor, user_id, config_id, reading_ids):
+    """Refresh rollup rows for readings whose sales changed (or that were deleted)
+
+    Must run in the same transaction as the change. Running totals are
+    recomputed from the earliest changed reading on, in (reading_date, id)
+    order; a deleted reading must be passed with the reading that followed it.
+    """
+    scope, scope_params = _reading_scope(config_id, user_id)
+    
+    first = None
+    for reading_id in sorted(set(reading_ids)):
+        cursor.execute('SELECT user_id, config_id, reading_date FROM counter_readings WHERE id = ?', (reading_id,))
+        reading = cursor.fetchone()
+        if not reading:
+            cursor.execute('DELETE FROM reading_revenue WHERE reading_id = ?', (reading_id,))
+            continue
+        
+        cursor.execute('''
+            SELECT COALESCE(SUM(total_revenue), 0), COALESCE(SUM(quantity_sold), 0)
+            FROM sales_records
+            WHERE end_reading_id = ?
+        ''', (reading_id,))
+        revenue, item_count = cursor.fetchone()
+        
+        # The running total is filled in below
+        cursor.execute('''
+            INSERT OR REPLACE INTO reading_revenue 
+            (reading_id, user_id, config_id, revenue, item_count, cumulative_revenue)
+            VALUES (?, ?, ?, ?, ?, 0)
+        ''', (reading_id, reading[0], reading[1], revenue, item_count))
+        if first is None or (reading[2], reading_id) < first:
+            first = (reading[2], reading_id)
+    
+    if first is None:
+        return
+    cursor.execute(f'''
+        UPDATE reading_revenue
+        SET cumulative_revenue = running.total
+        FROM (
+            SELECT r.id, ? + SUM(COALESCE(rr.revenue, 0)) OVER (ORDER BY r.reading_date, r.id) AS total
+            FROM (
+                SELECT id, reading_date FROM counter_readings
+                WHERE {scope} AND (reading_date, id) >= (?, ?)
+            ) r
+            LEFT JOIN reading_revenue rr ON rr.reading_id = r.id
+        ) running
+        WHERE reading_revenue.reading_id = running.id
+    ''', (_previous_cumulative_revenue(cursor, scope, scope_params, *first),) + scope_params + first)
+
+def append_reading_revenue(cursor, user_id, config_id, first_reading_id):
+    """Add rollup rows for a run of new readings that are the newest in their scope
+
+    Used by bulk imports: one windowed insert instead of update_reading_revenue's
+    per-reading work. Running totals are (re)written from the earliest new
+    reading on in (reading_date, id) order. Must run in the same transaction
+    as the inserts.
+    """
+    scope, scope_params = _reading_scope(config_id, user_id)
+    cursor.execute(f'''
+        SELECT reading_date, id
+        FROM counter_readings
+        WHERE {scope} AND id >= ?
+        ORDER BY reading_date, id
+        LIMIT 1
+    ''', scope_params + (first_reading_id,))
+    first = cursor.fetchone()
+    if not first:
+        return
+
+    cursor.execute(f'''
+        INSERT OR REPLACE INTO reading_revenue (reading_id, user_id, config_id, revenue, item_count, cumulative_revenue)
+        SELECT id, user_id, config_id, revenue, item_count,
+               ? + SUM(revenue) OVER (ORDER BY reading_date, id)
+        FROM (
+            SELECT
+                cr.id,
+                cr.user_id,
+                cr.config_id,
+                cr.reading_date,
+                (SELECT COALESCE(SUM(total_revenue), 0) FROM sales_records WHERE end_reading_id = cr.id) AS revenue,
+                (SELECT COALESCE(SUM(quantity_sold), 0) FROM sales_records WHERE end_reading_id = cr.id) AS item_count
+            FROM counter_readings cr
+            WHERE {scope} AND (cr.reading_date, cr.id) >= (?, ?)
+        )
+    ''', (_previous_cumulative_revenue(cursor, scope, scope_params, *first),) + scope_params + tuple(first))
+
+def rebuild_sales_daily(cursor):
+    """Recompute the whole sales_daily aggregate from sales_records"""
+    cursor.execute('DELETE FROM sales_daily')
+    cursor.execute('''
+        INSERT INTO sales_daily 
+        (user_id, config_id, sale_date, product_name, quantity, revenue, record_count, unit_price_sum)
+        SELECT 
+            user_id,
+            COALESCE(config_id, 0),
+            DATE(created_at),
+            product_name,
+            SUM(quantity_sold),
+            SUM(total_revenue),
+            COUNT(*),
+            SUM(unit_price)
+        FROM sales_records
+        GROUP BY user_id, COALESCE(config_id, 0), DATE(created_at), product_name
+    ''')
+    return cursor.rowcount
+
+def update_sales_daily(cursor, where, params, sign=1):
+    """Add (sign=1) or subtract (sign=-1) the sales_records matching `where`
+
+    Call after inserting sales records and before deleting them, in the same
+    transaction, so the daily aggregate always matches sales_records.
+    """
+    cursor.execute(f'''
+        INSERT INTO sales_daily 
+        (user_id, config_id, sale_date, product_name, quantity, revenue, record_count, unit_price_sum)
+        SELECT 
+            user_id,
+            COALESCE(config_id, 0),
+            DATE(created_at),
+            product_name,
+            ? * SUM(quantity_sold),
+            ? * SUM(total_revenue),
+            ? * COUNT(*),
+            ? * SUM(unit_price)
+        FROM sales_records
+        WHERE {where}
+        GROUP BY user_id, COALESCE(config_id, 0), DATE(created_at), product_name
+        ON CONFLICT (user_id, config_id, sale_date, product_name) DO UPDATE SET
+            quantity = quantity + excluded.quantity,
+            revenue = revenue + excluded.revenue,
+            record_count = record_count + excluded.record_count,
+            unit_price_sum = unit_price_sum + excluded.unit_price_sum
+    ''', (sign, sign, sign, sign) + tuple(params))
+    if sign < 0:
+        cursor.execute('DELETE FROM sales_daily WHERE record_count <= 0')
+
+def _ledger_key(user_id, config_id):
+    """Primary key of the cash ledger row covering a config (or a user's unassigned readings)"""
+    if config_id:
+        return (config_id, 0)
+    return (0, user_id)
+
+def _cash_ledger_pointers(cursor, user_id, config_id):
+    """First/latest reading of a scope and the running sales total at the latest one"""
+    scope, scope_params = _reading_scope(config_id, user_id)
+    
+    cursor.execute(f'''
+        SELECT id, reading_date, cash_in_register
+        FROM counter_readings
+        WHERE {scope}
+        ORDER BY reading_date DESC, id DESC
+        LIMIT 1
+    ''', scope_params)
+    latest = cursor.fetchone()
+    
+    cursor.execute(f'''
+        SELECT id, cash_in_register
+        FROM counter_readings
+        WHERE {scope}
+        ORDER BY reading_date ASC, id ASC
+        LIMIT 1
+    ''', scope_params)
+    first = cursor.fetchone()
+    
+    total_sales = 0
+    if latest:
+        cursor.execute('SELECT cumulative_revenue FROM reading_revenue WHERE reading_id = ?', (latest[0],))
+        rollup = cursor.fetchone()
+        total_sales = rollup[0] if rollup else 0
+    
+    return {
+        'first_reading_id': first[0] if first else None,
+        'starting_cash': first[1] if first else 0,
+        'latest_reading_id': latest[0] if latest else None,
+        'latest_reading_date': latest[1] if latest else None,
+        'actual_cash': latest[2] if latest else 0,
+        'total_sales': total_sales
+    }
+
+def compute_cash_ledger(cursor, user_id, config_id):
+    """Derive a scope's ledger values from scratch (used for rebuilds and drift checks)"""
+    scope, scope_params = _reading_scope(config_id, user_id)
+    ledger = _cash_ledger_pointers(cursor, user_id, config_id)
+    
+    cursor.execute(f'''
+        SELECT 
+            COALESCE(SUM(CASE WHEN event_type = 'withdrawal' THEN amount ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN event_type = 'deposit' THEN amount ELSE 0 END), 0)
+        FROM cash_register_events
+        WHERE {scope}
+    ''', scope_params)
+    ledger['total_withdrawals'], ledger['total_deposits'] = cursor.fetchone()
+    return ledger
+
+def _write_cash_ledger(cursor, user_id, config_id, ledger):
+    key = _ledger_key(user_id, config_id)
+    cursor.execute('''
+        INSERT OR REPLACE INTO cash_ledger 
+        (config_id, user_id, first_reading_id, starting_cash, latest_reading_id, latest_reading_date,
+         actual_cash, total_sales, total_withdrawals, total_deposits, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ''', key + (ledger['first_reading_id'], ledger['starting_cash'], ledger['latest_reading_id'],
+                 ledger['latest_reading_date'], ledger['actual_cash'], ledger['total_sales'],
+                 ledger['total_withdrawals'], ledger['total_deposits']))
+
+def _cash_ledger_scopes(cursor):
+    """All (user_id, config_id) scopes that have readings or cash events"""
+    cursor.execute('''
+        SELECT DISTINCT NULL, config_id FROM counter_readings WHERE config_id IS NOT NULL
+        UNION
+        SELECT DISTINCT NULL, config_id FROM cash_register_events WHERE config_id IS NOT NULL
+        UNION
+        SELECT DISTINCT user_id, NULL FROM counter_readings WHERE config_id IS NULL
+        UNION
+        SELECT DISTINCT user_id, NULL FROM cash_register_events WHERE config_id IS NULL
+    ''')
+    return cursor.fetchall()
+
+def rebuild_cash_ledger(cursor):
+    """Recompute every cash ledger row from readings, rollups and events"""
+    cursor.execute('DELETE FROM cash_ledger')
+    scopes = _cash_ledger_scopes(cursor)
+    for user_id, config_id in scopes:
+        _write_cash_ledger(cursor, user_id, config_id, compute_cash_ledger(cursor, user_id, config_id))
+    return len(scopes)
+
+def get_cash_ledger(cursor, user_id, config_id):
+    """Read a scope's ledger row as a dict (None if the scope has no history)"""
+    cursor.execute('''
+        SELECT first_reading_id, starting_cash, latest_reading_id, latest_reading_date,
+               actual_cash, total_sales, total_withdrawals, total_deposits
+        FROM cash_ledger
+        WHERE config_id = ? AND user_id = ?
+    ''', _ledger_key(user_id, config_id))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return dict(zip(('first_reading_id', 'starting_cash', 'latest_reading_id', 'latest_reading_date',
+                     'actual_cash', 'total_sales', 'total_withdrawals', 'total_deposits'), row))
+
+def update_cash_ledger(cursor, user_id, config_id, withdrawals=0, deposits=0):
+    """Re-point a scope's ledger at its first/latest readings and apply event deltas
+
+    Must run in the same transaction as the write, after the revenue rollup
+    has been updated. Reading pointers are found through the date indexes;
+    withdrawal and deposit totals are only adjusted by the given deltas.
+    """
+    ledger = get_cash_ledger(cursor, user_id, config_id)
+    if ledger is None:
+        _write_cash_ledger(cursor, user_id, config_id, compute_cash_ledger(cursor, user_id, config_id))
+        return
+    
+    withdrawals += ledger['total_withdrawals']
+    deposits += ledger['total_deposits']
+    ledger = _cash_ledger_pointers(cursor, user_id, config_id)
+    ledger['total_withdrawals'] = withdrawals
+    ledger['total_deposits'] = deposits
+    _write_cash_ledger(cursor, user_id, config_id, ledger)
+
+def bump_data_version(cursor, user_id):
+    """Mark a user's data as changed; call in the same transaction as the write
+
+    Covers the user's own readings, sales and cash events (and those measured
+    into their readings by others), their configuration list and tea bags.
+    """
+    cursor.execute('''
+        INSERT INTO data_versions (user_id, version, updated_at)
+        VALUES (?, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (user_id) DO UPDATE SET
+            version = version + 1,
+            updated_at = CURRENT_TIMESTAMP
+    ''', (user_id,))
+
+def get_data_version(cursor, user_id):
+    """Version of a user's data (0 if never written)"""
+    cursor.execute('SELECT version FROM data_versions WHERE user_id = ?', (user_id,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def bump_config_version(cursor, config_id):
+    """Mark a configuration's settings, sharing or sales data as changed (no-op without a config)"""
+    if not config_id:
+        return
+    cursor.execute('''
+        INSERT INTO config_versions (config_id, version, updated_at)
+        VALUES (?, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (config_id) DO UPDATE SET
+            version = version + 1,
+            updated_at = CURRENT_TIMESTAMP
+    ''', (config_id,))
+
+def bump_config_audience(cursor, config_id):
+    """Bump the data version of the owner and everyone a configuration is shared with
+
+    Their configuration lists show its name and update time, so every
+    settings or sharing change must call this before the config row is gone.
+    """
+    cursor.execute('''
+        INSERT INTO data_versions (user_id, version, updated_at)
+        SELECT user_id, 1, CURRENT_TIMESTAMP FROM configurations WHERE id = ?
+        UNION
+        SELECT shared_with_user_id, 1, CURRENT_TIMESTAMP FROM shared_configs WHERE config_id = ?
+        ON CONFLICT (user_id) DO UPDATE SET
+            version = version + 1,
+            updated_at = CURRENT_TIMESTAMP
+    ''', (config_id, config_id))
+
+def get_config_version(cursor, config_id):
+    """Version of a configuration's data (0 if never written)"""
+    cursor.execute('SELECT version FROM config_versions WHERE config_id = ?', (config_id,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def bump_all_data_versions(cursor):
+    """Invalidate every cached read, after a maintenance command rewrote data in bulk"""
+    for table, key, source in (('data_versions', 'user_id', 'users'),
+                               ('config_versions', 'config_id', 'configurations')):
+        cursor.execute(f'''
+            INSERT INTO {table} ({key}, version, updated_at)
+            SELECT id, 1, CURRENT_TIMESTAMP FROM {source} WHERE true
+            ON CONFLICT ({key}) DO UPDATE SET
+                version = version + 1,
+                updated_at = CURRENT_TIMESTAMP
+        ''')
+    # Open pages reload instead of patching their views
+    cursor.execute('''
+        INSERT INTO config_changes (config_id, kind, payload)
+        SELECT id, 'reset', '{}' FROM configurations
+    ''')
+
+def record_config_change(cursor, config_id, kind, data):
+    """Log a change to a configuration for its live update streams (no-op without a config)
+
+    Call in the same transaction as the write, so the change is published
+    exactly when it commits.
+    """
+    if not config_id:
+        return
+    cursor.execute('''
+        INSERT INTO config_changes (config_id, kind, payload)
+        VALUES (?, ?, ?)
+    ''', (config_id, kind, json.dumps(data, separators=(',', ':'))))
+
+def record_balance_change(cursor, user_id, config_id):
+    """Log a configuration's cash balance after the cash ledger was updated"""
+    if config_id:
+        record_config_change(cursor, config_id, 'balance', cash_register_balance(cursor, user_id, config_id))
+
+# Conditional GETs. Read endpoints send a weak ETag built from the data
+# versions their response depends on, so revalidating an unchanged view is a
+# primary key lookup instead of the endpoint's queries.
+API_FORMAT_VERSION = 1  # bump when the response of a versioned endpoint changes
+
+def data_etag(cursor, user_id, config_id=None, daily=False):
+    """ETag value for a read of a configuration's data, or of the user's own without one"""
+    if config_id:
+        version = f'c{config_id}.{get_config_version(cursor, config_id)}'
+    else:
+        version = f'u.{get_data_version(cursor, user_id)}'
+    etag = f'{API_FORMAT_VERSION}-{user_id}-{version}'
+    if daily:
+        # Rolling "last N days" windows move with the (UTC) date, as in SQLite's 'now'
+        etag += '-' + time.strftime('%Y%m%d', time.gmtime())
+    return etag
+
+def versioned(daily=False):
+    """Serve a read endpoint conditionally on the current user's or config's data version
+
+    The configuration is the view's config_id URL part or query argument.
+    The ETag is computed before the view runs, so a write landing in between
+    can only make the next revalidation miss, never serve stale data.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            config_id = kwargs.get('config_id') or request.args.get('config_id', type=int)
+            etag = data_etag(get_db().cursor(), current_user.id, config_id, daily)
+            if request.if_none_match.contains_weak(etag):
+                response = app.response_class(status=304)
+                response.set_etag(etag, weak=True)
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+            return response
+        return wrapper
+    return decorator
+
+def write_counter_values(cursor, readings):
+    """Store the counters of new readings, given as [(reading_id, {product name: count})]
+
+    Must run in the same transaction as the reading inserts.
+    """
+    # New products get ids in first-seen order, which is the order counters are listed in
+    names = list(dict.fromkeys(name for _, counter_data in readings for name in counter_data))
+    if not names:
+        return
+    cursor.executemany('INSERT OR IGNORE INTO products (name) VALUES (?)', [(name,) for name in names])
+    product_ids = {}
+    for start in range(0, len(names), 500):
+        chunk = names[start:start + 500]
+        cursor.execute(f'SELECT name, id FROM products WHERE name IN ({", ".join("?" * len(chunk))})', chunk)
+        product_ids.update(cursor.fetchall())
+    cursor.executemany('''
+        INSERT INTO counter_values (reading_id, product_id, count)
+        VALUES (?, ?, ?)
+    ''', [(reading_id, product_ids[name], count)
+          for reading_id, counter_data in readings for name, count in counter_data.items()])
+
+def load_counter_data(cursor, reading_ids):
+    """{reading id: {product name: count}} assembled from counter_values"""
+    reading_ids = list(reading_ids)
+    counter_data = {reading_id: {} for reading_id in reading_ids}
+    for start in range(0, len(reading_ids), 500):
+        chunk = reading_ids[start:start + 500]
+        cursor.execute(f'''
+            SELECT cv.reading_id, p.name, cv.count
+            FROM counter_values cv
+            JOIN products p ON p.id = cv.product_id
+            WHERE cv.reading_id IN ({", ".join("?" * len(chunk))})
+            ORDER BY cv.reading_id, cv.product_id
+        ''', chunk)
+        for reading_id, name, count in cursor.fetchall():
+            counter_data[reading_id][name] = count
+    return counter_data
+
+# Sales interval maintenance. Readings in a scope are ordered by
+# (reading_date, id); the sales recorded into a reading are the counter
+# differences from the reading just before it, and the first reading only sets
+# the baseline. Inserting or deleting a reading re-measures just the intervals
+# next to it, so the result never depends on the order readings were entered.
+def _reading_neighbours(cursor, reading_id):
+    """(previous id, next id) of a reading in its scope, None where there is none"""
+    cursor.execute('SELECT user_id, config_id, reading_date FROM counter_readings WHERE id = ?', (reading_id,))
+    user_id, config_id, reading_date = cursor.fetchone()
+    scope, scope_params = _reading_scope(config_id, user_id)
+
+    cursor.execute(f'''
+        SELECT id FROM counter_readings
+        WHERE {scope} AND (reading_date, id) < (?, ?)
+        ORDER BY reading_date DESC, id DESC
+        LIMIT 1
+    ''', scope_params + (reading_date, reading_id))
+    previous = cursor.fetchone()
+    cursor.execute(f'''
+        SELECT id FROM counter_readings
+        WHERE {scope} AND (reading_date, id) > (?, ?)
+        ORDER BY reading_date ASC, id ASC
+        LIMIT 1
+    ''', scope_params + (reading_date, reading_id))
+    following = cursor.fetchone()
+    return (previous[0] if previous else None), (following[0] if following else None)
+
+def _interval_prices(cursor, reading_ids):
+    """Unit prices of the sales recorded into the given readings (earlier ones win)"""
+    prices = {}
+    for reading_id in reversed([reading_id for reading_id in reading_ids if reading_id]):
+        cursor.execute('SELECT product_name, unit_price FROM sales_records WHERE end_reading_id = ?', (reading_id,))
+        prices.update(cursor.fetchall())
+    return prices
+
+def _rewrite_interval(cursor, start_reading_id, end_reading_id, product_prices):
+    """Replace the sales recorded into end_reading_id with the differences from start_reading_id
+
+    Keeps the sales_daily aggregate in step; the caller refreshes the revenue
+    rollup. Returns the new sales as dicts.
+    """
+    cursor.execute('SELECT user_id, config_id FROM counter_readings WHERE id = ?', (end_reading_id,))
+    user_id, config_id = cursor.fetchone()
+    # Re-measured sales stay on the day they were first recorded
+    cursor.execute('SELECT MIN(created_at) FROM sales_records WHERE end_reading_id = ?', (end_reading_id,))
+    created_at = cursor.fetchone()[0]
+
+    update_sales_daily(cursor, 'end_reading_id = ?', (end_reading_id,), sign=-1)
+    cursor.execute('DELETE FROM sales_records WHERE end_reading_id = ?', (end_reading_id,))
+    if start_reading_id is None:
+        return []
+
+    cursor.execute('''
+        SELECT p.name, cv.count - COALESCE(prev.count, 0)
+        FROM counter_values cv
+        JOIN products p ON p.id = cv.product_id
+        LEFT JOIN counter_values prev ON prev.reading_id = ? AND prev.product_id = cv.product_id
+        WHERE cv.reading_id = ?
+    ''', (start_reading_id, end_reading_id))
+
+    sales = []
+    for product_name, quantity_sold in cursor.fetchall():
+        if quantity_sold > 0:
+            if product_name in product_prices:
+                unit_price = product_prices[product_name]
+                sales.append({
+                    'product': product_name,
+                    'quantity': quantity_sold,
+                    'unit_price': unit_price,
+                    'revenue': quantity_sold * unit_price
+                })
+            else:
+                # Log warning if no price found for product with sales
+                print(f"Warning: No price found for product '{product_name}' with {quantity_sold} units sold")
+
+    cursor.executemany('''
+        INSERT INTO sales_records
+        (user_id, config_id, start_reading_id, end_reading_id, product_name, quantity_sold, unit_price, total_revenue, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+    ''', [(user_id, config_id, start_reading_id, end_reading_id, sale['product'], sale['quantity'],
+           sale['unit_price'], sale['revenue'], created_at) for sale in sales])
+    update_sales_daily(cursor, 'end_reading_id = ?', (end_reading_id,))
+    return sales
+
+def link_reading(cursor, reading_id, product_prices):
+    """Measure the sales around a just-inserted reading (and its counter values)
+
+    Records the sales since the previous reading at the given prices and
+    re-measures the following reading from the new one, keeping the prices it
+    was recorded with. Must run in the same transaction as the insert, before
+    the cash ledger is updated. Returns (the new reading's sales, user ids
+    whose sales changed).
+    """
+    cursor.execute('SELECT user_id, config_id FROM counter_readings WHERE id = ?', (reading_id,))
+    user_id, config_id = cursor.fetchone()
+    previous_id, next_id = _reading_neighbours(cursor, reading_id)
+    split_prices = _interval_prices(cursor, [next_id])
+
+    sales = _rewrite_interval(cursor, previous_id, reading_id, dict(split_prices, **product_prices))
+    changed = [reading_id]
+    if next_id:
+        _rewrite_interval(cursor, reading_id, next_id, dict(product_prices, **split_prices))
+        changed.append(next_id)
+
+    update_reading_revenue(cursor, user_id, config_id, changed)
+    return sales, _reading_users(cursor, changed)
+
+def delete_reading(cursor, reading_id):
+    """Delete a reading with its sales and re-measure the following reading from the previous one
+
+    Must run in one transaction with the caller's cash ledger update.
+    Returns the user ids whose sales changed.
+    """
+    cursor.execute('SELECT user_id, config_id FROM counter_readings WHERE id = ?', (reading_id,))
+    user_id, config_id = cursor.fetchone()
+    previous_id, next_id = _reading_neighbours(cursor, reading_id)
+    prices = _interval_prices(cursor, [next_id, reading_id])
+
+    # Readings whose sales were measured from this one (normally just the next)
+    cursor.execute('SELECT DISTINCT end_reading_id FROM sales_records WHERE start_reading_id = ?', (reading_id,))
+    changed = [row[0] for row in cursor.fetchall()]
+    if next_id and next_id not in changed:
+        changed.append(next_id)
+    users = _reading_users(cursor, changed) | {user_id}
+
+    update_sales_daily(cursor, 'start_reading_id = ? OR end_reading_id = ?', (reading_id, reading_id), sign=-1)
+    cursor.execute('DELETE FROM sales_records WHERE start_reading_id = ? OR end_reading_id = ?',
+                   (reading_id, reading_id))
+    cursor.execute('DELETE FROM counter_values WHERE reading_id = ?', (reading_id,))
+    cursor.execute('DELETE FROM counter_readings WHERE id = ?', (reading_id,))
+
+    if next_id:
+        _rewrite_interval(cursor, previous_id, next_id, prices)
+    update_reading_revenue(cursor, user_id, config_id, [reading_id] + changed)
+    return users
+
+def _reading_users(cursor, reading_ids):
+    """Ids of the users who recorded the given readings"""
+    if not reading_ids:
+        return set()
+    cursor.execute(f'SELECT DISTINCT user_id FROM counter_readings WHERE id IN ({", ".join("?" * len(reading_ids))})',
+                   list(reading_ids))
+    return {row[0] for row in cursor.fetchall()}
+
+# Schema migrations - each step runs once, in order, and is recorded in
+# schema_version. Steps must be idempotent because databases created before
+# the version table existed may already contain some of their changes.
+def _migrate_legacy_columns(cursor):
+    # Add user_id to existing configurations if it doesn't exist
+    cursor.execute("PRAGMA table_info(configurations)")
+    columns = [column[1] for column in cursor.fetchall()]
+    
+    if 'user_id' not in columns:
+        # For migration: add user_id column, default to 1 (first user)
+        cursor.execute('ALTER TABLE configurations ADD COLUMN user_id INTEGER DEFAULT 1')
+        # Remove the old UNIQUE constraint on name only
+        # SQLite doesn't support dropping constraints, so we'll handle duplicates in the app
+    
+    if 'cleaning_cost' not in columns:
+        cursor.execute('ALTER TABLE configurations ADD COLUMN cleaning_cost REAL DEFAULT 0')
+    
+    if 'products_per_day' not in columns:
+        cursor.execute('ALTER TABLE configurations ADD COLUMN products_per_day INTEGER DEFAULT 1')
+    
+    # Add config_id to sales tracking tables if it doesn't exist
+    for table in ('counter_readings', 'cash_register_events', 'sales_records'):
+        cursor.execute(f"PRAGMA table_info({table})")
+        table_columns = [column[1] for column in cursor.fetchall()]
+        if 'config_id' not in table_columns:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN config_id INTEGER')
+
+def _migrate_reading_revenue(cursor):
+    # Revenue rollup - one row per counter reading, maintained by every write path
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS reading_revenue (
+            reading_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            config_id INTEGER,
+            revenue REAL NOT NULL DEFAULT 0,
+            item_count INTEGER NOT NULL DEFAULT 0,
+            cumulative_revenue REAL NOT NULL DEFAULT 0,
+            FOREIGN KEY (reading_id) REFERENCES counter_readings(id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reading_revenue_config ON reading_revenue (config_id, reading_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reading_revenue_user ON reading_revenue (user_id, config_id, reading_id)')
+    rebuild_reading_revenue(cursor)
+
+def _migrate_reading_indexes(cursor):
+    # Latest/first reading and history lookups per config or per user
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_counter_readings_config_date
+        ON counter_readings (config_id, reading_date, cash_in_register)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_counter_readings_user_date
+        ON counter_readings (user_id, reading_date, config_id, cash_in_register)
+    ''')
+
+def _migrate_sales_indexes(cursor):
+    # Revenue per reading and the sales measured from a deleted reading
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sales_records_end_reading
+        ON sales_records (end_reading_id, total_revenue, quantity_sold)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sales_records_start_reading
+        ON sales_records (start_reading_id, end_reading_id)
+    ''')
+    # Statistics windows, covering the grouped columns
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sales_records_config_created
+        ON sales_records (config_id, created_at, product_name, quantity_sold, total_revenue, unit_price)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sales_records_user_created
+        ON sales_records (user_id, created_at, product_name, quantity_sold, total_revenue, unit_price)
+    ''')
+
+def _migrate_cash_event_indexes(cursor):
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_cash_events_config_date
+        ON cash_register_events (config_id, event_date, event_type, amount)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_cash_events_user_date
+        ON cash_register_events (user_id, event_date, config_id, event_type, amount)
+    ''')
+
+def _migrate_config_indexes(cursor):
+    # Config listings and the shared-access checks done by most sales endpoints
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_configurations_user_updated
+        ON configurations (user_id, updated_at)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_shared_configs_user
+        ON shared_configs (shared_with_user_id, config_id, can_edit)
+    ''')
+
+def _migrate_sales_daily(cursor):
+    # Daily sales per product; config_id 0 stands for readings without a config
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales_daily (
+            user_id INTEGER NOT NULL,
+            config_id INTEGER NOT NULL DEFAULT 0,
+            sale_date DATE NOT NULL,
+            product_name TEXT NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            record_count INTEGER NOT NULL DEFAULT 0,
+            unit_price_sum REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, config_id, sale_date, product_name)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sales_daily_config_date
+        ON sales_daily (config_id, sale_date, product_name, quantity, revenue)
+    ''')
+    rebuild_sales_daily(cursor)
+
+def _migrate_cash_ledger(cursor):
+    # Running cash ledger per config (user_id 0) or per user's unassigned readings (config_id 0)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cash_ledger (
+            config_id INTEGER NOT NULL DEFAULT 0,
+            user_id INTEGER NOT NULL DEFAULT 0,
+            first_reading_id INTEGER,
+            starting_cash REAL NOT NULL DEFAULT 0,
+            latest_reading_id INTEGER,
+            latest_reading_date TIMESTAMP,
+            actual_cash REAL NOT NULL DEFAULT 0,
+            total_sales REAL NOT NULL DEFAULT 0,
+            total_withdrawals REAL NOT NULL DEFAULT 0,
+            total_deposits REAL NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (config_id, user_id)
+        )
+    ''')
+    rebuild_cash_ledger(cursor)
+
+def _migrate_report_jobs(cursor):
+    # Background PDF rendering jobs (status: queued, running, done, failed)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS report_jobs (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            payload TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker TEXT,
+            error TEXT,
+            file_path TEXT,
+            download_name TEXT,
+            render_ms REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_report_jobs_status
+        ON report_jobs (status, created_at)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_report_jobs_user
+        ON report_jobs (user_id, created_at)
+    ''')
+
+def _migrate_data_versions(cursor):
+    # Per-user counter bumped by every write to readings, sales or cash events
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def _migrate_counter_values(cursor):
+    # One row per reading and product, so sales diffs and per-product counter
+    # series are indexed SQL. counter_readings.counter_data is still written
+    # for older tools but no longer read.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS counter_values (
+            reading_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (reading_id, product_id),
+            FOREIGN KEY (reading_id) REFERENCES counter_readings(id) ON DELETE CASCADE,
+            FOREIGN KEY (product_id) REFERENCES products(id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_counter_values_product
+        ON counter_values (product_id, reading_id, count)
+    ''')
+
+    # Backfill from the JSON blobs, skipping malformed ones and non-numeric counts
+    blob = '''json_each(CASE WHEN json_valid(cr.counter_data)
+                         THEN CASE json_type(cr.counter_data) WHEN 'object' THEN cr.counter_data END END) je'''
+    cursor.execute(f'''
+        INSERT OR IGNORE INTO products (name)
+        SELECT je.key
+        FROM counter_readings cr, {blob}
+        WHERE je.type IN ('integer', 'real')
+        GROUP BY je.key
+        ORDER BY MIN(cr.id)
+    ''')
+    cursor.execute(f'''
+        INSERT OR IGNORE INTO counter_values (reading_id, product_id, count)
+        SELECT cr.id, p.id, je.value
+        FROM counter_readings cr, {blob}
+        JOIN products p ON p.name = je.key
+        WHERE je.type IN ('integer', 'real')
+    ''')
+
+def _migrate_config_versions(cursor):
+    # Per-config counter bumped by every write to a configuration or its data
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS config_versions (
+            config_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def _migrate_config_changes(cursor):
+    # Changes to each configuration's data, read by the live update streams
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS config_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            config_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_config_changes_config
+        ON config_changes (config_id, id)
+    ''')
+
+MIGRATIONS = [
+    (1, 'Add user and config columns to pre-sharing tables', _migrate_legacy_columns),
+    (2, 'Create the reading_revenue rollup', _migrate_reading_revenue),
+    (3, 'Index counter readings by config/user and date', _migrate_reading_indexes),
+    (4, 'Index sales records by reading and by period', _migrate_sales_indexes),
+    (5, 'Index cash register events by config/user and date', _migrate_cash_event_indexes),
+    (6, 'Index configuration listings and shares', _migrate_config_indexes),
+    (7, 'Create the sales_daily aggregate', _migrate_sales_daily),
+    (8, 'Create the per-config cash ledger', _migrate_cash_ledger),
+    (9, 'Create the report job queue', _migrate_report_jobs),
+    (10, 'Track a data version per user', _migrate_data_versions),
+    (11, 'Store counter values per reading and product', _migrate_counter_values),
+    (12, 'Track a data version per configuration', _migrate_config_versions),
+    (13, 'Log configuration changes for live updates', _migrate_config_changes),
+]
+
+def run_migrations(conn):
+    """Apply pending schema migrations; returns the versions that were applied"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+    
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        # Every gunicorn worker runs this at startup; the write lock taken by
+        # BEGIN IMMEDIATE makes sure only one of them applies each step
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute('SELECT 1 FROM schema_version WHERE version = ?', (version,))
+            if cursor.fetchone():
+                conn.rollback()
+                continue
+            migrate(cursor)
+            cursor.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                           (version, description))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
 def init_db():
     """Initialize the database with required tables"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = db_pool.checkout()
     cursor = conn.cursor()
     
     # Users table
@@ -164,44 +1535,74 @@ def init_db():
         )
     ''')
     
-    # Migration: Add user_id to existing configurations if it doesn't exist
-    cursor.execute("PRAGMA table_info(configurations)")
-    columns = [column[1] for column in cursor.fetchall()]
-    
-    if 'user_id' not in columns:
-        # For migration: add user_id column, default to 1 (first user)
-        cursor.execute('ALTER TABLE configurations ADD COLUMN user_id INTEGER DEFAULT 1')
-        # Remove the old UNIQUE constraint on name only
-        # SQLite doesn't support dropping constraints, so we'll handle duplicates in the app
-    
-    if 'cleaning_cost' not in columns:
-        cursor.execute('ALTER TABLE configurations ADD COLUMN cleaning_cost REAL DEFAULT 0')
-    
-    if 'products_per_day' not in columns:
-        cursor.execute('ALTER TABLE configurations ADD COLUMN products_per_day INTEGER DEFAULT 1')
-    
-    # Migration: Add config_id to sales tracking tables if it doesn't exist
-    cursor.execute("PRAGMA table_info(counter_readings)")
-    cr_columns = [column[1] for column in cursor.fetchall()]
-    if 'config_id' not in cr_columns:
-        cursor.execute('ALTER TABLE counter_readings ADD COLUMN config_id INTEGER')
-    
-    cursor.execute("PRAGMA table_info(cash_register_events)")
-    cre_columns = [column[1] for column in cursor.fetchall()]
-    if 'config_id' not in cre_columns:
-        cursor.execute('ALTER TABLE cash_register_events ADD COLUMN config_id INTEGER')
-    
-    cursor.execute("PRAGMA table_info(sales_records)")
-    sr_columns = [column[1] for column in cursor.fetchall()]
-    if 'config_id' not in sr_columns:
-        cursor.execute('ALTER TABLE sales_records ADD COLUMN config_id INTEGER')
-    
     conn.commit()
-    conn.close()
+    
+    run_migrations(conn)
+    db_pool.checkin(conn)
 
 # Initialize database on startup
 init_db()
 
+@app.cli.command('migrate')
+def migrate_command():
+    """Apply pending schema migrations and show the schema version"""
+    with db_pool.connection() as conn:
+        applied = run_migrations(conn)
+        version = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()[0]
+    if applied:
+        print(f"Applied migrations: {', '.join(str(v) for v in applied)}")
+    print(f"Schema version: {version}")
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Rebuild the revenue rollup, daily sales aggregate and cash ledgers"""
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        readings = rebuild_reading_revenue(cursor)
+        days = rebuild_sales_daily(cursor)
+        ledgers = rebuild_cash_ledger(cursor)
+        bump_all_data_versions(cursor)
+        conn.commit()
+    print(f"Rebuilt revenue rollup for {readings} counter readings")
+    print(f"Rebuilt daily sales aggregate with {days} rows")
+    print(f"Rebuilt {ledgers} cash ledgers")
+
+@app.cli.command('verify-ledger')
+@click.option('--fix', is_flag=True, help='Overwrite drifted rows with the recomputed values')
+def verify_ledger_command(fix):
+    """Recompute every cash ledger from scratch and report drift"""
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        drifted = 0
+        scopes = _cash_ledger_scopes(cursor)
+        for user_id, config_id in scopes:
+            expected = compute_cash_ledger(cursor, user_id, config_id)
+            stored = get_cash_ledger(cursor, user_id, config_id)
+            label = f"config {config_id}" if config_id else f"user {user_id} (no config)"
+            
+            if stored is None:
+                differences = ['missing ledger row']
+            else:
+                differences = []
+                for field, value in expected.items():
+                    if isinstance(value, float) or isinstance(stored[field], float):
+                        if abs((value or 0) - (stored[field] or 0)) > 0.005:
+                            differences.append(f"{field}: stored {stored[field]:.2f}, expected {value:.2f}")
+                    elif value != stored[field]:
+                        differences.append(f"{field}: stored {stored[field]}, expected {value}")
+            
+            if differences:
+                drifted += 1
+                print(f"{label}: " + '; '.join(differences))
+                if fix:
+                    _write_cash_ledger(cursor, user_id, config_id, expected)
+        
+        if fix and drifted:
+            bump_all_data_versions(cursor)
+            conn.commit()
+    
+    print(f"Checked {len(scopes)} ledgers, {drifted} with drift" + (' (fixed)' if fix and drifted else ''))
+
 # Authentication routes
 @app.route('/')
 @login_required
@@ -234,13 +1635,12 @@ def api_register():
         if len(password) < 6:
             return jsonify({'success': False, 'error': 'Password must be at least 6 characters'}), 400
         
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Check if user already exists
         cursor.execute('SELECT id FROM users WHERE email = ?', (email,))
         if cursor.fetchone():
-            conn.close()
             return jsonify({'success': False, 'error': 'Email already registered'}), 400
         
         # Hash password and create user
@@ -251,7 +1651,7 @@ def api_register():
         )
         conn.commit()
         user_id = cursor.lastrowid
-        conn.close()
+        invalidate_user(user_id)
         
         # Log the user in
         user = User(user_id, email, name)
@@ -271,458 +1671,900 @@ def api_login():
         if not email or not password:
             return jsonify({'success': False, 'error': 'Email and password are required'}), 400
         
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         cursor.execute('SELECT id, email, name, password_hash FROM users WHERE email = ?', (email,))
         user_data = cursor.fetchone()
-        conn.close()
         
         if not user_data or not bcrypt.check_password_hash(user_data[3], password):
             return jsonify({'success': False, 'error': 'Invalid email or password'}), 401
         
         user = User(user_data[0], user_data[1], user_data[2])
+        user_cache.put(user)
         login_user(user, remember=True)
         
         return jsonify({'success': True, 'message': 'Login successful'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/logout', methods=['POST'])
-@login_required
-def api_logout():
-    logout_user()
-    return jsonify({'success': True, 'message': 'Logged out successfully'})
+@app.route('/api/logout', methods=['POST'])
+@login_required
+def api_logout():
+    logout_user()
+    return jsonify({'success': True, 'message': 'Logged out successfully'})
+
+app.config['CALC_CACHE_SIZE'] = int(os.environ.get('CALC_CACHE_SIZE', 512))
+
+class CalculationCache:
+    """In-process LRU cache of /api/calculate response bodies keyed by input hash
+
+    Keys are content addresses of the canonicalized request, so identical
+    calculations share an entry no matter which user sends them.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # {key: response body}
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'not_modified': 0}
+
+    @staticmethod
+    def key(data):
+        canonical = cost_engine.canonical_input(data)
+        digest = hashlib.sha256(f'{cost_engine.ENGINE_VERSION}:{canonical}'.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return body
+
+    def put(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.config['CALC_CACHE_SIZE']:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def record_not_modified(self):
+        with self._lock:
+            self._stats['not_modified'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0
+        requests = lookups + stats['not_modified']
+        stats['not_modified_ratio'] = round(stats['not_modified'] / requests, 4) if requests else 0
+        stats['max_size'] = self.config['CALC_CACHE_SIZE']
+        return stats
+
+calc_cache = CalculationCache(app.config)
+
+@app.route('/api/calculate', methods=['POST'])
+@login_required
+def calculate():
+    try:
+        data = request.json
+        key = calc_cache.key(data)
+
+        # The ETag is the input's content address, so a client that already
+        # holds the result for this exact input needs no calculation at all
+        if request.if_none_match.contains_weak(key):
+            calc_cache.record_not_modified()
+            response = app.response_class(status=304)
+            response.set_etag(key)
+            return response
+
+        body = calc_cache.get(key)
+        if body is None:
+            # Batch mode: {"configs": [config, ...]} returns one results list per config
+            if 'configs' in data:
+                results = cost_engine.calculate_batch(data['configs'])
+            else:
+                results = cost_engine.calculate(data)
+
+            body = jsonify({
+                'success': True,
+                'results': results
+            }).get_data()
+            calc_cache.put(key, body)
+
+        response = app.response_class(body, mimetype=app.json.mimetype)
+        response.set_etag(key)
+        return response
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+def load_costing_config(cursor, config_id):
+    """A saved configuration as a calculation input, or None if the current user has no access
+
+    Tea bag prices are the current user's, as on the calculator page.
+    """
+    cursor.execute('''
+        SELECT c.cleaning_cost, c.products_per_day, c.ingredients, c.drinks
+        FROM configurations c
+        WHERE c.id = ? AND (c.user_id = ? OR EXISTS (
+            SELECT 1 FROM shared_configs sc 
+            WHERE sc.config_id = c.id AND sc.shared_with_user_id = ?
+        ))
+    ''', (config_id, current_user.id, current_user.id))
+    row = cursor.fetchone()
+    if not row:
+        return None
+
+    cursor.execute('SELECT name, cost_per_unit FROM tea_bags WHERE user_id = ?', (current_user.id,))
+    return {
+        'cleaning_cost': row[0] or 0,
+        'products_per_day': row[1] or 1,
+        'ingredients': json.loads(row[2]),
+        'drinks': json.loads(row[3]),
+        'tea_bags': dict(cursor.fetchall())
+    }
+
+# Upper bound on scenarios per what-if request (a grid multiplies quickly)
+app.config['WHATIF_MAX_SCENARIOS'] = int(os.environ.get('WHATIF_MAX_SCENARIOS', 1000))
+
+@app.route('/api/what-if', methods=['POST'])
+@login_required
+def what_if():
+    """Cost a saved configuration's drinks under many price scenarios at once"""
+    try:
+        data = request.json
+        config_id = data.get('config_id')
+        scenarios = list(data.get('scenarios', []))
+        if data.get('grid'):
+            scenarios += cost_engine.expand_grid(data['grid'])
+
+        if not config_id:
+            return jsonify({'success': False, 'error': 'config_id is required'}), 400
+        if not scenarios:
+            return jsonify({'success': False, 'error': 'At least one scenario or a grid is required'}), 400
+        if len(scenarios) > app.config['WHATIF_MAX_SCENARIOS']:
+            return jsonify({
+                'success': False,
+                'error': f"Too many scenarios ({len(scenarios)}), the limit is {app.config['WHATIF_MAX_SCENARIOS']}"
+            }), 400
+
+        config = load_costing_config(get_db().cursor(), config_id)
+        if config is None:
+            return jsonify({
+                'success': False,
+                'error': 'Configuration not found or access denied'
+            }), 404
+
+        baseline, results = cost_engine.sweep(config, scenarios)
+
+        return jsonify({
+            'success': True,
+            'config_id': config_id,
+            'baseline': baseline,
+            'scenarios': results
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+app.config['RECALC_SESSION_LIMIT'] = int(os.environ.get('RECALC_SESSION_LIMIT', 256))
+
+class RecalculationSessions:
+    """In-process LRU of IncrementalCalculation states for /api/configs/<id>/recalculate
+
+    Every applied change gets a new state token. A state is checked out while
+    a request works on it, so a concurrent or stale token (or one issued by
+    another worker) misses and the client resends the full configuration.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # {session_id: (version, user_id, config_id, calculation)}
+        self._stats = {'resumed': 0, 'resyncs_required': 0, 'full_syncs': 0, 'evictions': 0,
+                       'drinks_recosted': 0, 'drinks_served': 0}
+
+    def checkout(self, token, user_id, config_id):
+        session_id, _, version = str(token).partition('.')
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or str(entry[0]) != version or entry[1:3] != (user_id, config_id):
+                self._stats['resyncs_required'] += 1
+                return None, None
+            del self._entries[session_id]
+            self._stats['resumed'] += 1
+            return session_id, entry
+
+    def checkin(self, session_id, entry, recosted):
+        version, user_id, config_id, calculation = entry
+        if session_id is None:
+            session_id = os.urandom(12).hex()
+            self._count('full_syncs')
+        entry = (version + 1, user_id, config_id, calculation)
+        with self._lock:
+            self._entries[session_id] = entry
+            self._stats['drinks_recosted'] += recosted
+            self._stats['drinks_served'] += len(calculation.drinks)
+            while len(self._entries) > self.config['RECALC_SESSION_LIMIT']:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+        return f'{session_id}.{version + 1}'
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['sessions'] = len(self._entries)
+        requests = stats['resumed'] + stats['resyncs_required']
+        stats['resume_ratio'] = round(stats['resumed'] / requests, 4) if requests else 0
+        served = stats['drinks_served']
+        stats['recosted_ratio'] = round(stats['drinks_recosted'] / served, 4) if served else 0
+        stats['max_sessions'] = self.config['RECALC_SESSION_LIMIT']
+        return stats
+
+recalc_sessions = RecalculationSessions(app.config)
+
+@app.route('/api/configs/<int:config_id>/recalculate', methods=['POST'])
+@login_required
+def recalculate_config(config_id):
+    """Recost only what changed since the last recalculation of this configuration
+
+    Without a `base` state token the calculation starts from `config` (the
+    calculator's current input, with optional drink `keys`) or from the saved
+    configuration; with one, the body is a delta for IncrementalCalculation.apply.
+    """
+    try:
+        data = request.json or {}
+
+        if data.get('base'):
+            session_id, entry = recalc_sessions.checkout(data['base'], current_user.id, config_id)
+            if entry is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Calculation state not found, send the full configuration',
+                    'resync': True
+                }), 409
+            calculation = entry[3]
+            recosted_before = calculation.recosted
+            # A failed delta leaves the state checked out, i.e. discarded
+            results = calculation.apply(data)
+            recosted = calculation.recosted - recosted_before
+        else:
+            saved_config = load_costing_config(get_db().cursor(), config_id)
+            if saved_config is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Configuration not found or access denied'
+                }), 404
+
+            calculation = cost_engine.IncrementalCalculation(data.get('config') or saved_config, data.get('keys'))
+            session_id, entry = None, (0, current_user.id, config_id, calculation)
+            results = dict(calculation.results)
+            recosted = calculation.recosted
+
+        state = recalc_sessions.checkin(session_id, entry, recosted)
+
+        return jsonify({
+            'success': True,
+            'state': state,
+            'order': list(calculation.drinks),
+            'results': results
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+# Rendered report cache
+app.config['REPORT_CACHE_DIR'] = os.environ.get('REPORT_CACHE_DIR', os.path.join(DATABASE_DIR, 'report_cache'))
+app.config['REPORT_CACHE_MAX_MB'] = float(os.environ.get('REPORT_CACHE_MAX_MB', 256))
+
+# Part of every cached report's key; bump when render_report_pdf output changes
+REPORT_FORMAT_VERSION = 1
+
+def report_cache_key(cursor, data, user_id=None):
+    """Content address of a report: its input plus the user's data version and the day
+
+    The sales sections only read the user's own readings, sales and cash
+    events, all of which bump the data version; the day is included because
+    the statistics cover the last 30 days.
+    """
+    if user_id is None:
+        marker = 'anonymous'
+    else:
+        marker = f"{user_id}:{get_data_version(cursor, user_id)}:{time.strftime('%Y-%m-%d', time.gmtime())}"
+    canonical = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(f'{REPORT_FORMAT_VERSION}:{marker}:{canonical}'.encode('utf-8')).hexdigest()
+
+class ReportCache:
+    """Rendered PDFs on disk, evicted least recently used first
+
+    Files are written under a temporary name and renamed into place, so all
+    gunicorn workers can share the directory safely. A file's mtime is its
+    recency and is refreshed on every hit.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+
+    def _path(self, key):
+        return os.path.join(self.config['REPORT_CACHE_DIR'], f'{key}.pdf')
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def open(self, key):
+        """Open a cached report for streaming, or return None on a miss"""
+        path = self._path(key)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            self._count('misses')
+            return None
+        os.utime(f.fileno())
+        self._count('hits')
+        return f
+
+    def link(self, key, destination):
+        """Place a cached report at destination (hard link when possible); False on a miss"""
+        path = self._path(key)
+        temp_path = f'{destination}.{os.getpid()}.tmp'
+        try:
+            try:
+                os.link(path, temp_path)
+            except FileExistsError:
+                os.remove(temp_path)  # Left behind by an interrupted render
+                os.link(path, temp_path)
+            except OSError:
+                # No hard links on this filesystem, copy instead (a report
+                # evicted meanwhile fails here too and counts as a miss)
+                shutil.copyfile(path, temp_path)
+        except FileNotFoundError:
+            self._count('misses')
+            return False
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # Evicted meanwhile; our link still holds the data
+        os.replace(temp_path, destination)
+        self._count('hits')
+        return True
+
+    def put(self, key, pdf):
+        directory = self.config['REPORT_CACHE_DIR']
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pdf)
+        os.replace(temp_path, self._path(key))
+        self._count('writes')
+        self._evict()
+
+    def _entries(self):
+        entries = []
+        try:
+            scan = os.scandir(self.config['REPORT_CACHE_DIR'])
+        except FileNotFoundError:
+            return entries
+        with scan:
+            for entry in scan:
+                if entry.name.endswith('.pdf'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        limit = self.config['REPORT_CACHE_MAX_MB'] * 1024 * 1024
+        for _, size, path in sorted(entries):
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+                self._count('evictions')
+            except FileNotFoundError:
+                pass  # Another worker evicted it first
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        entries = self._entries()
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0
+        stats['files'] = len(entries)
+        stats['size_mb'] = round(sum(size for _, size, _ in entries) / (1024 * 1024), 2)
+        stats['max_size_mb'] = self.config['REPORT_CACHE_MAX_MB']
+        return stats
+
+report_cache = ReportCache(app.config)
+
+@app.route('/api/generate-pdf', methods=['POST'])
+def generate_pdf():
+    try:
+        data = request.json
+
+        cursor, user_id = None, None
+        if current_user.is_authenticated:
+            cursor, user_id = get_db().cursor(), current_user.id
+
+        key = report_cache_key(cursor, data, user_id)
+        body = report_cache.open(key)
+        if body is None:
+            pdf = render_report_pdf(data, cursor, user_id)
+            report_cache.put(key, pdf)
+            body = BytesIO(pdf)
+
+        return send_file(
+            body,
+            as_attachment=True,
+            download_name=f'coffee_cost_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf',
+            mimetype='application/pdf'
+        )
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+# Background report rendering
+app.config['REPORT_WORKERS'] = int(os.environ.get('REPORT_WORKERS', 2))
+app.config['REPORT_DIR'] = os.environ.get('REPORT_DIR', os.path.join(DATABASE_DIR, 'reports'))
+app.config['REPORT_POLL_INTERVAL'] = float(os.environ.get('REPORT_POLL_INTERVAL', 2))
+app.config['REPORT_JOB_TIMEOUT'] = int(os.environ.get('REPORT_JOB_TIMEOUT', 300))
+app.config['REPORT_MAX_ATTEMPTS'] = int(os.environ.get('REPORT_MAX_ATTEMPTS', 3))
+app.config['REPORT_RETENTION_HOURS'] = int(os.environ.get('REPORT_RETENTION_HOURS', 24))
+
+class ReportQueue:
+    """Renders queued PDF reports on a small pool of background threads
+
+    Jobs live in the report_jobs table, so every gunicorn worker can pick up
+    any job and nothing is lost on restart: a job left running by a worker
+    that died is queued again once REPORT_JOB_TIMEOUT has passed.
+    """
+
+    def __init__(self, pool, cache, config):
+        self.pool = pool
+        self.cache = cache
+        self.config = config
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+        self._threads = []
+        self._last_purge = 0
+
+    def start(self):
+        """Start this process's render threads (once per process)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._wakeup = threading.Event()
+            os.makedirs(self.config['REPORT_DIR'], exist_ok=True)
+            self._threads = []
+            for number in range(self.config['REPORT_WORKERS']):
+                thread = threading.Thread(target=self._run, name=f'report-worker-{number}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def enqueue(self, cursor, user_id, data):
+        job_id = os.urandom(16).hex()
+        cursor.execute('''
+            INSERT INTO report_jobs (id, user_id, payload)
+            VALUES (?, ?, ?)
+        ''', (job_id, user_id, json.dumps(data)))
+        self.start()
+        return job_id
+
+    def notify(self):
+        """Wake an idle render thread of this process after a job was committed"""
+        self._wakeup.set()
+
+    def _claim(self, conn):
+        cursor = conn.cursor()
+        # Give up on jobs whose worker died mid-render
+        cursor.execute('''
+            UPDATE report_jobs
+            SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                error = 'Rendering was interrupted'
+            WHERE status = 'running' AND started_at < DATETIME('now', ?)
+        ''', (self.config['REPORT_MAX_ATTEMPTS'], f"-{self.config['REPORT_JOB_TIMEOUT']} seconds"))
+        cursor.execute('''
+            UPDATE report_jobs
+            SET status = 'running', attempts = attempts + 1, started_at = CURRENT_TIMESTAMP, worker = ?
+            WHERE id = (
+                SELECT id FROM report_jobs
+                WHERE status = 'queued'
+                ORDER BY created_at, rowid
+                LIMIT 1
+            )
+            RETURNING id, user_id, payload
+        ''', (f'{os.getpid()}/{threading.current_thread().name}',))
+        job = cursor.fetchone()
+        conn.commit()
+        return job
+
+    def _render(self, conn, job):
+        job_id, user_id, payload = job
+        started = time.perf_counter()
+        try:
+            data = json.loads(payload)
+            key = report_cache_key(conn.cursor(), data, user_id)
+            file_path = os.path.join(self.config['REPORT_DIR'], f'{job_id}.pdf')
+            if not self.cache.link(key, file_path):
+                pdf = render_report_pdf(data, conn.cursor(), user_id)
+                self.cache.put(key, pdf)
+                with open(file_path + '.tmp', 'wb') as f:
+                    f.write(pdf)
+                os.replace(file_path + '.tmp', file_path)
+            conn.execute('''
+                UPDATE report_jobs
+                SET status = 'done', error = NULL, file_path = ?, download_name = ?, render_ms = ?,
+                    finished_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (file_path, f'coffee_cost_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf',
+                  round((time.perf_counter() - started) * 1000, 1), job_id))
+        except Exception as e:
+            conn.rollback()
+            conn.execute('''
+                UPDATE report_jobs
+                SET status = 'failed', error = ?, render_ms = ?, finished_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (str(e), round((time.perf_counter() - started) * 1000, 1), job_id))
+        conn.commit()
+
+    def _purge(self, conn):
+        """Delete finished jobs and their files after REPORT_RETENTION_HOURS"""
+        if time.monotonic() - self._last_purge < 600:
+            return
+        self._last_purge = time.monotonic()
+        cursor = conn.cursor()
+        cursor.execute('''
+            DELETE FROM report_jobs
+            WHERE status IN ('done', 'failed') AND finished_at < DATETIME('now', ?)
+            RETURNING file_path
+        ''', (f"-{self.config['REPORT_RETENTION_HOURS']} hours",))
+        for (file_path,) in cursor.fetchall():
+            if file_path and os.path.exists(file_path):
+                os.remove(file_path)
+        conn.commit()
+
+    def _run(self):
+        while True:
+            try:
+                with self.pool.connection() as conn:
+                    job = self._claim(conn)
+                    if job is not None:
+                        self._render(conn, job)
+                        continue
+                    self._purge(conn)
+            except Exception as e:
+                print(f"Report worker error: {e}")
+            self._wakeup.wait(self.config['REPORT_POLL_INTERVAL'])
+            self._wakeup.clear()
+
+    def stats(self, cursor):
+        cursor.execute('''
+            SELECT status, COUNT(*), AVG(render_ms), MAX(render_ms)
+            FROM report_jobs
+            GROUP BY status
+        ''')
+        stats = {'queued': 0, 'running': 0, 'done': 0, 'failed': 0}
+        render_ms_avg = render_ms_max = None
+        for status, count, avg_ms, max_ms in cursor.fetchall():
+            stats[status] = count
+            if status == 'done':
+                render_ms_avg = round(avg_ms, 1)
+                render_ms_max = max_ms
+        cursor.execute('''
+            SELECT (JULIANDAY('now') - JULIANDAY(MIN(created_at))) * 86400
+            FROM report_jobs
+            WHERE status = 'queued'
+        ''')
+        oldest = cursor.fetchone()[0]
+        stats['queue_depth'] = stats['queued'] + stats['running']
+        stats['oldest_queued_seconds'] = round(oldest, 1) if oldest is not None else None
+        stats['render_ms_avg'] = render_ms_avg
+        stats['render_ms_max'] = render_ms_max
+        stats['workers_alive'] = sum(thread.is_alive() for thread in self._threads) if self._pid == os.getpid() else 0
+        stats['max_workers'] = self.config['REPORT_WORKERS']
+        return stats
+
+report_queue = ReportQueue(db_pool, report_cache, app.config)
 
-@app.route('/api/calculate', methods=['POST'])
+@app.before_request
+def start_report_workers():
+    # Pick up jobs queued before this process started
+    report_queue.start()
+
+@app.route('/api/reports', methods=['POST'])
 @login_required
-def calculate():
+def create_report():
+    """Queue a PDF report for background rendering"""
     try:
         data = request.json
-        ingredients = data.get('ingredients', {})
-        drinks = data.get('drinks', [])
-        cleaning_cost = data.get('cleaning_cost', 0)
-        products_per_day = data.get('products_per_day', 1)
-        tea_bags = data.get('tea_bags', {})  # Tea bags with per-unit costs
-        
-        # Calculate cleaning cost per product
-        cleaning_cost_per_product = cleaning_cost / products_per_day if products_per_day > 0 else 0
-        
-        # Calculate cost for each drink
-        results = []
-        for drink in drinks:
-            drink_cost = 0
-            breakdown = []
-            
-            # Calculate bulk ingredients (kg/L based)
-            for ingredient_name, amount in drink.get('ingredients', {}).items():
-                if ingredient_name in ingredients:
-                    ingredient_cost = ingredients[ingredient_name]
-                    cost = ingredient_cost * amount
-                    drink_cost += cost
-                    breakdown.append({
-                        'ingredient': ingredient_name,
-                        'amount': amount,
-                        'unit_cost': ingredient_cost,
-                        'total_cost': round(cost, 2),
-                        'type': 'bulk'
-                    })
-            
-            # Calculate per-unit items (tea bags, etc.)
-            for tea_name, quantity in drink.get('tea_bags', {}).items():
-                if tea_name in tea_bags:
-                    cost_per_unit = tea_bags[tea_name]
-                    cost = cost_per_unit * quantity
-                    drink_cost += cost
-                    breakdown.append({
-                        'ingredient': tea_name,
-                        'amount': quantity,
-                        'unit_cost': cost_per_unit,
-                        'total_cost': round(cost, 2),
-                        'type': 'per_unit'
-                    })
-            
-            # Calculate custom items (cookies, etc.)
-            for custom_item in drink.get('custom_items', []):
-                cost = custom_item.get('cost', 0)
-                drink_cost += cost
-                breakdown.append({
-                    'ingredient': custom_item.get('name', 'Custom Item'),
-                    'amount': 1,
-                    'unit_cost': cost,
-                    'total_cost': round(cost, 2),
-                    'type': 'custom'
-                })
-            
-            # Add cleaning cost to total
-            total_cost = drink_cost + cleaning_cost_per_product
-            
-            results.append({
-                'name': drink.get('name'),
-                'total_cost': round(total_cost, 2),
-                'cleaning_cost_per_product': round(cleaning_cost_per_product, 2),
-                'total_cleaning_cost': round(cleaning_cost, 2),
-                'breakdown': breakdown
-            })
-        
+        conn = get_db()
+        job_id = report_queue.enqueue(conn.cursor(), current_user.id, data)
+        conn.commit()
+        report_queue.notify()
+
         return jsonify({
             'success': True,
-            'results': results
-        })
-    
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': url_for('get_report', job_id=job_id),
+            'download_url': url_for('download_report', job_id=job_id)
+        }), 202
+
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 400
 
-@app.route('/api/generate-pdf', methods=['POST'])
-def generate_pdf():
+@app.route('/api/reports/<job_id>', methods=['GET'])
+@login_required
+def get_report(job_id):
+    """Get the status of a queued report"""
     try:
-        data = request.json
-        cleaning_cost = data.get('cleaning_cost', 0)
-        products_per_day = data.get('products_per_day', 1)
-        ingredients = data.get('ingredients', {})
-        drinks = data.get('drinks', [])
-        results = data.get('results', [])
-        
-        # Create PDF in memory
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72,
-                              topMargin=72, bottomMargin=18)
-        
-        # Container for the 'Flowable' objects
-        elements = []
-        
-        # Define styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#2c3e50'),
-            spaceAfter=30,
-            alignment=1  # Center alignment
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=16,
-            textColor=colors.HexColor('#34495e'),
-            spaceAfter=12,
-            spaceBefore=12
-        )
-        
-        # Title
-        title = Paragraph("Coffee Cost Calculator Report", title_style)
-        elements.append(title)
-        
-        # Date
-        date_text = Paragraph(f"<i>Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</i>", 
-                             styles['Normal'])
-        elements.append(date_text)
-        elements.append(Spacer(1, 20))
-        
-        # Fixed Costs Section
-        if cleaning_cost > 0:
-            elements.append(Paragraph("Fixed Daily Costs", heading_style))
-            
-            fixed_cost_data = [
-                ['Cost Type', 'Amount'],
-                ['Daily Cleaning Cost', f"€{cleaning_cost:.2f}"],
-                ['Expected Products per Day', str(int(products_per_day))],
-                ['Cleaning Cost per Product', f"€{(cleaning_cost / products_per_day):.2f}"]
-            ]
-            
-            fixed_cost_table = Table(fixed_cost_data, colWidths=[3*inch, 2*inch])
-            fixed_cost_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e67e22')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ]))
-            elements.append(fixed_cost_table)
-            elements.append(Spacer(1, 30))
-        
-        # Ingredients Section
-        elements.append(Paragraph("Ingredient Costs", heading_style))
-        
-        # Define liquid ingredients
-        liquid_ingredients = ['milk', 'water', 'vanilla_syrup']
-        
-        ingredient_data = [['Ingredient', 'Cost per Unit']]
-        for name, cost in ingredients.items():
-            unit = 'L' if name in liquid_ingredients else 'kg'
-            ingredient_data.append([name.replace('_', ' ').title(), f"€{cost:.2f}/{unit}"])
-        
-        ingredient_table = Table(ingredient_data, colWidths=[3*inch, 2*inch])
-        ingredient_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ]))
-        elements.append(ingredient_table)
-        elements.append(Spacer(1, 30))
-        
-        # Drinks Section
-        elements.append(Paragraph("Drink Costs Breakdown", heading_style))
-        
-        for result in results:
-            # Find matching drink data for vending price
-            drink_data = next((d for d in drinks if d.get('name') == result['name']), None)
-            vending_price = drink_data.get('vending_price', 0) if drink_data else 0
-            
-            # Drink name with profit info
-            if vending_price > 0:
-                profit = vending_price - result['total_cost']
-                profit_margin = (profit / vending_price) * 100
-                drink_name = Paragraph(
-                    f"<b>{result['name']}</b> - Production Cost: €{result['total_cost']:.2f} | "
-                    f"Vending Price: €{vending_price:.2f} | "
-                    f"Profit: €{profit:.2f} ({profit_margin:.1f}%)", 
-                    styles['Heading3']
-                )
-            else:
-                drink_name = Paragraph(f"<b>{result['name']}</b> - Total Cost: €{result['total_cost']:.2f}", 
-                                      styles['Heading3'])
-            elements.append(drink_name)
-            elements.append(Spacer(1, 6))
-            
-            # Breakdown table
-            breakdown_data = [['Item', 'Amount', 'Unit Cost', 'Total']]
-            
-            ingredient_subtotal = 0
-            for item in result['breakdown']:
-                ingredient_name = item['ingredient']
-                amount_in_base = item['amount']
-                ingredient_subtotal += item['total_cost']
-                
-                # Convert to g/ml for display
-                if ingredient_name in liquid_ingredients:
-                    amount_display = f"{amount_in_base * 1000:.1f} ml"
-                    unit_display = "L"
-                else:
-                    amount_display = f"{amount_in_base * 1000:.1f} g"
-                    unit_display = "kg"
-                
-                breakdown_data.append([
-                    ingredient_name.replace('_', ' ').title(),
-                    amount_display,
-                    f"€{item['unit_cost']:.2f}/{unit_display}",
-                    f"€{item['total_cost']:.2f}"
-                ])
-            
-            # Add cleaning cost row if present
-            if result.get('cleaning_cost_per_product', 0) > 0:
-                breakdown_data.append([
-                    'Daily Cleaning Cost',
-                    'Per product',
-                    f"€{result.get('total_cleaning_cost', 0):.2f}/day",
-                    f"€{result['cleaning_cost_per_product']:.2f}"
-                ])
-            
-            breakdown_table = Table(breakdown_data, colWidths=[2*inch, 1.5*inch, 1.5*inch, 1.5*inch])
-            breakdown_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2ecc71')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ]))
-            elements.append(breakdown_table)
-            elements.append(Spacer(1, 20))
-        
-        # Sales Statistics Section (if user is logged in)
-        if current_user.is_authenticated:
-            try:
-                conn = sqlite3.connect(DATABASE_PATH)
-                cursor = conn.cursor()
-                
-                # Get sales statistics for last 30 days
-                cursor.execute('''
-                    SELECT 
-                        product_name,
-                        SUM(quantity_sold) as total_quantity,
-                        SUM(total_revenue) as total_revenue,
-                        AVG(unit_price) as avg_price
-                    FROM sales_records
-                    WHERE user_id = ? AND created_at >= datetime('now', '-30 days')
-                    GROUP BY product_name
-                    ORDER BY total_revenue DESC
-                ''', (current_user.id,))
-                
-                sales_data = cursor.fetchall()
-                
-                if sales_data:
-                    elements.append(Spacer(1, 30))
-                    elements.append(Paragraph("Sales Statistics (Last 30 Days)", heading_style))
-                    
-                    total_revenue = sum(row[2] for row in sales_data)
-                    total_items = sum(row[1] for row in sales_data)
-                    
-                    # Summary box
-                    summary_data = [
-                        ['Metric', 'Value'],
-                        ['Total Items Sold', str(int(total_items))],
-                        ['Total Revenue', f"€{total_revenue:.2f}"]
-                    ]
-                    
-                    summary_table = Table(summary_data, colWidths=[3*inch, 2*inch])
-                    summary_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#9b59b6')),
-                        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                        ('FONTSIZE', (0, 0), (-1, 0), 12),
-                        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                        ('FONTSIZE', (0, 1), (-1, -1), 10),
-                    ]))
-                    elements.append(summary_table)
-                    elements.append(Spacer(1, 20))
-                    
-                    # Product breakdown
-                    elements.append(Paragraph("Sales by Product", styles['Heading3']))
-                    elements.append(Spacer(1, 10))
-                    
-                    product_data = [['Product', 'Quantity', 'Avg Price', 'Revenue']]
-                    for row in sales_data:
-                        product_data.append([
-                            row[0],
-                            str(int(row[1])),
-                            f"€{row[3]:.2f}",
-                            f"€{row[2]:.2f}"
-                        ])
-                    
-                    product_table = Table(product_data, colWidths=[2.5*inch, 1.5*inch, 1.5*inch, 1.5*inch])
-                    product_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#16a085')),
-                        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                        ('FONTSIZE', (0, 0), (-1, 0), 10),
-                        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-                        ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                        ('FONTSIZE', (0, 1), (-1, -1), 9),
-                    ]))
-                    elements.append(product_table)
-                    elements.append(Spacer(1, 20))
-                    
-                    # Cash register reconciliation
-                    cursor.execute('''
-                        SELECT cash_in_register, reading_date
-                        FROM counter_readings
-                        WHERE user_id = ?
-                        ORDER BY reading_date DESC
-                        LIMIT 1
-                    ''', (current_user.id,))
-                    
-                    latest_reading = cursor.fetchone()
-                    
-                    if latest_reading:
-                        elements.append(Paragraph("Cash Register Status", styles['Heading3']))
-                        elements.append(Spacer(1, 10))
-                        
-                        # Calculate expected vs actual
-                        actual_cash = latest_reading[0]
-                        last_date = latest_reading[1]
-                        
-                        cursor.execute('''
-                            SELECT COALESCE(SUM(total_revenue), 0)
-                            FROM sales_records
-                            WHERE user_id = ? AND created_at >= ?
-                        ''', (current_user.id, last_date))
-                        
-                        sales_since = cursor.fetchone()[0]
-                        
-                        cursor.execute('''
-                            SELECT 
-                                COALESCE(SUM(CASE WHEN event_type = 'withdrawal' THEN amount ELSE 0 END), 0) as withdrawals,
-                                COALESCE(SUM(CASE WHEN event_type = 'deposit' THEN amount ELSE 0 END), 0) as deposits
-                            FROM cash_register_events
-                            WHERE user_id = ? AND event_date >= ?
-                        ''', (current_user.id, last_date))
-                        
-                        cash_events = cursor.fetchone()
-                        withdrawals = cash_events[0]
-                        deposits = cash_events[1]
-                        
-                        # Get previous cash
-                        cursor.execute('''
-                            SELECT cash_in_register
-                            FROM counter_readings
-                            WHERE user_id = ? AND reading_date < ?
-                            ORDER BY reading_date DESC
-                            LIMIT 1
-                        ''', (current_user.id, last_date))
-                        
-                        prev = cursor.fetchone()
-                        prev_cash = prev[0] if prev else 0
-                        
-                        expected_cash = prev_cash + sales_since + deposits - withdrawals
-                        difference = actual_cash - expected_cash
-                        
-                        cash_data = [
-                            ['Description', 'Amount'],
-                            ['Expected Cash in Register', f"€{expected_cash:.2f}"],
-                            ['Actual Cash in Register', f"€{actual_cash:.2f}"],
-                            ['Difference', f"€{difference:.2f}"],
-                            ['Status', 'OK' if abs(difference) < 5 else ('Warning' if abs(difference) < 10 else 'Check Required')]
-                        ]
-                        
-                        cash_table = Table(cash_data, colWidths=[3*inch, 2*inch])
-                        cash_table.setStyle(TableStyle([
-                            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e74c3c' if abs(difference) > 10 else '#e67e22' if abs(difference) > 5 else '#27ae60')),
-                            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                            ('FONTSIZE', (0, 0), (-1, 0), 12),
-                            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                            ('FONTSIZE', (0, 1), (-1, -1), 10),
-                        ]))
-                        elements.append(cash_table)
-                
-                conn.close()
-            except Exception as e:
-                # If sales tracking fails, just skip it and continue with regular PDF
-                print(f"Sales statistics error in PDF: {e}")
-        
-        # Build PDF
-        doc.build(elements)
-        buffer.seek(0)
-        
+        conn = get_db()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT status, error, render_ms, created_at, started_at, finished_at
+            FROM report_jobs
+            WHERE id = ? AND user_id = ?
+        ''', (job_id, current_user.id))
+        row = cursor.fetchone()
+
+        if not row:
+            return jsonify({'success': False, 'error': 'Report not found'}), 404
+
+        job = {
+            'id': job_id,
+            'status': row[0],
+            'error': row[1],
+            'render_ms': row[2],
+            'created_at': row[3],
+            'started_at': row[4],
+            'finished_at': row[5]
+        }
+        if row[0] == 'queued':
+            cursor.execute('''
+                SELECT COUNT(*) FROM report_jobs
+                WHERE status = 'queued' AND created_at <= ? AND id != ?
+            ''', (row[3], job_id))
+            job['queue_position'] = cursor.fetchone()[0] + 1
+        if row[0] == 'done':
+            job['download_url'] = url_for('download_report', job_id=job_id)
+
+        return jsonify({'success': True, 'job': job})
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/reports/<job_id>/download', methods=['GET'])
+@login_required
+def download_report(job_id):
+    """Download a finished report"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT status, file_path, download_name
+            FROM report_jobs
+            WHERE id = ? AND user_id = ?
+        ''', (job_id, current_user.id))
+        row = cursor.fetchone()
+
+        if not row:
+            return jsonify({'success': False, 'error': 'Report not found'}), 404
+        if row[0] != 'done':
+            return jsonify({'success': False, 'error': 'Report is not ready', 'status': row[0]}), 409
+        if not os.path.exists(row[1]):
+            return jsonify({'success': False, 'error': 'Report file has expired'}), 410
+
         return send_file(
-            buffer,
+            row[1],
             as_attachment=True,
-            download_name=f'coffee_cost_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf',
+            download_name=row[2],
             mimetype='application/pdf'
         )
-    
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+# Bulk report export
+app.config['REPORT_EXPORT_PROCESSES'] = int(os.environ.get('REPORT_EXPORT_PROCESSES', min(4, os.cpu_count() or 1)))
+app.config['REPORT_EXPORT_START_METHOD'] = os.environ.get('REPORT_EXPORT_START_METHOD', 'spawn')
+
+_export_executor = None
+_export_executor_pid = None
+_export_executor_lock = threading.Lock()
+
+def get_export_executor():
+    """This process's pool of report rendering processes, created on first use
+
+    ReportLab rendering is CPU bound, so reports are rendered in separate
+    processes. They are spawned rather than forked by default so they do not
+    inherit this worker's threads and open connections.
+    """
+    global _export_executor, _export_executor_pid
+    with _export_executor_lock:
+        if _export_executor is None or _export_executor_pid != os.getpid():
+            _export_executor = ProcessPoolExecutor(
+                max_workers=app.config['REPORT_EXPORT_PROCESSES'],
+                mp_context=multiprocessing.get_context(app.config['REPORT_EXPORT_START_METHOD'])
+            )
+            _export_executor_pid = os.getpid()
+        return _export_executor
+
+def discard_export_executor(executor):
+    """Drop a broken pool so the next export starts a fresh one"""
+    global _export_executor
+    with _export_executor_lock:
+        if _export_executor is executor:
+            _export_executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+class _ZipSink:
+    """Write-only file object collecting ZIP output until it is taken"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def stream_report_zip(reports, user_id):
+    """Yield a ZIP archive of (file name, cache key, report input) reports as they are rendered
+
+    Cached reports are copied straight in; the rest render on the export
+    process pool with at most two per process in flight, so memory stays
+    flat however many reports are exported.
+    """
+    executor = get_export_executor()
+    window = app.config['REPORT_EXPORT_PROCESSES'] * 2
+    reports = iter(reports)
+    pending = {}
+    exhausted = False
+    sink = _ZipSink()
+
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        while True:
+            while not exhausted and len(pending) < window:
+                report = next(reports, None)
+                if report is None:
+                    exhausted = True
+                    break
+                file_name, key, data = report
+                cached = report_cache.open(key)
+                if cached is not None:
+                    with cached, archive.open(file_name, 'w') as entry:
+                        shutil.copyfileobj(cached, entry)
+                    yield sink.take()
+                    continue
+                try:
+                    future = executor.submit(render_report_in_process, DATABASE_PATH, data, user_id)
+                except BrokenProcessPool:
+                    discard_export_executor(executor)
+                    executor = get_export_executor()
+                    future = executor.submit(render_report_in_process, DATABASE_PATH, data, user_id)
+                pending[future] = (file_name, key)
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_name, key = pending.pop(future)
+                try:
+                    pdf = future.result()
+                except BrokenProcessPool as e:
+                    discard_export_executor(executor)
+                    archive.writestr(f'{file_name}.error.txt', f'Could not render this report: {e}\n')
+                except Exception as e:
+                    archive.writestr(f'{file_name}.error.txt', f'Could not render this report: {e}\n')
+                else:
+                    report_cache.put(key, pdf)
+                    archive.writestr(file_name, pdf)
+                yield sink.take()
+
+    yield sink.take()
+
+@app.route('/api/reports/bulk', methods=['GET', 'POST'])
+@login_required
+def export_reports():
+    """Download the reports of several saved configurations (or all accessible ones) as one ZIP"""
+    try:
+        if request.method == 'POST':
+            config_ids = (request.json or {}).get('config_ids', 'all')
+        else:
+            config_ids = request.args.get('config_ids', 'all')
+            if config_ids != 'all':
+                config_ids = [int(config_id) for config_id in config_ids.split(',') if config_id.strip()]
+
+        conn = get_db()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT id, name FROM configurations WHERE user_id = ?
+            UNION
+            SELECT c.id, c.name
+            FROM configurations c
+            JOIN shared_configs sc ON c.id = sc.config_id
+            WHERE sc.shared_with_user_id = ?
+            ORDER BY name
+        ''', (current_user.id, current_user.id))
+        accessible = dict(cursor.fetchall())
+
+        if config_ids == 'all':
+            config_ids = list(accessible)
+        else:
+            config_ids = [int(config_id) for config_id in config_ids]
+            missing = [config_id for config_id in config_ids if config_id not in accessible]
+            if missing:
+                return jsonify({
+                    'success': False,
+                    'error': f'Configurations not found or access denied: {missing}'
+                }), 404
+
+        if not config_ids:
+            return jsonify({'success': False, 'error': 'No configurations to export'}), 404
+
+        reports = []
+        for config_id in config_ids:
+            config = load_costing_config(cursor, config_id)
+            data = dict(config, results=cost_engine.calculate(config))
+            safe_name = re.sub(r'[^\w\- ]+', '_', accessible[config_id]).strip() or 'config'
+            reports.append((f'{config_id}_{safe_name}.pdf', report_cache_key(cursor, data, current_user.id), data))
+
+        return app.response_class(
+            stream_report_zip(reports, current_user.id),
+            mimetype='application/zip',
+            headers={
+                'Content-Disposition': f'attachment; filename=coffee_reports_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip'
+            }
+        )
+
     except Exception as e:
         return jsonify({
             'success': False,
@@ -731,10 +2573,11 @@ def generate_pdf():
 
 @app.route('/api/configs', methods=['GET'])
 @login_required
+@versioned()
 def get_configs():
     """Get all saved configurations (owned and shared with user)"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get user's own configurations
@@ -778,7 +2621,6 @@ def get_configs():
                 'owner_name': row[6]
             })
         
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -793,10 +2635,11 @@ def get_configs():
 
 @app.route('/api/configs/<int:config_id>', methods=['GET'])
 @login_required
+@versioned()
 def get_config(config_id):
     """Get a specific configuration by ID (if owned or shared)"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Check if user owns this config or has access via sharing
@@ -811,7 +2654,6 @@ def get_config(config_id):
         ''', (config_id, current_user.id, current_user.id))
         
         row = cursor.fetchone()
-        conn.close()
         
         if row:
             return jsonify({
@@ -859,7 +2701,7 @@ def save_config():
                 'error': 'Configuration name is required'
             }), 400
         
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         
         if config_id:
@@ -870,7 +2712,6 @@ def save_config():
             config_owner = cursor.fetchone()
             
             if not config_owner:
-                conn.close()
                 return jsonify({'success': False, 'error': 'Configuration not found'}), 404
             
             # Check if user is owner or has edit access
@@ -886,7 +2727,6 @@ def save_config():
                 has_edit_access = result and result[0]
             
             if not is_owner and not has_edit_access:
-                conn.close()
                 return jsonify({'success': False, 'error': 'Permission denied'}), 403
             
             cursor.execute('''
@@ -906,14 +2746,15 @@ def save_config():
                 
                 result_id = cursor.lastrowid
             except sqlite3.IntegrityError:
-                conn.close()
                 return jsonify({
                     'success': False,
                     'error': 'A configuration with this name already exists'
                 }), 400
         
+        bump_config_version(cursor, result_id)
+        bump_config_audience(cursor, result_id)
+        record_config_change(cursor, result_id, 'config_saved', {'name': name})
         conn.commit()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -932,20 +2773,21 @@ def save_config():
 def delete_config(config_id):
     """Delete a configuration (owner only)"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         
+        bump_config_audience(cursor, config_id)
         cursor.execute('DELETE FROM configurations WHERE id = ? AND user_id = ?', (config_id, current_user.id))
         
         if cursor.rowcount == 0:
-            conn.close()
             return jsonify({
                 'success': False,
                 'error': 'Configuration not found or permission denied'
             }), 404
         
+        bump_config_version(cursor, config_id)
+        record_config_change(cursor, config_id, 'config_deleted', {})
         conn.commit()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -971,7 +2813,7 @@ def share_config(config_id):
         if not share_with_email:
             return jsonify({'success': False, 'error': 'Email required'}), 400
         
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Verify user owns the configuration
@@ -979,7 +2821,6 @@ def share_config(config_id):
         config = cursor.fetchone()
         
         if not config or config[0] != current_user.id:
-            conn.close()
             return jsonify({'success': False, 'error': 'Configuration not found or permission denied'}), 404
         
         # Find user to share with
@@ -987,13 +2828,11 @@ def share_config(config_id):
         share_user = cursor.fetchone()
         
         if not share_user:
-            conn.close()
             return jsonify({'success': False, 'error': 'User not found'}), 404
         
         share_user_id = share_user[0]
         
         if share_user_id == current_user.id:
-            conn.close()
             return jsonify({'success': False, 'error': 'Cannot share with yourself'}), 400
         
         # Add or update sharing
@@ -1004,13 +2843,13 @@ def share_config(config_id):
                 ON CONFLICT(config_id, shared_with_user_id) 
                 DO UPDATE SET can_edit = excluded.can_edit
             ''', (config_id, share_user_id, can_edit))
+            bump_config_version(cursor, config_id)
+            bump_config_audience(cursor, config_id)
             
             conn.commit()
-            conn.close()
             
             return jsonify({'success': True, 'message': 'Configuration shared successfully'})
         except sqlite3.IntegrityError as e:
-            conn.close()
             return jsonify({'success': False, 'error': 'Sharing failed'}), 400
     
     except Exception as e:
@@ -1018,10 +2857,11 @@ def share_config(config_id):
 
 @app.route('/api/configs/<int:config_id>/shared-users', methods=['GET'])
 @login_required
+@versioned()
 def get_shared_users(config_id):
     """Get list of users a configuration is shared with"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Verify user owns the configuration
@@ -1029,7 +2869,6 @@ def get_shared_users(config_id):
         config = cursor.fetchone()
         
         if not config or config[0] != current_user.id:
-            conn.close()
             return jsonify({'success': False, 'error': 'Permission denied'}), 403
         
         cursor.execute('''
@@ -1049,7 +2888,6 @@ def get_shared_users(config_id):
                 'shared_at': row[4]
             })
         
-        conn.close()
         
         return jsonify({'success': True, 'shared_users': shared_users})
     
@@ -1061,7 +2899,7 @@ def get_shared_users(config_id):
 def unshare_config(config_id, user_id):
     """Remove sharing access for a user"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Verify user owns the configuration
@@ -1069,16 +2907,16 @@ def unshare_config(config_id, user_id):
         config = cursor.fetchone()
         
         if not config or config[0] != current_user.id:
-            conn.close()
             return jsonify({'success': False, 'error': 'Permission denied'}), 403
         
+        bump_config_audience(cursor, config_id)
         cursor.execute('''
             DELETE FROM shared_configs 
             WHERE config_id = ? AND shared_with_user_id = ?
         ''', (config_id, user_id))
+        bump_config_version(cursor, config_id)
         
         conn.commit()
-        conn.close()
         
         return jsonify({'success': True, 'message': 'Sharing removed successfully'})
     
@@ -1088,10 +2926,11 @@ def unshare_config(config_id, user_id):
 # Tea Bag Management Endpoints
 @app.route('/api/tea-bags', methods=['GET'])
 @login_required
+@versioned()
 def get_tea_bags():
     """Get all tea bags for current user"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -1110,7 +2949,6 @@ def get_tea_bags():
                 'created_at': row[3]
             })
         
-        conn.close()
         
         return jsonify({'success': True, 'tea_bags': tea_bags})
     
@@ -1130,7 +2968,7 @@ def add_tea_bag():
         if not name or cost_per_unit <= 0:
             return jsonify({'success': False, 'error': 'Name and cost are required'}), 400
         
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         
         if tea_bag_id:
@@ -1142,7 +2980,6 @@ def add_tea_bag():
             ''', (name, cost_per_unit, tea_bag_id, current_user.id))
             
             if cursor.rowcount == 0:
-                conn.close()
                 return jsonify({'success': False, 'error': 'Tea bag not found'}), 404
         else:
             # Insert new
@@ -1152,11 +2989,10 @@ def add_tea_bag():
                     VALUES (?, ?, ?)
                 ''', (current_user.id, name, cost_per_unit))
             except sqlite3.IntegrityError:
-                conn.close()
                 return jsonify({'success': False, 'error': 'Tea bag with this name already exists'}), 400
         
+        bump_data_version(cursor, current_user.id)
         conn.commit()
-        conn.close()
         
         return jsonify({'success': True, 'message': 'Tea bag saved successfully'})
     
@@ -1168,17 +3004,16 @@ def add_tea_bag():
 def delete_tea_bag(tea_bag_id):
     """Delete a tea bag"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         
         cursor.execute('DELETE FROM tea_bags WHERE id = ? AND user_id = ?', (tea_bag_id, current_user.id))
         
         if cursor.rowcount == 0:
-            conn.close()
             return jsonify({'success': False, 'error': 'Tea bag not found'}), 404
         
+        bump_data_version(cursor, current_user.id)
         conn.commit()
-        conn.close()
         
         return jsonify({'success': True, 'message': 'Tea bag deleted successfully'})
     
@@ -1187,65 +3022,107 @@ def delete_tea_bag(tea_bag_id):
 
 # Sales Tracking Endpoints
 
+# Largest page the history endpoints return (the limit parameter is clamped to it)
+app.config['PAGE_SIZE_MAX'] = int(os.environ.get('PAGE_SIZE_MAX', 500))
+
+def encode_page_cursor(sort_value, row_id):
+    """Opaque cursor pointing after the last row of a page"""
+    return base64.urlsafe_b64encode(json.dumps([sort_value, row_id]).encode()).decode().rstrip('=')
+
+def decode_page_cursor(cursor):
+    """(sort value, id) from a cursor made by encode_page_cursor"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid page cursor')
+    if not isinstance(values, list) or len(values) != 2 or not isinstance(values[1], int):
+        raise ValueError('Invalid page cursor')
+    return values
+
+def keyset_page(cursor, query, params, sort_column, default_limit, args=None):
+    """Fetch one newest-first page of `query`, keyed on (sort_column, id)
+
+    `query` is a SELECT whose first two columns are id and sort_column, with a
+    WHERE clause and no ORDER BY. Each page continues strictly after the
+    `cursor` in args (default: the request's query arguments), so its cost
+    does not depend on how far back it is. Returns (rows, next_cursor or None).
+    """
+    args = request.args if args is None else args
+    limit = max(1, min(args.get('limit', default_limit, type=int), app.config['PAGE_SIZE_MAX']))
+    page_cursor = args.get('cursor')
+    if page_cursor:
+        query += f' AND ({sort_column}, id) < (?, ?)'
+        params = tuple(params) + tuple(decode_page_cursor(page_cursor))
+
+    cursor.execute(f'{query} ORDER BY {sort_column} DESC, id DESC LIMIT ?', tuple(params) + (limit + 1,))
+    rows = cursor.fetchall()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_page_cursor(rows[-1][1], rows[-1][0])
+
 @app.route('/api/counter-readings', methods=['GET'])
 @login_required
+@versioned()
 def get_counter_readings():
-    """Get all counter readings for the current user/config"""
+    """Get counter readings for the current user/config, newest first, a page at a time"""
     try:
         config_id = request.args.get('config_id', type=int)
         
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         
-        # Build query based on whether config_id is provided
-        if config_id:
-            # Verify user has access to this config
-            cursor.execute('''
-                SELECT id FROM configurations WHERE id = ? AND user_id = ?
-                UNION
-                SELECT c.id FROM configurations c
-                JOIN shared_configs sc ON c.id = sc.config_id
-                WHERE c.id = ? AND sc.shared_with_user_id = ?
-            ''', (config_id, current_user.id, config_id, current_user.id))
-            
-            if not cursor.fetchone():
-                conn.close()
-                return jsonify({'success': False, 'error': 'Access denied'}), 403
-            
-            cursor.execute('''
-                SELECT id, reading_date, counter_data, cash_in_register, notes, config_id
-                FROM counter_readings
-                WHERE config_id = ?
-                ORDER BY reading_date DESC
-                LIMIT 50
-            ''', (config_id,))
-        else:
-            # Get all readings for user (backward compatibility)
-            cursor.execute('''
-                SELECT id, reading_date, counter_data, cash_in_register, notes, config_id
-                FROM counter_readings
-                WHERE user_id = ?
-                ORDER BY reading_date DESC
-                LIMIT 50
-            ''', (current_user.id,))
-        
-        readings = []
-        for row in cursor.fetchall():
-            readings.append({
-                'id': row[0],
-                'reading_date': row[1],
-                'counter_data': json.loads(row[2]),
-                'cash_in_register': row[3],
-                'notes': row[4],
-                'config_id': row[5]
-            })
+        # Verify user has access to this config
+        if config_id and not user_can_access_config(cursor, config_id, current_user.id):
+            return jsonify({'success': False, 'error': 'Access denied'}), 403
         
-        conn.close()
-        return jsonify({'success': True, 'readings': readings})
+        return jsonify({'success': True, **reading_history(cursor, current_user.id, config_id)})
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
+def reading_history(cursor, user_id, config_id, args=None):
+    """A page of a config's (or all of a user's) counter readings as {'readings', 'next_cursor'}"""
+    if config_id:
+        scope, scope_params = 'config_id = ?', (config_id,)
+    else:
+        # Get all readings for user (backward compatibility)
+        scope, scope_params = 'user_id = ?', (user_id,)
+    
+    rows, next_cursor = keyset_page(cursor, f'''
+        SELECT id, reading_date, cash_in_register, notes, config_id
+        FROM counter_readings
+        WHERE {scope}
+    ''', scope_params, 'reading_date', 50, args)
+    return {'readings': reading_items(cursor, rows), 'next_cursor': next_cursor}
+
+def reading_items(cursor, rows):
+    """(id, reading_date, cash_in_register, notes, config_id) rows as the API lists readings"""
+    counter_data = load_counter_data(cursor, [row[0] for row in rows])
+    
+    readings = []
+    for row in rows:
+        readings.append({
+            'id': row[0],
+            'reading_date': row[1],
+            'counter_data': counter_data[row[0]],
+            'cash_in_register': row[2],
+            'notes': row[3],
+            'config_id': row[4]
+        })
+    return readings
+
+def record_reading_added(cursor, reading_id, config_id):
+    """Log a new reading, as the readings list shows it, for the config's live update streams"""
+    if not config_id:
+        return
+    cursor.execute('''
+        SELECT id, reading_date, cash_in_register, notes, config_id
+        FROM counter_readings
+        WHERE id = ?
+    ''', (reading_id,))
+    record_config_change(cursor, config_id, 'reading_added', reading_items(cursor, cursor.fetchall())[0])
+
 @app.route('/api/counter-readings', methods=['POST'])
 @login_required
 def submit_counter_reading():
@@ -1263,7 +3140,7 @@ def submit_counter_reading():
         if not reading_date:
             reading_date = datetime.now().isoformat()
         
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Verify user has access to this config if provided
@@ -1277,7 +3154,6 @@ def submit_counter_reading():
             ''', (config_id, current_user.id, config_id, current_user.id))
             
             if not cursor.fetchone():
-                conn.close()
                 return jsonify({'success': False, 'error': 'Access denied'}), 403
         
         # Insert new counter reading with custom date/time
@@ -1287,85 +3163,19 @@ def submit_counter_reading():
         ''', (current_user.id, config_id, json.dumps(counter_data), cash_in_register, notes, reading_date))
         
         new_reading_id = cursor.lastrowid
-        
-        # Get the previous reading to calculate sales (same config or user if no config)
-        if config_id:
-            cursor.execute('''
-                SELECT id, counter_data, cash_in_register
-                FROM counter_readings
-                WHERE config_id = ? AND id < ?
-                ORDER BY reading_date DESC
-                LIMIT 1
-            ''', (config_id, new_reading_id))
-        else:
-            cursor.execute('''
-                SELECT id, counter_data, cash_in_register
-                FROM counter_readings
-                WHERE user_id = ? AND id < ? AND config_id IS NULL
-                ORDER BY reading_date DESC
-                LIMIT 1
-            ''', (current_user.id, new_reading_id))
-        
-        prev_reading = cursor.fetchone()
-        
-        sales_calculated = []
-        
-        if prev_reading:
-            prev_id = prev_reading[0]
-            prev_counter_data = json.loads(prev_reading[1])
-            
-            # Calculate sales for each product
-            for product_name, current_count in counter_data.items():
-                prev_count = prev_counter_data.get(product_name, 0)
-                quantity_sold = current_count - prev_count
-                
-                if quantity_sold > 0:
-                    if product_name in product_prices:
-                        unit_price = product_prices[product_name]
-                        total_revenue = quantity_sold * unit_price
-                        
-                        # Insert sales record
-                        cursor.execute('''
-                            INSERT INTO sales_records 
-                            (user_id, config_id, start_reading_id, end_reading_id, product_name, quantity_sold, unit_price, total_revenue)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                        ''', (current_user.id, config_id, prev_id, new_reading_id, product_name, quantity_sold, unit_price, total_revenue))
-                        
-                        sales_calculated.append({
-                            'product': product_name,
-                            'quantity': quantity_sold,
-                            'revenue': total_revenue
-                        })
-                    else:
-                        # Log warning if no price found for product with sales
-                        print(f"Warning: No price found for product '{product_name}' with {quantity_sold} units sold")
-        else:
-            # FIRST READING: Treat counter values as sales (assuming counters started at 0)
-            # This allows immediate revenue tracking from the first reading
-            for product_name, current_count in counter_data.items():
-                if current_count > 0:
-                    if product_name in product_prices:
-                        unit_price = product_prices[product_name]
-                        total_revenue = current_count * unit_price
-                        
-                        # Insert sales record with NULL start_reading_id (first reading scenario)
-                        cursor.execute('''
-                            INSERT INTO sales_records 
-                            (user_id, config_id, start_reading_id, end_reading_id, product_name, quantity_sold, unit_price, total_revenue)
-                            VALUES (?, ?, NULL, ?, ?, ?, ?, ?)
-                        ''', (current_user.id, config_id, new_reading_id, product_name, current_count, unit_price, total_revenue))
-                        
-                        sales_calculated.append({
-                            'product': product_name,
-                            'quantity': current_count,
-                            'revenue': total_revenue
-                        })
-                    else:
-                        # Log warning if no price found for product with sales
-                        print(f"Warning: No price found for product '{product_name}' with {current_count} units sold")
+        write_counter_values(cursor, [(new_reading_id, counter_data)])
+        
+        # Sales since the previous reading by date (none for the first reading,
+        # which sets the baseline); a backdated reading also re-measures the next one
+        sales_calculated, changed_users = link_reading(cursor, new_reading_id, product_prices)
+        update_cash_ledger(cursor, current_user.id, config_id)
+        for user_id in changed_users:
+            bump_data_version(cursor, user_id)
+        bump_config_version(cursor, config_id)
+        record_reading_added(cursor, new_reading_id, config_id)
+        record_balance_change(cursor, current_user.id, config_id)
         
         conn.commit()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -1382,7 +3192,7 @@ def submit_counter_reading():
 def delete_counter_reading(reading_id):
     """Delete a counter reading and its associated sales records"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Verify the reading exists and user has access
@@ -1395,7 +3205,6 @@ def delete_counter_reading(reading_id):
         reading = cursor.fetchone()
         
         if not reading:
-            conn.close()
             return jsonify({'success': False, 'error': 'Reading not found'}), 404
         
         # Check if user owns the reading or has access through shared config
@@ -1409,193 +3218,651 @@ def delete_counter_reading(reading_id):
             ''', (reading[1], current_user.id, reading[1], current_user.id))
             
             if not cursor.fetchone():
-                conn.close()
                 return jsonify({'success': False, 'error': 'Permission denied'}), 403
         else:  # No config, check user ownership
             if reading[0] != current_user.id:
-                conn.close()
                 return jsonify({'success': False, 'error': 'Permission denied'}), 403
         
-        # Delete associated sales records (CASCADE should handle this, but let's be explicit)
-        cursor.execute('DELETE FROM sales_records WHERE start_reading_id = ? OR end_reading_id = ?', 
-                      (reading_id, reading_id))
-        
-        # Delete the reading
-        cursor.execute('DELETE FROM counter_readings WHERE id = ?', (reading_id,))
+        # Delete the reading and its sales; the next reading is re-measured
+        # from the previous one so no interval is left without sales
+        changed_users = delete_reading(cursor, reading_id)
+        update_cash_ledger(cursor, reading[0], reading[1])
+        for user_id in changed_users:
+            bump_data_version(cursor, user_id)
+        bump_config_version(cursor, reading[1])
+        record_config_change(cursor, reading[1], 'reading_deleted', {'id': reading_id})
+        record_balance_change(cursor, reading[0], reading[1])
         
         conn.commit()
-        conn.close()
         
         return jsonify({'success': True, 'message': 'Reading deleted successfully'})
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
+# Bulk counter-reading import
+app.config['READING_IMPORT_MAX_ROWS'] = int(os.environ.get('READING_IMPORT_MAX_ROWS', 100000))
+
+# Row errors listed in a rejected import (the total count is always reported)
+READING_IMPORT_MAX_ERRORS = 100
+# CSV columns that are not product counters
+READING_IMPORT_FIELDS = ('reading_date', 'cash_in_register', 'notes')
+
+def user_can_access_config(cursor, config_id, user_id):
+    """True if the user owns the configuration or it is shared with them"""
+    cursor.execute('''
+        SELECT id FROM configurations WHERE id = ? AND user_id = ?
+        UNION
+        SELECT c.id FROM configurations c
+        JOIN shared_configs sc ON c.id = sc.config_id
+        WHERE c.id = ? AND sc.shared_with_user_id = ?
+    ''', (config_id, user_id, config_id, user_id))
+    return cursor.fetchone() is not None
+
+def config_vending_prices(cursor, config_id):
+    """Vending prices set on a configuration's drinks as {product name: price}"""
+    if not config_id:
+        return {}
+    cursor.execute('SELECT drinks FROM configurations WHERE id = ?', (config_id,))
+    row = cursor.fetchone()
+    drinks = json.loads(row[0]) if row and row[0] else []
+    return {drink['name']: drink['vending_price'] for drink in drinks
+            if isinstance(drink.get('vending_price'), (int, float)) and drink['vending_price'] > 0}
+
+def reading_import_format(fmt, filename='', mimetype=''):
+    """'csv' or 'ndjson' from an explicit format, file extension or content type"""
+    if fmt:
+        if fmt not in ('csv', 'ndjson'):
+            raise ValueError(f"Unsupported import format '{fmt}' (use csv or ndjson)")
+        return fmt
+    if filename.lower().endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if filename.lower().endswith('.csv'):
+        return 'csv'
+    if mimetype in ('application/x-ndjson', 'application/jsonl', 'application/json'):
+        return 'ndjson'
+    return 'csv'
+
+def _import_date(value):
+    """Parse an ISO 8601 reading date as a naive local datetime"""
+    parsed = datetime.fromisoformat(str(value).strip())
+    if parsed.tzinfo:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+def _import_number(value, field, integer=False):
+    """Validate a non-negative number from a CSV cell or JSON value"""
+    if value is None or isinstance(value, bool):
+        raise ValueError(f'{field} must be a number')
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a number, got '{value}'")
+    if not math.isfinite(number) or number < 0:
+        raise ValueError(f'{field} must be a non-negative number')
+    if integer:
+        if not number.is_integer():
+            raise ValueError(f'{field} must be a whole number')
+        return int(number)
+    return number
+
+def _import_reading(fields):
+    """Validate one imported row into a reading (raises ValueError)"""
+    if not fields.get('reading_date'):
+        raise ValueError('reading_date is required')
+    try:
+        reading_date = _import_date(fields['reading_date'])
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid reading_date '{fields['reading_date']}'")
+
+    cash = fields.get('cash_in_register')
+    cash_in_register = 0.0 if cash in (None, '') else _import_number(cash, 'cash_in_register')
+
+    counter_data = fields.get('counter_data')
+    if not isinstance(counter_data, dict) or not counter_data:
+        raise ValueError('at least one counter value is required')
+    counter_data = {name: _import_number(value, f"counter '{name}'", integer=True)
+                    for name, value in counter_data.items()}
+
+    product_prices = fields.get('product_prices') or {}
+    if not isinstance(product_prices, dict):
+        raise ValueError('product_prices must be an object')
+    product_prices = {name: _import_number(value, f"price of '{name}'")
+                      for name, value in product_prices.items()}
+
+    notes = fields.get('notes') or ''
+    if not isinstance(notes, str):
+        raise ValueError('notes must be text')
+
+    return {
+        'reading_date': reading_date,
+        'cash_in_register': cash_in_register,
+        'counter_data': counter_data,
+        'product_prices': product_prices,
+        'notes': notes
+    }
+
+def _csv_import_rows(text):
+    """(line number, fields, error) per CSV row; non-standard columns are product counters"""
+    reader = csv.DictReader(StringIO(text))
+    columns = [name.strip() for name in reader.fieldnames or []]
+    if 'reading_date' not in columns:
+        raise ValueError('CSV header must include a reading_date column')
+    reader.fieldnames = columns
+    products = [name for name in columns if name and name not in READING_IMPORT_FIELDS]
+
+    for row in reader:
+        if row.get(None):
+            yield reader.line_num, None, 'more values than header columns'
+            continue
+        yield reader.line_num, {
+            'reading_date': (row.get('reading_date') or '').strip(),
+            'cash_in_register': (row.get('cash_in_register') or '').strip(),
+            'notes': row.get('notes') or '',
+            'counter_data': {name: row[name].strip() for name in products if (row.get(name) or '').strip()}
+        }, None
+
+def _ndjson_import_rows(text):
+    """(line number, fields, error) per non-blank NDJSON line"""
+    for line_number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            fields = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f'invalid JSON: {e}'
+            continue
+        if not isinstance(fields, dict):
+            yield line_number, None, 'expected a JSON object'
+            continue
+        yield line_number, fields, None
+
+def parse_reading_import(text, fmt):
+    """Validate every row of an import; returns (readings, [{'row', 'error'}])"""
+    rows = _ndjson_import_rows(text) if fmt == 'ndjson' else _csv_import_rows(text)
+    readings = []
+    errors = []
+    for row_number, fields, error in rows:
+        if error is None:
+            try:
+                reading = _import_reading(fields)
+            except ValueError as e:
+                error = str(e)
+            else:
+                reading['row'] = row_number
+                readings.append(reading)
+                continue
+        errors.append({'row': row_number, 'error': error})
+    return readings, errors
+
+def _latest_reading(cursor, user_id, config_id):
+    """(id, reading_date) of the reading new sales are measured from"""
+    scope, scope_params = _reading_scope(config_id, user_id)
+    cursor.execute(f'''
+        SELECT id, reading_date
+        FROM counter_readings
+        WHERE {scope}
+        ORDER BY reading_date DESC, id DESC
+        LIMIT 1
+    ''', scope_params)
+    return cursor.fetchone()
+
+def import_order_errors(cursor, user_id, config_id, readings):
+    """Row errors for readings dated before the latest reading already recorded
+
+    The importer only appends after the latest reading. Unlike a single
+    submission, which links a backdated reading in between its neighbours,
+    it never rewrites sales that are already recorded.
+    """
+    latest = _latest_reading(cursor, user_id, config_id)
+    if not latest:
+        return []
+    try:
+        latest_date = _import_date(latest[1])
+    except (TypeError, ValueError):
+        return []
+    return [{'row': reading['row'], 'error': f'reading_date is before the latest existing reading ({latest[1]}); imports can only add readings after it, submit earlier readings one by one'}
+            for reading in readings if reading['reading_date'] < latest_date]
+
+def import_counter_readings(cursor, user_id, config_id, readings, product_prices):
+    """Insert validated readings and their sales in one pass
+
+    Only appends: no reading may be dated before the latest one in the
+    scope (see import_order_errors). For such readings the result is the same
+    as submitting them one by one in date order, except that sales are dated
+    by their reading instead of the import time.
+    Without an earlier reading in the scope the first one only sets the
+    baseline counters. Must run inside the caller's write transaction.
+    """
+    scope, scope_params = _reading_scope(config_id, user_id)
+    latest = _latest_reading(cursor, user_id, config_id)
+    readings = sorted(readings, key=lambda reading: reading['reading_date'])
+
+    cursor.execute('SELECT COALESCE(MAX(id), 0) FROM counter_readings')
+    last_existing_id = cursor.fetchone()[0]
+    cursor.executemany('''
+        INSERT INTO counter_readings (user_id, config_id, counter_data, cash_in_register, notes, reading_date)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [(user_id, config_id, json.dumps(reading['counter_data']), reading['cash_in_register'],
+           reading['notes'], reading['reading_date'].isoformat()) for reading in readings])
+
+    # The transaction holds the write lock, so every id above the old maximum is ours
+    cursor.execute('SELECT id FROM counter_readings WHERE id > ? ORDER BY id', (last_existing_id,))
+    reading_ids = [row[0] for row in cursor.fetchall()]
+    write_counter_values(cursor, [(reading_id, reading['counter_data'])
+                                  for reading_id, reading in zip(reading_ids, readings)])
+
+    previous_id, previous_counts = None, None
+    if latest:
+        previous_id = latest[0]
+        previous_counts = load_counter_data(cursor, [previous_id])[previous_id]
+    sales = []
+    unpriced = {}
+    for reading_id, reading in zip(reading_ids, readings):
+        if previous_id is not None:
+            created_at = reading['reading_date'].strftime('%Y-%m-%d %H:%M:%S')
+            for product_name, current_count in reading['counter_data'].items():
+                quantity_sold = current_count - previous_counts.get(product_name, 0)
+                if quantity_sold <= 0:
+                    continue
+                unit_price = reading['product_prices'].get(product_name, product_prices.get(product_name))
+                if unit_price is None:
+                    unpriced[product_name] = unpriced.get(product_name, 0) + quantity_sold
+                    continue
+                sales.append((user_id, config_id, previous_id, reading_id, product_name,
+                              quantity_sold, unit_price, quantity_sold * unit_price, created_at))
+        previous_id, previous_counts = reading_id, reading['counter_data']
+
+    cursor.executemany('''
+        INSERT INTO sales_records
+        (user_id, config_id, start_reading_id, end_reading_id, product_name, quantity_sold, unit_price, total_revenue, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', sales)
+
+    update_sales_daily(cursor, f'end_reading_id >= ? AND {scope}', (reading_ids[0],) + scope_params)
+    append_reading_revenue(cursor, user_id, config_id, reading_ids[0])
+    update_cash_ledger(cursor, user_id, config_id)
+    bump_data_version(cursor, user_id)
+    bump_config_version(cursor, config_id)
+    record_config_change(cursor, config_id, 'readings_imported', {'count': len(reading_ids)})
+    record_balance_change(cursor, user_id, config_id)
+
+    return {
+        'imported': len(reading_ids),
+        'first_reading_id': reading_ids[0],
+        'last_reading_id': reading_ids[-1],
+        'baseline_reading_id': None if latest else reading_ids[0],
+        'sales_records': len(sales),
+        'revenue': round(sum(sale[7] for sale in sales), 2),
+        'unpriced_products': unpriced
+    }
+
+def run_reading_import(conn, user_id, config_id, text, fmt, product_prices=None, dry_run=False):
+    """Validate and import a CSV/NDJSON file in one transaction; returns (result, errors)
+
+    Nothing is written if any row fails validation or dry_run is set. Product
+    prices default to the configuration's vending prices; a row's own
+    product_prices (NDJSON) take precedence.
+    """
+    readings, errors = parse_reading_import(text, fmt)
+    max_rows = app.config['READING_IMPORT_MAX_ROWS']
+    if len(readings) + len(errors) > max_rows:
+        raise ValueError(f'Imports are limited to {max_rows} rows')
+    if not readings and not errors:
+        raise ValueError('No readings found in the import')
+
+    cursor = conn.cursor()
+    if product_prices is None:
+        product_prices = config_vending_prices(cursor, config_id)
+    elif not isinstance(product_prices, dict):
+        raise ValueError('product_prices must be an object')
+    else:
+        product_prices = {name: _import_number(value, f"price of '{name}'")
+                          for name, value in product_prices.items()}
+
+    result = None
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        errors += import_order_errors(cursor, user_id, config_id, readings)
+        if not errors:
+            result = import_counter_readings(cursor, user_id, config_id, readings, product_prices)
+        if errors or dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    errors.sort(key=lambda error: error['row'])
+    return result, errors
+
+@app.route('/api/counter-readings/import', methods=['POST'])
+@login_required
+def import_readings():
+    """Bulk import counter readings from an uploaded CSV or NDJSON file"""
+    try:
+        upload = request.files.get('file')
+        if upload:
+            text = upload.read().decode('utf-8-sig')
+            fmt = reading_import_format(request.values.get('format'), upload.filename or '', upload.mimetype)
+        else:
+            text = request.get_data().decode('utf-8-sig')
+            fmt = reading_import_format(request.values.get('format'), mimetype=request.mimetype)
+
+        config_id = request.values.get('config_id', type=int)
+        product_prices = request.values.get('product_prices')
+        product_prices = json.loads(product_prices) if product_prices else None
+        dry_run = request.values.get('dry_run', '').lower() in ('1', 'true', 'yes')
+
+        conn = get_db()
+        cursor = conn.cursor()
+
+        if config_id and not user_can_access_config(cursor, config_id, current_user.id):
+            return jsonify({'success': False, 'error': 'Access denied'}), 403
+
+        result, errors = run_reading_import(conn, current_user.id, config_id, text, fmt, product_prices, dry_run)
+        if errors:
+            return jsonify({
+                'success': False,
+                'error': f'{len(errors)} rows failed validation, nothing was imported',
+                'error_count': len(errors),
+                'errors': errors[:READING_IMPORT_MAX_ERRORS]
+            }), 400
+
+        return jsonify({'success': True, 'dry_run': dry_run, **result})
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.cli.command('import-readings')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user', 'email', required=True, help='Email of the account the readings are recorded for')
+@click.option('--config-id', type=int, help='Configuration the readings belong to')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='File format (default: from the extension)')
+@click.option('--prices', help="JSON object of product prices (default: the configuration's vending prices)")
+@click.option('--dry-run', is_flag=True, help='Validate and compute sales without writing anything')
+def import_readings_command(path, email, config_id, fmt, prices, dry_run):
+    """Bulk import counter readings from a CSV or NDJSON file"""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        text = f.read()
+
+    start = time.perf_counter()
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT id FROM users WHERE email = ?', (email,))
+        user = cursor.fetchone()
+        if not user:
+            raise click.ClickException(f'No user with email {email}')
+        if config_id and not user_can_access_config(cursor, config_id, user[0]):
+            raise click.ClickException(f'{email} has no access to configuration {config_id}')
+
+        try:
+            result, errors = run_reading_import(conn, user[0], config_id, text, reading_import_format(fmt, path),
+                                                json.loads(prices) if prices else None, dry_run)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    elapsed = time.perf_counter() - start
+
+    for error in errors[:READING_IMPORT_MAX_ERRORS]:
+        print(f"Row {error['row']}: {error['error']}")
+    if errors:
+        raise click.ClickException(f'{len(errors)} rows failed validation, nothing was imported')
+
+    print(f"{'Checked' if dry_run else 'Imported'} {result['imported']} readings with "
+          f"{result['sales_records']} sales records (€{result['revenue']:.2f}) in {elapsed:.2f}s")
+    if result['baseline_reading_id'] and not dry_run:
+        print(f"Reading {result['baseline_reading_id']} is the first in its scope and only sets the baseline counters")
+    for product_name, quantity in result['unpriced_products'].items():
+        print(f"Warning: no price for '{product_name}', {quantity} units sold were not recorded")
+
+# Offline sales rebuild
+SALES_REBUILD_SHOW_CHANGES = 100
+
+def sales_rebuild_slices(cursor, slice_readings, config_id=None, config_prices=False):
+    """rebuild_slice arguments (scope, scope params, lower, upper, fallback prices, override prices)
+
+    Each scope is cut into slices of slice_readings readings at (reading_date,
+    id) boundaries; a slice re-measures the readings after its lower bound up
+    to and including its upper bound. Products without a stored price fall
+    back to the configuration's vending price, then to the price last
+    recorded in the scope; config_prices puts the vending prices first.
+    """
+    if config_id:
+        scopes = [(None, config_id)]
+    else:
+        cursor.execute('''
+            SELECT DISTINCT NULL, config_id FROM counter_readings WHERE config_id IS NOT NULL
+            UNION
+            SELECT DISTINCT user_id, NULL FROM counter_readings WHERE config_id IS NULL
+        ''')
+        scopes = cursor.fetchall()
+
+    slices = []
+    for user_id, scope_config_id in scopes:
+        scope, scope_params = _reading_scope(scope_config_id, user_id)
+        cursor.execute(f'''
+            SELECT reading_date, id FROM (
+                SELECT reading_date, id, ROW_NUMBER() OVER (ORDER BY reading_date, id) AS position
+                FROM counter_readings
+                WHERE {scope}
+            )
+            WHERE position % ? = 0
+        ''', scope_params + (slice_readings,))
+        bounds = [None] + [tuple(row) for row in cursor.fetchall()] + [None]
+        cursor.execute(f'''
+            SELECT product_name, unit_price, MAX(end_reading_id)
+            FROM sales_records
+            WHERE {scope}
+            GROUP BY product_name
+        ''', scope_params)
+        recorded_prices = {row[0]: row[1] for row in cursor.fetchall()}
+        vending_prices = config_vending_prices(cursor, scope_config_id)
+        fallback_prices = recorded_prices | vending_prices
+        override_prices = vending_prices if config_prices else {}
+        slices.extend((scope, scope_params, lower, upper, fallback_prices, override_prices)
+                      for lower, upper in zip(bounds, bounds[1:]))
+    return slices
+
+def apply_sales_changes(cursor, changes):
+    """Replace the stored sales of re-measured readings; the caller rebuilds the rollups afterwards"""
+    cursor.executemany('DELETE FROM sales_records WHERE id = ?',
+                       [(sale_id,) for change in changes for sale_id in change['delete']])
+    cursor.executemany('''
+        INSERT INTO sales_records
+        (user_id, config_id, start_reading_id, end_reading_id, product_name, quantity_sold, unit_price, total_revenue, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [(user_id, config_id, start_id, change['reading_id'], product_name, quantity, unit_price, revenue,
+           change['created_at'])
+          for change in changes
+          for user_id, config_id, start_id, product_name, quantity, unit_price, revenue in change['new']])
+
+def _describe_sales(sales):
+    return ', '.join(f'{quantity} {product_name} from #{start_id} × €{unit_price:.2f}'
+                     for _, _, start_id, product_name, quantity, unit_price, _ in sales) or 'no sales'
+
+@app.cli.command('rebuild-sales')
+@click.option('--config-id', type=int, help='Only rebuild this configuration')
+@click.option('--workers', type=int, default=os.cpu_count() or 1, show_default=True, help='Worker processes')
+@click.option('--slice-size', type=int, default=5000, show_default=True, help='Readings per work item')
+@click.option('--config-prices', is_flag=True,
+              help="Price sales at the configuration's vending prices instead of the ones they were recorded with")
+@click.option('--dry-run', is_flag=True, help='Show the sales that would change without writing anything')
+def rebuild_sales_command(config_id, workers, slice_size, config_prices, dry_run):
+    """Re-measure every sales record from the counter readings, then rebuild the rollups
+
+    Scopes are cut into slices that worker processes re-measure on their own
+    read-only connections; only the intervals whose sales differ come back
+    and are written here, in one transaction that holds the write lock so
+    the app cannot change readings while the workers read them.
+    """
+    start = time.perf_counter()
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        if not dry_run:
+            cursor.execute('BEGIN IMMEDIATE')
+        slices = sales_rebuild_slices(cursor, slice_size, config_id, config_prices)
+
+        # Sales measured into readings that no longer exist
+        cursor.execute('''
+            SELECT id, user_id FROM sales_records sr
+            WHERE NOT EXISTS (SELECT 1 FROM counter_readings cr WHERE cr.id = sr.end_reading_id)
+        ''' + ('AND config_id = ?' if config_id else ''), (config_id,) if config_id else ())
+        orphans = cursor.fetchall()
+        users = {user_id for _, user_id in orphans}
+
+        checked = 0
+        changed = 0
+        removed = 0
+        added = 0
+        unpriced = {}
+        shown = []
+        context = multiprocessing.get_context(app.config['REPORT_EXPORT_START_METHOD'])
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor, \
+                click.progressbar(length=len(slices), label='Re-measuring sales') as progress:
+            remaining = iter(slices)
+            pending = set()
+            while True:
+                while len(pending) < workers * 2:
+                    work = next(remaining, None)
+                    if work is None:
+                        break
+                    pending.add(executor.submit(rebuild_slice, DATABASE_PATH, *work))
+                if not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    changes = result['changes']
+                    checked += result['readings']
+                    changed += len(changes)
+                    removed += sum(len(change['delete']) for change in changes)
+                    added += sum(len(change['new']) for change in changes)
+                    for product_name, quantity in result['unpriced'].items():
+                        unpriced[product_name] = unpriced.get(product_name, 0) + quantity
+                    for change in changes:
+                        users.add(change['user_id'])
+                        users.update(sale[0] for sale in change['old'])
+                    if dry_run:
+                        shown.extend(changes[:SALES_REBUILD_SHOW_CHANGES - len(shown)])
+                    else:
+                        apply_sales_changes(cursor, changes)
+                    progress.update(1)
+
+        if not dry_run:
+            cursor.executemany('DELETE FROM sales_records WHERE id = ?', [(sale_id,) for sale_id, _ in orphans])
+            rebuild_reading_revenue(cursor)
+            rebuild_sales_daily(cursor)
+            rebuild_cash_ledger(cursor)
+            bump_all_data_versions(cursor)
+            conn.commit()
+    elapsed = time.perf_counter() - start
+
+    for change in shown:
+        print(f"Reading {change['reading_id']}: {_describe_sales(change['old'])} -> {_describe_sales(change['new'])}")
+    if dry_run and changed > len(shown):
+        print(f"... and {changed - len(shown)} more readings")
+    print(f"Checked {checked} readings in {len(slices)} slices in {elapsed:.2f}s: "
+          f"{changed} {'would change' if dry_run else 'changed'} (-{removed} +{added} sales records)")
+    if orphans:
+        print(f"{'Would remove' if dry_run else 'Removed'} {len(orphans)} sales records of deleted readings")
+    for product_name, quantity in unpriced.items():
+        print(f"Warning: no price for '{product_name}', {quantity} units sold were not recorded")
+
 @app.route('/api/cash-register/balance', methods=['GET'])
 @login_required
+@versioned()
 def get_cash_register_balance():
     """Get current cash register balance and reconciliation"""
     try:
         config_id = request.args.get('config_id', type=int)
         
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         
-        # Get the latest counter reading
-        if config_id:
-            cursor.execute('''
-                SELECT id, cash_in_register, reading_date, config_id
-                FROM counter_readings
-                WHERE config_id = ?
-                ORDER BY reading_date DESC
-                LIMIT 1
-            ''', (config_id,))
-        else:
-            cursor.execute('''
-                SELECT id, cash_in_register, reading_date, config_id
-                FROM counter_readings
-                WHERE user_id = ?
-                ORDER BY reading_date DESC
-                LIMIT 1
-            ''', (current_user.id,))
-        
-        latest_reading = cursor.fetchone()
-        
-        if not latest_reading:
-            conn.close()
-            return jsonify({
-                'success': True,
-                'actual_cash': 0,
-                'expected_cash': 0,
-                'difference': 0,
-                'withdrawals': 0,
-                'deposits': 0,
-                'total_sales': 0,
-                'last_reading_date': None
-            })
-        
-        actual_cash = latest_reading[1]
-        last_reading_date = latest_reading[2]
-        reading_id = latest_reading[0]
-        reading_config_id = latest_reading[3]
-        
-        # Calculate total sales revenue from ALL counter readings up to this one
-        # This gives us total revenue from products sold
-        cursor.execute('''
-            SELECT COALESCE(SUM(total_revenue), 0)
-            FROM sales_records
-            WHERE end_reading_id <= ?
-        ''', (reading_id,))
-        
-        total_sales = cursor.fetchone()[0]
-        
-        # Calculate withdrawals and deposits from ALL time (not just since last reading)
-        if reading_config_id:
-            cursor.execute('''
-                SELECT 
-                    COALESCE(SUM(CASE WHEN event_type = 'withdrawal' THEN amount ELSE 0 END), 0) as withdrawals,
-                    COALESCE(SUM(CASE WHEN event_type = 'deposit' THEN amount ELSE 0 END), 0) as deposits
-                FROM cash_register_events
-                WHERE config_id = ? AND event_date <= ?
-            ''', (reading_config_id, last_reading_date))
-        else:
-            cursor.execute('''
-                SELECT 
-                    COALESCE(SUM(CASE WHEN event_type = 'withdrawal' THEN amount ELSE 0 END), 0) as withdrawals,
-                    COALESCE(SUM(CASE WHEN event_type = 'deposit' THEN amount ELSE 0 END), 0) as deposits
-                FROM cash_register_events
-                WHERE user_id = ? AND event_date <= ? AND config_id IS NULL
-            ''', (current_user.id, last_reading_date))
-        
-        cash_events = cursor.fetchone()
-        withdrawals = cash_events[0]
-        deposits = cash_events[1]
-        
-        # Get the FIRST reading to use as starting cash
-        if reading_config_id:
-            cursor.execute('''
-                SELECT cash_in_register
-                FROM counter_readings
-                WHERE config_id = ?
-                ORDER BY reading_date ASC
-                LIMIT 1
-            ''', (reading_config_id,))
-        else:
-            cursor.execute('''
-                SELECT cash_in_register
-                FROM counter_readings
-                WHERE user_id = ? AND config_id IS NULL
-                ORDER BY reading_date ASC
-                LIMIT 1
-            ''', (current_user.id,))
-        
-        first_reading = cursor.fetchone()
-        starting_cash = first_reading[0] if first_reading else 0
-        
-        # CORRECT FORMULA: Expected = Starting Cash + Sales Revenue - Withdrawals + Deposits
-        expected_cash = starting_cash + total_sales - withdrawals + deposits
-        difference = actual_cash - expected_cash
-        
-        conn.close()
-        
-        return jsonify({
-            'success': True,
-            'actual_cash': round(actual_cash, 2),
-            'expected_cash': round(expected_cash, 2),
-            'difference': round(difference, 2),
-            'withdrawals': round(withdrawals, 2),
-            'deposits': round(deposits, 2),
-            'total_sales': round(total_sales, 2),
-            'starting_cash': round(starting_cash, 2),
-            'last_reading_date': last_reading_date
-        })
+        return jsonify({'success': True, **cash_register_balance(cursor, current_user.id, config_id)})
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
+def cash_register_balance(cursor, user_id, config_id):
+    """Expected vs actual cash of a config (or a user's readings without one)"""
+    # Everything comes from the config's running cash ledger
+    ledger = get_cash_ledger(cursor, user_id, config_id)
+    
+    if not ledger or not ledger['latest_reading_id']:
+        return {
+            'actual_cash': 0,
+            'expected_cash': 0,
+            'difference': 0,
+            'withdrawals': 0,
+            'deposits': 0,
+            'total_sales': 0,
+            'last_reading_date': None
+        }
+    
+    actual_cash = ledger['actual_cash']
+    total_sales = ledger['total_sales']
+    withdrawals = ledger['total_withdrawals']
+    deposits = ledger['total_deposits']
+    starting_cash = ledger['starting_cash']
+    
+    # CORRECT FORMULA: Expected = Starting Cash + Sales Revenue - Withdrawals + Deposits
+    expected_cash = starting_cash + total_sales - withdrawals + deposits
+    difference = actual_cash - expected_cash
+    
+    return {
+        'actual_cash': round(actual_cash, 2),
+        'expected_cash': round(expected_cash, 2),
+        'difference': round(difference, 2),
+        'withdrawals': round(withdrawals, 2),
+        'deposits': round(deposits, 2),
+        'total_sales': round(total_sales, 2),
+        'starting_cash': round(starting_cash, 2),
+        'last_reading_date': ledger['latest_reading_date']
+    }
+
 @app.route('/api/cash-register/events', methods=['GET'])
 @login_required
+@versioned()
 def get_cash_register_events():
-    """Get cash register events history"""
+    """Get cash register events history, newest first, a page at a time"""
     try:
         config_id = request.args.get('config_id', type=int)
         
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         
-        if config_id:
-            cursor.execute('''
-                SELECT id, event_date, event_type, amount, description
-                FROM cash_register_events
-                WHERE config_id = ?
-                ORDER BY event_date DESC
-                LIMIT 100
-            ''', (config_id,))
-        else:
-            cursor.execute('''
-                SELECT id, event_date, event_type, amount, description
-                FROM cash_register_events
-                WHERE user_id = ?
-                ORDER BY event_date DESC
-                LIMIT 100
-            ''', (current_user.id,))
-        
-        events = []
-        for row in cursor.fetchall():
-            events.append({
-                'id': row[0],
-                'event_date': row[1],
-                'event_type': row[2],
-                'amount': row[3],
-                'description': row[4]
-            })
-        
-        conn.close()
-        return jsonify({'success': True, 'events': events})
+        return jsonify({'success': True, **cash_event_history(cursor, current_user.id, config_id)})
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
+def cash_event_history(cursor, user_id, config_id, args=None):
+    """A page of a config's (or a user's) cash register events as {'events', 'next_cursor'}"""
+    if config_id:
+        scope, scope_params = 'config_id = ?', (config_id,)
+    else:
+        scope, scope_params = 'user_id = ?', (user_id,)
+    
+    rows, next_cursor = keyset_page(cursor, f'''
+        SELECT id, event_date, event_type, amount, description
+        FROM cash_register_events
+        WHERE {scope}
+    ''', scope_params, 'event_date', 100, args)
+    
+    events = []
+    for row in rows:
+        events.append({
+            'id': row[0],
+            'event_date': row[1],
+            'event_type': row[2],
+            'amount': row[3],
+            'description': row[4]
+        })
+    return {'events': events, 'next_cursor': next_cursor}
+
 @app.route('/api/cash-register/events', methods=['POST'])
 @login_required
 def record_cash_event():
@@ -1613,34 +3880,28 @@ def record_cash_event():
         if amount <= 0:
             return jsonify({'success': False, 'error': 'Amount must be positive'}), 400
         
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         
-        # Get the latest counter reading to update cash
-        if config_id:
-            cursor.execute('''
-                SELECT id, counter_data, cash_in_register, notes
-                FROM counter_readings
-                WHERE config_id = ?
-                ORDER BY reading_date DESC
-                LIMIT 1
-            ''', (config_id,))
-        else:
+        # Get the latest counter reading to update cash (tracked by the cash ledger)
+        latest_reading = None
+        ledger = get_cash_ledger(cursor, current_user.id, config_id)
+        if ledger and ledger['latest_reading_id']:
             cursor.execute('''
                 SELECT id, counter_data, cash_in_register, notes
                 FROM counter_readings
-                WHERE user_id = ? AND config_id IS NULL
-                ORDER BY reading_date DESC
-                LIMIT 1
-            ''', (current_user.id,))
-        
-        latest_reading = cursor.fetchone()
+                WHERE id = ?
+            ''', (ledger['latest_reading_id'],))
+            latest_reading = cursor.fetchone()
         
-        # Record the cash event
+        # Record the cash event, dated like manually entered readings
+        event_date = datetime.now().isoformat()
         cursor.execute('''
-            INSERT INTO cash_register_events (user_id, config_id, event_type, amount, description)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (current_user.id, config_id, event_type, amount, description))
+            INSERT INTO cash_register_events (user_id, config_id, event_type, amount, description, event_date)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (current_user.id, config_id, event_type, amount, description, event_date))
+        event_id = cursor.lastrowid
+        auto_reading_id = None
         
         # Auto-update actual cash by creating a new counter reading
         if latest_reading:
@@ -1659,14 +3920,49 @@ def record_cash_event():
             if old_notes:
                 auto_note = f"{old_notes} | {auto_note}"
             
-            # Insert new counter reading with updated cash
+            # Insert new counter reading with updated cash; it must become the
+            # latest reading even if that one is dated in the future
+            cursor.execute('''
+                INSERT INTO counter_readings (user_id, config_id, counter_data, cash_in_register, notes, reading_date)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (current_user.id, config_id, counter_data, new_cash, auto_note,
+                  max(event_date, ledger['latest_reading_date'])))
+            auto_reading_id = cursor.lastrowid
+            cursor.execute('''
+                INSERT INTO counter_values (reading_id, product_id, count)
+                SELECT ?, product_id, count FROM counter_values WHERE reading_id = ?
+            ''', (auto_reading_id, latest_reading[0]))
+            
+            _, changed_users = link_reading(cursor, auto_reading_id, {})
+        else:
+            changed_users = set()
+        
+        if event_type == 'withdrawal':
+            update_cash_ledger(cursor, current_user.id, config_id, withdrawals=amount)
+        else:
+            update_cash_ledger(cursor, current_user.id, config_id, deposits=amount)
+        for user_id in changed_users | {current_user.id}:
+            bump_data_version(cursor, user_id)
+        bump_config_version(cursor, config_id)
+        if config_id:
             cursor.execute('''
-                INSERT INTO counter_readings (user_id, config_id, counter_data, cash_in_register, notes)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (current_user.id, config_id, counter_data, new_cash, auto_note))
+                SELECT id, event_date, event_type, amount, description
+                FROM cash_register_events
+                WHERE id = ?
+            ''', (event_id,))
+            row = cursor.fetchone()
+            record_config_change(cursor, config_id, 'cash_event_added', {
+                'id': row[0],
+                'event_date': row[1],
+                'event_type': row[2],
+                'amount': row[3],
+                'description': row[4]
+            })
+            if auto_reading_id:
+                record_reading_added(cursor, auto_reading_id, config_id)
+            record_balance_change(cursor, current_user.id, config_id)
         
         conn.commit()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -1681,7 +3977,7 @@ def record_cash_event():
 def delete_cash_event(event_id):
     """Delete a cash register event and its associated auto-created reading"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get the event details
@@ -1694,7 +3990,6 @@ def delete_cash_event(event_id):
         event = cursor.fetchone()
         
         if not event:
-            conn.close()
             return jsonify({'success': False, 'error': 'Event not found'}), 404
         
         event_user_id, event_config_id, event_type, amount, event_date = event
@@ -1711,10 +4006,8 @@ def delete_cash_event(event_id):
             ''', (event_config_id, current_user.id, event_config_id, current_user.id))
             
             if not cursor.fetchone():
-                conn.close()
                 return jsonify({'success': False, 'error': 'Permission denied'}), 403
         elif event_user_id != current_user.id:
-            conn.close()
             return jsonify({'success': False, 'error': 'Permission denied'}), 403
         
         # Find and delete the auto-created reading (if it has the auto-note)
@@ -1722,29 +4015,45 @@ def delete_cash_event(event_id):
         
         if event_config_id:
             cursor.execute('''
-                DELETE FROM counter_readings
+                SELECT id FROM counter_readings
                 WHERE config_id = ? 
                 AND reading_date >= ? 
                 AND notes LIKE ?
-                ORDER BY reading_date ASC
+                ORDER BY reading_date ASC, id ASC
                 LIMIT 1
             ''', (event_config_id, event_date, note_pattern))
         else:
             cursor.execute('''
-                DELETE FROM counter_readings
+                SELECT id FROM counter_readings
                 WHERE user_id = ? 
                 AND config_id IS NULL
                 AND reading_date >= ? 
                 AND notes LIKE ?
-                ORDER BY reading_date ASC
+                ORDER BY reading_date ASC, id ASC
                 LIMIT 1
             ''', (event_user_id, event_date, note_pattern))
         
+        auto_reading = cursor.fetchone()
+        changed_users = {event_user_id}
+        if auto_reading:
+            changed_users |= delete_reading(cursor, auto_reading[0])
+        
         # Delete the event itself
         cursor.execute('DELETE FROM cash_register_events WHERE id = ?', (event_id,))
         
+        if event_type == 'withdrawal':
+            update_cash_ledger(cursor, event_user_id, event_config_id, withdrawals=-amount)
+        else:
+            update_cash_ledger(cursor, event_user_id, event_config_id, deposits=-amount)
+        for user_id in changed_users:
+            bump_data_version(cursor, user_id)
+        bump_config_version(cursor, event_config_id)
+        record_config_change(cursor, event_config_id, 'cash_event_deleted', {'id': event_id})
+        if auto_reading:
+            record_config_change(cursor, event_config_id, 'reading_deleted', {'id': auto_reading[0]})
+        record_balance_change(cursor, event_user_id, event_config_id)
+        
         conn.commit()
-        conn.close()
         
         return jsonify({'success': True, 'message': 'Cash event and associated reading deleted'})
     
@@ -1753,204 +4062,540 @@ def delete_cash_event(event_id):
 
 @app.route('/api/sales-statistics', methods=['GET'])
 @login_required
+@versioned(daily=True)
 def get_sales_statistics():
     """Get sales statistics and analytics"""
     try:
         days = int(request.args.get('days', 30))  # Default 30 days
         config_id = request.args.get('config_id', type=int)
         
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         
-        # Get sales by product
-        if config_id:
-            cursor.execute('''
-                SELECT 
-                    product_name,
-                    SUM(quantity_sold) as total_quantity,
-                    SUM(total_revenue) as total_revenue,
-                    AVG(unit_price) as avg_price
-                FROM sales_records
-                WHERE config_id = ? AND created_at >= datetime('now', '-' || ? || ' days')
-                GROUP BY product_name
-                ORDER BY total_revenue DESC
-            ''', (config_id, days))
-        else:
-            cursor.execute('''
-                SELECT 
-                    product_name,
-                    SUM(quantity_sold) as total_quantity,
-                    SUM(total_revenue) as total_revenue,
-                    AVG(unit_price) as avg_price
-                FROM sales_records
-                WHERE user_id = ? AND created_at >= datetime('now', '-' || ? || ' days')
-                GROUP BY product_name
-                ORDER BY total_revenue DESC
-            ''', (current_user.id, days))
-        
-        products = []
-        total_revenue = 0
-        total_items = 0
-        
-        for row in cursor.fetchall():
-            product_data = {
-                'name': row[0],
-                'quantity': row[1],
-                'revenue': round(row[2], 2),
-                'avg_price': round(row[3], 2)
-            }
-            products.append(product_data)
-            total_revenue += row[2]
-            total_items += row[1]
-        
-        # Get daily sales trend
-        if config_id:
-            cursor.execute('''
-                SELECT 
-                    DATE(created_at) as sale_date,
-                    SUM(quantity_sold) as daily_quantity,
-                    SUM(total_revenue) as daily_revenue
-                FROM sales_records
-                WHERE config_id = ? AND created_at >= datetime('now', '-' || ? || ' days')
-                GROUP BY DATE(created_at)
-                ORDER BY sale_date ASC
-            ''', (config_id, days))
-        else:
-            cursor.execute('''
-                SELECT 
-                    DATE(created_at) as sale_date,
-                    SUM(quantity_sold) as daily_quantity,
-                    SUM(total_revenue) as daily_revenue
-                FROM sales_records
-                WHERE user_id = ? AND created_at >= datetime('now', '-' || ? || ' days')
-                GROUP BY DATE(created_at)
-                ORDER BY sale_date ASC
-            ''', (current_user.id, days))
-        
-        daily_trend = []
-        for row in cursor.fetchall():
-            daily_trend.append({
-                'date': row[0],
-                'quantity': row[1],
-                'revenue': round(row[2], 2)
-            })
-        
-        # Get total cash register discrepancies
-        if config_id:
-            cursor.execute('''
-                SELECT COUNT(*) as readings_count
-                FROM counter_readings
-                WHERE config_id = ? AND reading_date >= datetime('now', '-' || ? || ' days')
-            ''', (config_id, days))
-        else:
-            cursor.execute('''
-                SELECT COUNT(*) as readings_count
-                FROM counter_readings
-                WHERE user_id = ? AND reading_date >= datetime('now', '-' || ? || ' days')
-            ''', (current_user.id, days))
-        
-        readings_count = cursor.fetchone()[0]
-        
-        conn.close()
-        
         return jsonify({
             'success': True,
-            'statistics': {
-                'total_revenue': round(total_revenue, 2),
-                'total_items_sold': total_items,
-                'products': products,
-                'daily_trend': daily_trend,
-                'readings_count': readings_count,
-                'period_days': days
-            }
+            'statistics': sales_statistics(cursor, current_user.id, config_id, days)
         })
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
+def sales_statistics(cursor, user_id, config_id, days):
+    """Sales totals, per-product figures and the daily trend of the last `days` days"""
+    # Sales totals come from the sales_daily aggregate, so the cost depends
+    # on the number of days in the period rather than on sales rows
+    if config_id:
+        scope = 'config_id = ?'
+        scope_params = (config_id, days)
+    else:
+        scope = 'user_id = ?'
+        scope_params = (user_id, days)
+    
+    # Get sales by product
+    cursor.execute(f'''
+        SELECT 
+            product_name,
+            SUM(quantity) as total_quantity,
+            SUM(revenue) as total_revenue,
+            SUM(unit_price_sum) / SUM(record_count) as avg_price
+        FROM sales_daily
+        WHERE {scope} AND sale_date >= DATE('now', '-' || ? || ' days')
+        GROUP BY product_name
+        ORDER BY total_revenue DESC
+    ''', scope_params)
+    
+    products = []
+    total_revenue = 0
+    total_items = 0
+    
+    for row in cursor.fetchall():
+        product_data = {
+            'name': row[0],
+            'quantity': row[1],
+            'revenue': round(row[2], 2),
+            'avg_price': round(row[3], 2)
+        }
+        products.append(product_data)
+        total_revenue += row[2]
+        total_items += row[1]
+    
+    # Get daily sales trend
+    cursor.execute(f'''
+        SELECT 
+            sale_date,
+            SUM(quantity) as daily_quantity,
+            SUM(revenue) as daily_revenue
+        FROM sales_daily
+        WHERE {scope} AND sale_date >= DATE('now', '-' || ? || ' days')
+        GROUP BY sale_date
+        ORDER BY sale_date ASC
+    ''', scope_params)
+    
+    daily_trend = []
+    for row in cursor.fetchall():
+        daily_trend.append({
+            'date': row[0],
+            'quantity': row[1],
+            'revenue': round(row[2], 2)
+        })
+    
+    # Get total cash register discrepancies
+    cursor.execute(f'''
+        SELECT COUNT(*) as readings_count
+        FROM counter_readings
+        WHERE {scope} AND reading_date >= datetime('now', '-' || ? || ' days')
+    ''', scope_params)
+    
+    readings_count = cursor.fetchone()[0]
+    
+    return {
+        'total_revenue': round(total_revenue, 2),
+        'total_items_sold': total_items,
+        'products': products,
+        'daily_trend': daily_trend,
+        'readings_count': readings_count,
+        'period_days': days
+    }
+
 @app.route('/api/sales-trend-chart', methods=['GET'])
 @login_required
+@versioned(daily=True)
 def get_sales_trend_chart():
     """Get sales trend data for chart visualization"""
     try:
         days = int(request.args.get('days', 30))
         config_id = request.args.get('config_id', type=int)
         
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         
-        # Get all counter readings with their dates
-        if config_id:
-            cursor.execute('''
-                SELECT 
-                    cr.id,
-                    cr.reading_date,
-                    cr.cash_in_register,
-                    cr.counter_data
-                FROM counter_readings cr
-                WHERE cr.config_id = ? AND cr.reading_date >= datetime('now', '-' || ? || ' days')
-                ORDER BY cr.reading_date ASC
-            ''', (config_id, days))
-        else:
-            cursor.execute('''
-                SELECT 
-                    cr.id,
-                    cr.reading_date,
-                    cr.cash_in_register,
-                    cr.counter_data
-                FROM counter_readings cr
-                WHERE cr.user_id = ? AND cr.reading_date >= datetime('now', '-' || ? || ' days')
-                AND cr.config_id IS NULL
-                ORDER BY cr.reading_date ASC
-            ''', (current_user.id, days))
-        
-        readings = cursor.fetchall()
-        chart_data = []
-        
-        for reading in readings:
-            reading_id = reading[0]
-            reading_date = reading[1]
-            cash_in_register = reading[2]
-            counter_data = json.loads(reading[3])
-            
-            # Calculate total products sold in this reading
-            total_products = sum(counter_data.values())
-            
-            # Get total revenue from sales records for this reading
-            cursor.execute('''
-                SELECT COALESCE(SUM(total_revenue), 0)
-                FROM sales_records
-                WHERE end_reading_id = ?
-            ''', (reading_id,))
-            
-            revenue = cursor.fetchone()[0]
-            
-            # Get cumulative revenue up to this reading
-            cursor.execute('''
-                SELECT COALESCE(SUM(total_revenue), 0)
-                FROM sales_records
-                WHERE end_reading_id <= ?
-            ''', (reading_id,))
-            
-            cumulative_revenue = cursor.fetchone()[0]
-            
-            chart_data.append({
-                'date': reading_date,
-                'products_sold': total_products,
-                'revenue': round(revenue, 2),
-                'cumulative_revenue': round(cumulative_revenue, 2),
-                'actual_cash': round(cash_in_register, 2)
-            })
-        
-        conn.close()
-        
         return jsonify({
             'success': True,
-            'chart_data': chart_data
+            'chart_data': sales_trend_chart(cursor, current_user.id, config_id, days)
         })
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
+def sales_trend_chart(cursor, user_id, config_id, days):
+    """Per-reading sales, running revenue and counted cash of the last `days` days"""
+    # Per-reading and running revenue come precomputed from the rollup
+    if config_id:
+        scope, scope_params = 'cr.config_id = ?', (config_id, days)
+    else:
+        scope, scope_params = 'cr.user_id = ? AND cr.config_id IS NULL', (user_id, days)
+    
+    cursor.execute(f'''
+        SELECT 
+            cr.reading_date,
+            cr.cash_in_register,
+            (SELECT COALESCE(SUM(cv.count), 0) FROM counter_values cv WHERE cv.reading_id = cr.id),
+            COALESCE(rr.revenue, 0),
+            COALESCE(rr.cumulative_revenue, 0)
+        FROM counter_readings cr
+        LEFT JOIN reading_revenue rr ON rr.reading_id = cr.id
+        WHERE {scope} AND cr.reading_date >= datetime('now', '-' || ? || ' days')
+        ORDER BY cr.reading_date ASC, cr.id ASC
+    ''', scope_params)
+    
+    chart_data = []
+    for reading_date, cash_in_register, products_sold, revenue, cumulative_revenue in cursor.fetchall():
+        chart_data.append({
+            'date': reading_date,
+            'products_sold': products_sold,
+            'revenue': round(revenue, 2),
+            'cumulative_revenue': round(cumulative_revenue, 2),
+            'actual_cash': round(cash_in_register, 2)
+        })
+    return chart_data
+
+# Sales tab dashboard
+# Each section is built by the same function as its own endpoint, so the
+# dashboard returns exactly what the separate requests would, but from one
+# read snapshot. Paged sections come back as their first page.
+DASHBOARD_SECTIONS = {
+    'readings': lambda cursor, user_id, config_id, days: reading_history(cursor, user_id, config_id, MultiDict()),
+    'balance': lambda cursor, user_id, config_id, days: cash_register_balance(cursor, user_id, config_id),
+    'events': lambda cursor, user_id, config_id, days: cash_event_history(cursor, user_id, config_id, MultiDict()),
+    'statistics': lambda cursor, user_id, config_id, days: sales_statistics(cursor, user_id, config_id, days),
+    'chart': lambda cursor, user_id, config_id, days: sales_trend_chart(cursor, user_id, config_id, days)
+}
+
+@app.route('/api/dashboard', methods=['GET'])
+@login_required
+@versioned(daily=True)
+def get_dashboard():
+    """Get the sales tab's readings, balance, events, statistics and chart in one response
+
+    ?sections= picks a comma separated subset (default: all of them).
+    """
+    try:
+        days = int(request.args.get('days', 30))
+        config_id = request.args.get('config_id', type=int)
+        sections = request.args.get('sections')
+        sections = [s.strip() for s in sections.split(',') if s.strip()] if sections else list(DASHBOARD_SECTIONS)
+        unknown = [s for s in sections if s not in DASHBOARD_SECTIONS]
+        if unknown:
+            raise ValueError(f'Unknown dashboard sections: {", ".join(unknown)}')
+        
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        if config_id and not user_can_access_config(cursor, config_id, current_user.id):
+            return jsonify({'success': False, 'error': 'Access denied'}), 403
+        
+        # One read transaction, so no write can land between two sections
+        cursor.execute('BEGIN')
+        try:
+            result = {section: DASHBOARD_SECTIONS[section](cursor, current_user.id, config_id, days)
+                      for section in sections}
+        finally:
+            conn.rollback()
+        
+        return jsonify({'success': True, **result})
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+# Live updates
+# Every write to a configuration's data logs a compact change in the
+# config_changes table. One thread per process polls the log and hands new
+# rows to the process's event streams, so a change committed through any
+# gunicorn worker reaches everyone watching the configuration. Streams end
+# after EVENT_STREAM_SECONDS and the browser reconnects with the last event
+# id, resuming from the log without losing changes.
+app.config['CHANGE_POLL_INTERVAL'] = float(os.environ.get('CHANGE_POLL_INTERVAL', 1))
+app.config['CHANGE_RETENTION_HOURS'] = int(os.environ.get('CHANGE_RETENTION_HOURS', 24))
+app.config['EVENT_STREAM_SECONDS'] = int(os.environ.get('EVENT_STREAM_SECONDS', 300))
+app.config['EVENT_STREAM_HEARTBEAT'] = float(os.environ.get('EVENT_STREAM_HEARTBEAT', 15))
+# Changes a stream may fall behind by before it is closed (and resumes from the log)
+app.config['EVENT_STREAM_BACKLOG'] = int(os.environ.get('EVENT_STREAM_BACKLOG', 1000))
+
+class ChangeFeed:
+    """Fans the config_changes log out to this process's event streams"""
+
+    def __init__(self, pool, config):
+        self.pool = pool
+        self.config = config
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+        self._subscribers = {}  # {config_id: set of queues}
+        self._last_id = 0
+        self._last_purge = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def start(self):
+        """Start this process's polling thread (once per process)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._subscribers = {}
+            with self.pool.connection() as conn:
+                self._last_id = self.latest_id(conn.cursor())
+            self._thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+            self._thread.start()
+
+    def latest_id(self, cursor):
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM config_changes')
+        return cursor.fetchone()[0]
+
+    def subscribe(self, config_id):
+        """Queue receiving (id, kind, payload) for every change to a config committed from now on"""
+        self.start()
+        changes = queue.Queue(self.config['EVENT_STREAM_BACKLOG'])
+        with self._lock:
+            self._subscribers.setdefault(config_id, set()).add(changes)
+        return changes
+
+    def unsubscribe(self, config_id, changes):
+        with self._lock:
+            subscribers = self._subscribers.get(config_id)
+            if subscribers is not None:
+                subscribers.discard(changes)
+                if not subscribers:
+                    del self._subscribers[config_id]
+
+    def subscribed(self, config_id, changes):
+        """False once a stream fell too far behind and was dropped"""
+        with self._lock:
+            return changes in self._subscribers.get(config_id, ())
+
+    def replay(self, cursor, config_id, after_id):
+        """A config's changes after after_id, or None if some were already purged from the log"""
+        cursor.execute('SELECT MIN(id) FROM config_changes')
+        oldest = cursor.fetchone()[0]
+        if oldest is not None and oldest > after_id + 1:
+            return None
+        cursor.execute('''
+            SELECT id, kind, payload
+            FROM config_changes
+            WHERE config_id = ? AND id > ?
+            ORDER BY id
+        ''', (config_id, after_id))
+        return cursor.fetchall()
+
+    def _poll(self, conn):
+        cursor = conn.cursor()
+        while True:
+            cursor.execute('''
+                SELECT id, config_id, kind, payload
+                FROM config_changes
+                WHERE id > ?
+                ORDER BY id
+                LIMIT 1000
+            ''', (self._last_id,))
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            with self._lock:
+                for change_id, config_id, kind, payload in rows:
+                    for changes in list(self._subscribers.get(config_id, ())):
+                        try:
+                            changes.put_nowait((change_id, kind, payload))
+                            self.delivered += 1
+                        except queue.Full:
+                            self._subscribers[config_id].discard(changes)
+                            self.dropped += 1
+            self._last_id = rows[-1][0]
+
+    def _purge(self, conn):
+        """Delete changes older than CHANGE_RETENTION_HOURS"""
+        if time.monotonic() - self._last_purge < 600:
+            return
+        self._last_purge = time.monotonic()
+        conn.execute('''
+            DELETE FROM config_changes
+            WHERE created_at < DATETIME('now', ?)
+        ''', (f"-{self.config['CHANGE_RETENTION_HOURS']} hours",))
+        conn.commit()
+
+    def _run(self):
+        while True:
+            try:
+                with self.pool.connection() as conn:
+                    self._poll(conn)
+                    self._purge(conn)
+            except Exception as e:
+                print(f"Change feed error: {e}")
+            time.sleep(self.config['CHANGE_POLL_INTERVAL'])
+
+    def stats(self):
+        with self._lock:
+            return {
+                'streams': sum(len(subscribers) for subscribers in self._subscribers.values()),
+                'configs': len(self._subscribers),
+                'last_change_id': self._last_id,
+                'delivered': self.delivered,
+                'dropped': self.dropped,
+                'running': self._pid == os.getpid() and self._thread.is_alive()
+            }
+
+change_feed = ChangeFeed(db_pool, app.config)
+
+def event_stream_message(change_id, kind, payload):
+    return f'id: {change_id}\nevent: {kind}\ndata: {payload}\n\n'
+
+@app.route('/api/configs/<int:config_id>/stream', methods=['GET'])
+@login_required
+def config_event_stream(config_id):
+    """Server-sent events for every change to a configuration's readings, cash events and settings"""
+    try:
+        user_id = current_user.id
+        if not user_can_access_config(get_db().cursor(), config_id, user_id):
+            return jsonify({'success': False, 'error': 'Access denied'}), 403
+        # A reconnecting browser sends the id of the last event it received
+        last_id = request.headers.get('Last-Event-ID', type=int)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    # Runs after the request's connection went back to the pool
+    def events():
+        changes = change_feed.subscribe(config_id)
+        try:
+            # Subscribed first, so nothing committed from here on can be missed
+            with db_pool.connection() as conn:
+                cursor = conn.cursor()
+                sent_id = change_feed.latest_id(cursor)
+                missed = change_feed.replay(cursor, config_id, last_id) if last_id is not None else []
+            if missed is None:
+                # The log no longer reaches back to the last event seen
+                yield 'retry: 1000\n\n' + event_stream_message(sent_id, 'reset', '{}')
+                return
+            
+            # Reconnect quickly when the stream ends
+            yield 'retry: 1000\n\n'
+            for change_id, kind, payload in missed:
+                yield event_stream_message(change_id, kind, payload)
+                sent_id = max(sent_id, change_id)
+            # Resume after this point if the stream ends before the next change
+            yield f'id: {sent_id}\n\n'
+            
+            deadline = time.monotonic() + app.config['EVENT_STREAM_SECONDS']
+            while time.monotonic() < deadline:
+                try:
+                    change_id, kind, payload = changes.get(timeout=app.config['EVENT_STREAM_HEARTBEAT'])
+                except queue.Empty:
+                    if not change_feed.subscribed(config_id, changes):
+                        return
+                    # Stop streaming to users the configuration was unshared from
+                    with db_pool.connection() as conn:
+                        if not user_can_access_config(conn.cursor(), config_id, user_id):
+                            return
+                    yield ': keep-alive\n\n'
+                    continue
+                # Changes replayed above may also have been queued
+                if change_id > sent_id:
+                    yield event_stream_message(change_id, kind, payload)
+                    sent_id = change_id
+        finally:
+            change_feed.unsubscribe(config_id, changes)
+    
+    return app.response_class(events(), mimetype='text/event-stream',
+                              headers={'X-Accel-Buffering': 'no'})
+
+# Streaming exports
+app.config['EXPORT_CHUNK_ROWS'] = int(os.environ.get('EXPORT_CHUNK_ROWS', 1000))
+
+# Exportable tables as (table, date column, columns). Rows are ordered by the
+# date column alone so the (scope, date) indexes deliver them without a sort.
+EXPORT_DATASETS = {
+    'sales': ('sales_records', 'created_at', (
+        'id', 'created_at', 'user_id', 'config_id', 'start_reading_id', 'end_reading_id',
+        'product_name', 'quantity_sold', 'unit_price', 'total_revenue')),
+    'counter-readings': ('counter_readings', 'reading_date', (
+        'id', 'reading_date', 'user_id', 'config_id', 'cash_in_register', 'notes', 'counter_data')),
+    'cash-events': ('cash_register_events', 'event_date', (
+        'id', 'event_date', 'user_id', 'config_id', 'event_type', 'amount', 'description'))
+}
+# Columns holding JSON: nested in NDJSON exports, kept as JSON text in CSV
+EXPORT_JSON_COLUMNS = ('counter_data',)
+# Exported columns that are computed rather than stored
+EXPORT_COLUMN_SQL = {
+    'counter_data': '''(
+        SELECT json_group_object(p.name, cv.count)
+        FROM counter_values cv
+        JOIN products p ON p.id = cv.product_id
+        WHERE cv.reading_id = counter_readings.id
+    )'''
+}
+
+def export_rows(query, params, columns, fmt, chunk_rows):
+    """Yield a query's rows as CSV or NDJSON text, one chunk of rows at a time
+
+    Opens its own pooled connection: the response is streamed after the
+    request's connection has been returned to the pool.
+    """
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+            json_columns = [column for column in columns if column in EXPORT_JSON_COLUMNS]
+
+            if fmt == 'csv':
+                buffer = StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(columns)
+                yield buffer.getvalue()
+
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                if fmt == 'csv':
+                    buffer.seek(0)
+                    buffer.truncate()
+                    writer.writerows(rows)
+                    yield buffer.getvalue()
+                else:
+                    lines = []
+                    for row in rows:
+                        record = dict(zip(columns, row))
+                        for column in json_columns:
+                            record[column] = json.loads(record[column]) if record[column] else None
+                        lines.append(json.dumps(record))
+                    yield '\n'.join(lines) + '\n'
+        finally:
+            # Ends the statement (and its read snapshot) if the client went away mid-export
+            cursor.close()
+
+@app.route('/api/export/<dataset>', methods=['GET'])
+@login_required
+@versioned()
+def export_data(dataset):
+    """Stream the full history of sales, counter readings or cash events as NDJSON or CSV"""
+    try:
+        if dataset not in EXPORT_DATASETS:
+            return jsonify({'success': False, 'error': f"Unknown export '{dataset}'"}), 404
+        table, date_column, columns = EXPORT_DATASETS[dataset]
+
+        fmt = request.args.get('format', 'ndjson')
+        if fmt not in ('ndjson', 'csv'):
+            raise ValueError(f"Unsupported export format '{fmt}' (use ndjson or csv)")
+        config_id = request.args.get('config_id', type=int)
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+
+        if config_id:
+            cursor = get_db().cursor()
+            if not user_can_access_config(cursor, config_id, current_user.id):
+                return jsonify({'success': False, 'error': 'Access denied'}), 403
+            conditions = ['config_id = ?']
+            params = [config_id]
+        else:
+            conditions = ['user_id = ?']
+            params = [current_user.id]
+
+        # Whole days, inclusive; stored dates are ISO strings so they compare as text
+        if start_date:
+            conditions.append(f'{date_column} >= ?')
+            params.append(date.fromisoformat(start_date).isoformat())
+        if end_date:
+            conditions.append(f'{date_column} < ?')
+            params.append((date.fromisoformat(end_date) + timedelta(days=1)).isoformat())
+
+        query = f'''
+            SELECT {', '.join(EXPORT_COLUMN_SQL.get(column, column) for column in columns)}
+            FROM {table}
+            WHERE {' AND '.join(conditions)}
+            ORDER BY {date_column}
+        '''
+        filename = f'{dataset}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{fmt}'
+
+        return app.response_class(
+            export_rows(query, params, columns, fmt, app.config['EXPORT_CHUNK_ROWS']),
+            mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+# Monitoring Endpoints
+@app.route('/api/metrics', methods=['GET'])
+@login_required
+def get_metrics():
+    """Get performance counters for the worker process serving this request"""
+    cursor = get_db().cursor()
+    return jsonify({
+        'success': True,
+        'pid': os.getpid(),
+        'metrics': {
+            'db_pool': db_pool.stats(),
+            'user_cache': user_cache.stats(),
+            'calc_cache': calc_cache.stats(),
+            'recalc_sessions': recalc_sessions.stats(),
+            'reports': report_queue.stats(cursor),
+            'report_cache': report_cache.stats(),
+            'assets': asset_manifest.stats(),
+            'compression': response_compressor.stats(),
+            'live_updates': change_feed.stats()
+        }
+    })
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,76 @@
+"""
+Benchmark for the /api/calculate cost engine.
+Compares the original per-drink loop with the compiled cost model on
+synthetic configurations of growing size, and checks both give identical results.
+
+Usage: python benchmark_calculate.py [drink counts...]
+"""
+
+import random
+import sys
+import time
+
+import cost_engine
+
+def make_config(drink_count, seed=1):
+    rng = random.Random(seed)
+    ingredients = {f'ingredient_{i}': round(rng.uniform(1, 40), 2) for i in range(30)}
+    tea_bags = {f'tea_{i}': round(rng.uniform(0.05, 0.5), 2) for i in range(5)}
+    drinks = []
+    for d in range(drink_count):
+        drinks.append({
+            'name': f'Drink {d}',
+            'ingredients': {f'ingredient_{rng.randrange(30)}': round(rng.uniform(0.001, 0.3), 3) for _ in range(6)},
+            'tea_bags': {f'tea_{rng.randrange(5)}': 1} if rng.random() < 0.3 else {},
+            'custom_items': [{'name': 'Cookie', 'cost': 0.15}] if rng.random() < 0.2 else []
+        })
+    return {'ingredients': ingredients, 'tea_bags': tea_bags, 'drinks': drinks,
+            'cleaning_cost': 5.0, 'products_per_day': 50}
+
+def timed(func, *args, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best * 1000
+
+def main(drink_counts):
+    print(f"NumPy available: {cost_engine.HAVE_NUMPY}")
+    print(f"{'drinks':>7} {'reference':>11} {'engine':>11} {'batch x20 ref':>14} {'batch x20 engine':>17} {'100 price sets ref':>19} {'100 price sets engine':>22}")
+
+    for drink_count in drink_counts:
+        config = make_config(drink_count)
+        expected, reference_ms = timed(cost_engine.calculate_reference, config)
+        actual, engine_ms = timed(cost_engine.calculate, config)
+        assert actual == expected, 'engine result differs from the reference loop'
+
+        batch = [make_config(drink_count, seed) for seed in range(20)]
+        _, batch_reference_ms = timed(lambda: [cost_engine.calculate_reference(c) for c in batch], repeat=1)
+        _, batch_engine_ms = timed(cost_engine.calculate_batch, batch, repeat=1)
+
+        # The same drinks under 100 ingredient price scenarios (totals only)
+        rng = random.Random(2)
+        scenarios = [{name: price * rng.uniform(0.8, 1.2) for name, price in config['ingredients'].items()}
+                     for _ in range(100)]
+
+        def sweep_reference():
+            return [[drink['total_cost'] for drink in cost_engine.calculate_reference(dict(config, ingredients=prices))]
+                    for prices in scenarios]
+
+        _, sweep_reference_ms = timed(sweep_reference, repeat=1)
+        if cost_engine.HAVE_NUMPY:
+            model = cost_engine.CostModel(config)
+            price_matrix = [list(prices.values()) + model.prices[len(prices):] for prices in scenarios]
+            _, sweep_engine_ms = timed(model.drink_costs, price_matrix, repeat=1)
+            sweep_engine = f'{sweep_engine_ms:.1f} ms'
+        else:
+            sweep_engine = 'n/a'
+
+        print(f"{drink_count:>7} {reference_ms:>8.2f} ms {engine_ms:>8.2f} ms {batch_reference_ms:>11.1f} ms "
+              f"{batch_engine_ms:>14.1f} ms {sweep_reference_ms:>16.1f} ms {sweep_engine:>22}")
+
+if __name__ == '__main__':
+    counts = [int(arg) for arg in sys.argv[1:]] or [10, 100, 500, 2000]
+    main(counts)
@@ -0,0 +1,484 @@
+"""
+Cost engine for drink configurations.
+
+Every breakdown line of every drink is compiled into a (price column, quantity)
+entry of a drink x price matrix, so costing a configuration -- or the same
+drinks under many price vectors at once -- is a gather, a multiply and a
+per-drink sum. NumPy evaluates the model when it is installed; otherwise the
+original per-drink loop is used.
+
+Both paths return exactly what the original /api/calculate loop produced:
+lines are summed in the drink's own order and rounded with Python's round(),
+and integer inputs stay integers in the output.
+"""
+
+import itertools
+import json
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+HAVE_NUMPY = np is not None
+
+# Part of every cached result's key; bump when calculation output changes
+ENGINE_VERSION = 1
+
+# Below this many drinks the array setup costs more than the loop it replaces
+NUMPY_MIN_DRINKS = 75
+
+_NUMBER_TYPES = {int, float}
+
+
+def _cleaning_cost_per_product(config):
+    cleaning_cost = config.get('cleaning_cost', 0)
+    products_per_day = config.get('products_per_day', 1)
+    return cleaning_cost / products_per_day if products_per_day > 0 else 0
+
+
+def calculate_reference(config):
+    """Cost one configuration with the original per-drink loop"""
+    ingredients = config.get('ingredients', {})
+    drinks = config.get('drinks', [])
+    cleaning_cost = config.get('cleaning_cost', 0)
+    tea_bags = config.get('tea_bags', {})  # Tea bags with per-unit costs
+
+    # Calculate cleaning cost per product
+    cleaning_cost_per_product = _cleaning_cost_per_product(config)
+
+    # Calculate cost for each drink
+    results = []
+    for drink in drinks:
+        drink_cost = 0
+        breakdown = []
+
+        # Calculate bulk ingredients (kg/L based)
+        for ingredient_name, amount in drink.get('ingredients', {}).items():
+            if ingredient_name in ingredients:
+                ingredient_cost = ingredients[ingredient_name]
+                cost = ingredient_cost * amount
+                drink_cost += cost
+                breakdown.append({
+                    'ingredient': ingredient_name,
+                    'amount': amount,
+                    'unit_cost': ingredient_cost,
+                    'total_cost': round(cost, 2),
+                    'type': 'bulk'
+                })
+
+        # Calculate per-unit items (tea bags, etc.)
+        for tea_name, quantity in drink.get('tea_bags', {}).items():
+            if tea_name in tea_bags:
+                cost_per_unit = tea_bags[tea_name]
+                cost = cost_per_unit * quantity
+                drink_cost += cost
+                breakdown.append({
+                    'ingredient': tea_name,
+                    'amount': quantity,
+                    'unit_cost': cost_per_unit,
+                    'total_cost': round(cost, 2),
+                    'type': 'per_unit'
+                })
+
+        # Calculate custom items (cookies, etc.)
+        for custom_item in drink.get('custom_items', []):
+            cost = custom_item.get('cost', 0)
+            drink_cost += cost
+            breakdown.append({
+                'ingredient': custom_item.get('name', 'Custom Item'),
+                'amount': 1,
+                'unit_cost': cost,
+                'total_cost': round(cost, 2),
+                'type': 'custom'
+            })
+
+        # Add cleaning cost to total
+        total_cost = drink_cost + cleaning_cost_per_product
+
+        results.append({
+            'name': drink.get('name'),
+            'total_cost': round(total_cost, 2),
+            'cleaning_cost_per_product': round(cleaning_cost_per_product, 2),
+            'total_cleaning_cost': round(cleaning_cost, 2),
+            'breakdown': breakdown
+        })
+
+    return results
+
+
+class CostModel:
+    """A configuration compiled into a price vector and a drink x price quantity matrix
+
+    The matrix is kept in coordinate form: line i of the breakdown puts
+    quantity amounts[i] of price columns[i] into drink rows[i]. Lines are
+    stored drink by drink in breakdown order, so a drink's lines are the
+    slice given by its entry in `drinks`.
+
+    The breakdown dicts of the result are built in the same pass that
+    compiles the matrix; results() only fills in their rounded costs.
+    """
+
+    def __init__(self, config):
+        ingredients = config.get('ingredients', {})
+        tea_bags = config.get('tea_bags', {})
+        self.cleaning_cost = config.get('cleaning_cost', 0)
+        self.cleaning_cost_per_product = _cleaning_cost_per_product(config)
+
+        # Price vector: bulk ingredients, then tea bags, then one entry per custom item
+        self.price_names = [('bulk', name) for name in ingredients] + [('per_unit', name) for name in tea_bags]
+        self.prices = prices = list(ingredients.values()) + list(tea_bags.values())
+        bulk_column = {name: column for column, name in enumerate(ingredients)}
+        tea_column = {name: column + len(ingredients) for column, name in enumerate(tea_bags)}
+
+        self.lines = lines = []
+        self.amounts = amounts = []
+        self.columns = columns = []
+        self.drinks = []  # (name, first line, line count)
+        for drink in config.get('drinks', []):
+            start = len(lines)
+            for table, kind, key in ((bulk_column, 'bulk', 'ingredients'), (tea_column, 'per_unit', 'tea_bags')):
+                for name, amount in drink.get(key, {}).items():
+                    column = table.get(name)
+                    if column is not None:
+                        lines.append({'ingredient': name, 'amount': amount, 'unit_cost': prices[column],
+                                      'total_cost': None, 'type': kind})
+                        amounts.append(amount)
+                        columns.append(column)
+            for custom_item in drink.get('custom_items', []):
+                cost = custom_item.get('cost', 0)
+                self.price_names.append(('custom', None))
+                prices.append(cost)
+                lines.append({'ingredient': custom_item.get('name', 'Custom Item'), 'amount': 1, 'unit_cost': cost,
+                              'total_cost': None, 'type': 'custom'})
+                amounts.append(1)
+                columns.append(len(prices) - 1)
+            self.drinks.append((drink.get('name'), start, len(lines) - start))
+
+    def is_vectorizable(self):
+        """True if every line is a float product that NumPy reproduces exactly"""
+        if not HAVE_NUMPY:
+            return False
+        if not (set(map(type, self.prices)) <= _NUMBER_TYPES and set(map(type, self.amounts)) <= _NUMBER_TYPES):
+            return False
+        if not (type(self.cleaning_cost) in _NUMBER_TYPES and type(self.cleaning_cost_per_product) in _NUMBER_TYPES):
+            return False
+        # int * int lines stay ints in the reference loop
+        if int in set(map(type, self.prices)):
+            int_columns = {column for column, price in enumerate(self.prices) if type(price) is int}
+            for column, amount in zip(self.columns, self.amounts):
+                if column in int_columns and type(amount) is int:
+                    return False
+        return True
+
+    def line_costs(self, prices=None):
+        """Cost of every breakdown line for one price vector (or a scenarios x prices matrix)"""
+        prices = np.asarray(self.prices if prices is None else prices, dtype=np.float64)
+        return prices[..., np.asarray(self.columns, dtype=np.intp)] * np.asarray(self.amounts, dtype=np.float64)
+
+    def drink_costs(self, prices=None):
+        """Ingredient cost of every drink, summed line by line in breakdown order
+
+        Accepts a single price vector or a matrix with one price vector per row
+        (scenarios), returning one cost per drink or a scenarios x drinks matrix.
+        """
+        costs = self.line_costs(prices)
+        counts = np.fromiter((count for _, _, count in self.drinks), dtype=np.intp, count=len(self.drinks))
+        rows = np.repeat(np.arange(len(self.drinks)), counts)
+        positions = np.arange(len(self.lines)) - np.repeat(np.cumsum(counts) - counts, counts)
+        grid = np.zeros(costs.shape[:-1] + (len(self.drinks), max(int(counts.max(initial=0)), 1)), dtype=np.float64)
+        grid[..., rows, positions] = costs
+        # Adding the line columns one at a time keeps Python's left-to-right
+        # summation order, so totals round exactly like the reference loop
+        totals = np.zeros(grid.shape[:-1], dtype=np.float64)
+        for position in range(grid.shape[-1]):
+            totals += grid[..., position]
+        return totals
+
+    def results(self):
+        """The /api/calculate results list for this configuration
+
+        The breakdown lines are the model's own dicts, so every call returns
+        the same line objects.
+        """
+        costs = self.line_costs()
+        totals = self.drink_costs().tolist()
+        lines = self.lines
+        for line, cost in zip(lines, _round_cents(costs)):
+            line['total_cost'] = cost
+
+        cleaning_cost_per_product = self.cleaning_cost_per_product
+        rounded_cleaning_per_product = round(cleaning_cost_per_product, 2)
+        rounded_cleaning_cost = round(self.cleaning_cost, 2)
+        results = []
+        for (name, start, count), drink_cost in zip(self.drinks, totals):
+            total_cost = (drink_cost if count else 0) + cleaning_cost_per_product
+            results.append({
+                'name': name,
+                'total_cost': round(total_cost, 2),
+                'cleaning_cost_per_product': rounded_cleaning_per_product,
+                'total_cleaning_cost': rounded_cleaning_cost,
+                'breakdown': lines[start:start + count]
+            })
+        return results
+
+
+def _round_cents(values):
+    """round(value, 2) for every element, exactly as Python rounds floats"""
+    scaled = values * 100
+    cents = np.rint(scaled)
+    # rint(x * 100) / 100 is the correctly rounded result unless x * 100 lies
+    # so close to a half cent that the scaling error could flip it; those few
+    # values (and huge or non-finite ones) go through Python's round()
+    with np.errstate(invalid='ignore'):
+        fallback = ~(np.abs(scaled) < 1e9) | (np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) < 1e-6)
+    rounded = (cents / 100).tolist()
+    if fallback.any():
+        source = values.tolist()
+        for index in np.flatnonzero(fallback).tolist():
+            rounded[index] = round(source[index], 2)
+    return rounded
+
+
+def _canonical_config(config):
+    drinks = [
+        # A drink's ingredient and tea bag order is its breakdown order
+        dict(drink, ingredients=list(drink.get('ingredients', {}).items()),
+             tea_bags=list(drink.get('tea_bags', {}).items()))
+        for drink in config.get('drinks', [])
+    ]
+    return dict(config, drinks=drinks)
+
+
+def canonical_input(data):
+    """Canonical JSON text of a calculation request, used as its cache identity
+
+    Keys are sorted except where their order shows up in the output, so the
+    same calculation has the same text whichever client serialized it.
+    """
+    try:
+        if 'configs' in data:
+            data = dict(data, configs=[_canonical_config(config) for config in data['configs']])
+        else:
+            data = _canonical_config(data)
+        sort_keys = True
+    except (AttributeError, TypeError):
+        # Malformed input: keep it as sent, the calculation will report the error
+        sort_keys = False
+    return json.dumps(data, sort_keys=sort_keys, separators=(',', ':'), ensure_ascii=False)
+
+
+def _compile(config):
+    """CostModel for a configuration, or None if it must go through the reference loop"""
+    try:
+        model = CostModel(config)
+    except (AttributeError, TypeError):
+        return None
+    return model if model.is_vectorizable() else None
+
+
+def calculate(config):
+    """Cost a single configuration (the /api/calculate request body)"""
+    drinks = config.get('drinks', [])
+    model = _compile(config) if isinstance(drinks, list) and len(drinks) >= NUMPY_MIN_DRINKS else None
+    if model is None:
+        return calculate_reference(config)
+    return model.results()
+
+
+def calculate_batch(configs):
+    """Cost several configurations; returns one results list per config"""
+    return [calculate(config) for config in configs]
+
+
+def _factor(value, label):
+    if type(value) not in _NUMBER_TYPES:
+        raise ValueError(f'Price factor for {label} must be a number')
+    return float(value)
+
+
+def expand_grid(grid):
+    """Every combination of the factors in a grid, as a list of scenarios
+
+    The grid has the same shape as a scenario with a list of factors in place
+    of each factor, e.g. {"ingredients": {"milk": [1.0, 1.1]}, "cleaning_cost": [1, 2]}.
+    """
+    axes = [('ingredients', name, factors) for name, factors in grid.get('ingredients', {}).items()]
+    axes += [('tea_bags', name, factors) for name, factors in grid.get('tea_bags', {}).items()]
+    if 'cleaning_cost' in grid:
+        axes.append(('cleaning_cost', None, grid['cleaning_cost']))
+
+    scenarios = []
+    for combination in itertools.product(*(factors for _, _, factors in axes)):
+        scenario = {'name': ', '.join(f"{name or group} x{factor:g}" for (group, name, _), factor in zip(axes, combination))}
+        for (group, name, _), factor in zip(axes, combination):
+            if name is None:
+                scenario[group] = factor
+            else:
+                scenario.setdefault(group, {})[name] = factor
+        scenarios.append(scenario)
+    return scenarios
+
+
+def sweep(config, scenarios):
+    """Per-drink cost and margin of a configuration under each price scenario
+
+    A scenario multiplies ingredient and tea bag prices by the given factors,
+    e.g. {"name": "Milk +10%", "ingredients": {"milk": 1.1}, "cleaning_cost": 2}.
+    All scenarios are evaluated together: one price vector per scenario times
+    the configuration's quantity matrix. Returns (baseline, [scenario results]).
+    """
+    model = CostModel(config)
+    columns = {}
+    for column, (kind, name) in enumerate(model.price_names):
+        if kind != 'custom':
+            columns[(kind, name)] = column
+
+    base_prices = [float(price) for price in model.prices]
+    price_rows = [base_prices]
+    cleaning = [model.cleaning_cost_per_product]
+    for scenario in scenarios:
+        prices = list(base_prices)
+        for group, kind in (('ingredients', 'bulk'), ('tea_bags', 'per_unit')):
+            for name, factor in scenario.get(group, {}).items():
+                column = columns.get((kind, name))
+                if column is None:
+                    raise ValueError(f'Unknown {group[:-1].replace("_", " ")}: {name}')
+                prices[column] *= _factor(factor, name)
+        price_rows.append(prices)
+        cleaning.append(model.cleaning_cost_per_product * _factor(scenario.get('cleaning_cost', 1), 'cleaning_cost'))
+
+    if HAVE_NUMPY:
+        totals = model.drink_costs(price_rows) + np.asarray(cleaning, dtype=np.float64)[:, None]
+        rounded = _round_cents(totals.ravel())
+    else:
+        rounded = []
+        for prices, cleaning_cost_per_product in zip(price_rows, cleaning):
+            line_costs = [prices[column] * amount for column, amount in zip(model.columns, model.amounts)]
+            for _, start, count in model.drinks:
+                drink_cost = 0.0
+                for cost in line_costs[start:start + count]:
+                    drink_cost += cost
+                rounded.append(round(drink_cost + cleaning_cost_per_product, 2))
+
+    vending_prices = [drink.get('vending_price', 0) or 0 for drink in config.get('drinks', [])]
+    drink_count = len(model.drinks)
+    results = []
+    for row in range(len(price_rows)):
+        drinks = []
+        for (name, _, _), vending_price, total_cost in zip(model.drinks, vending_prices, rounded[row * drink_count:(row + 1) * drink_count]):
+            drink = {'name': name, 'total_cost': total_cost, 'vending_price': vending_price}
+            if vending_price > 0:
+                profit = vending_price - total_cost
+                drink['profit'] = round(profit, 2)
+                drink['profit_margin'] = round((profit / vending_price) * 100, 1)
+            else:
+                drink['profit'] = None
+                drink['profit_margin'] = None
+            drinks.append(drink)
+        results.append(drinks)
+
+    return results[0], [dict(scenario, drinks=drinks) for scenario, drinks in zip(scenarios, results[1:])]
+
+
+class IncrementalCalculation:
+    """A configuration kept between edits so that only affected drinks are recosted
+
+    Drinks are addressed by client-chosen keys. An index from each ingredient
+    and tea bag to the drinks using it tells which drinks a price change
+    touches; changing the cleaning cost or products per day touches all.
+    """
+
+    def __init__(self, config, keys=None):
+        drinks = config.get('drinks', [])
+        keys = [str(key) for key in keys] if keys is not None else [str(index) for index in range(len(drinks))]
+        if len(keys) != len(drinks) or len(set(keys)) != len(keys):
+            raise ValueError('Drink keys must be unique, one per drink')
+
+        self.prices = {'ingredients': dict(config.get('ingredients', {})), 'tea_bags': dict(config.get('tea_bags', {}))}
+        self.cleaning_cost = config.get('cleaning_cost', 0)
+        self.products_per_day = config.get('products_per_day', 1)
+        self.drinks = {}
+        self.results = {}
+        self._users = {}  # {(group, name): set of drink keys}
+        for key, drink in zip(keys, drinks):
+            self._set_drink(key, drink)
+        self.recosted = 0
+        self._recost(keys)
+
+    def _index(self, key, drink, add):
+        for group in ('ingredients', 'tea_bags'):
+            for name in drink.get(group, {}):
+                users = self._users.setdefault((group, name), set())
+                if add:
+                    users.add(key)
+                else:
+                    users.discard(key)
+
+    def _set_drink(self, key, drink):
+        if key in self.drinks:
+            self._index(key, self.drinks[key], add=False)
+        self.drinks[key] = drink
+        self._index(key, drink, add=True)
+
+    def _recost(self, keys):
+        """Recost the given drinks; returns {key: result} for results that changed"""
+        results = calculate({
+            'ingredients': self.prices['ingredients'],
+            'tea_bags': self.prices['tea_bags'],
+            'cleaning_cost': self.cleaning_cost,
+            'products_per_day': self.products_per_day,
+            'drinks': [self.drinks[key] for key in keys]
+        })
+        self.recosted += len(keys)
+        changed = {}
+        for key, result in zip(keys, results):
+            if self.results.get(key) != result:
+                self.results[key] = result
+                changed[key] = result
+        return changed
+
+    def apply(self, changes):
+        """Apply a delta and recost what it affects
+
+        `changes` may hold changed prices under 'ingredients' / 'tea_bags'
+        (None removes one), 'cleaning_cost', 'products_per_day', changed or
+        added drinks under 'drinks' by key (None removes one) and the new
+        drink 'order'. Returns {key: result} for every drink whose result
+        changed, with None for removed drinks.
+        """
+        dirty = set()
+        for group in ('ingredients', 'tea_bags'):
+            for name, price in changes.get(group, {}).items():
+                if price is None:
+                    self.prices[group].pop(name, None)
+                else:
+                    self.prices[group][name] = price
+                dirty |= self._users.get((group, name), set())
+
+        for field in ('cleaning_cost', 'products_per_day'):
+            if field in changes and changes[field] != getattr(self, field):
+                setattr(self, field, changes[field])
+                dirty.update(self.drinks)
+
+        removed = {}
+        for key, drink in changes.get('drinks', {}).items():
+            key = str(key)
+            if drink is None:
+                if key in self.drinks:
+                    self._index(key, self.drinks.pop(key), add=False)
+                    self.results.pop(key, None)
+                    removed[key] = None
+            else:
+                self._set_drink(key, drink)
+                dirty.add(key)
+
+        if 'order' in changes:
+            order = [str(key) for key in changes['order']]
+            if sorted(order) != sorted(self.drinks):
+                raise ValueError('Drink order must list every drink exactly once')
+            self.drinks = {key: self.drinks[key] for key in order}
+
+        changed = self._recost([key for key in self.drinks if key in dirty])
+        changed.update(removed)
+        return changed
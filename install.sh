@@ -348,7 +348,7 @@ Group=${SERVICE_GROUP}
 WorkingDirectory=${INSTALL_DIR}
 Environment="PATH=${VENV_DIR}/bin"
 Environment="SECRET_KEY=${SECRET_KEY}"
-ExecStart=${VENV_DIR}/bin/gunicorn --bind 0.0.0.0:5000 --workers 4 --timeout 120 --access-logfile - --error-logfile - app:app
+ExecStart=${VENV_DIR}/bin/gunicorn --bind 0.0.0.0:5000 --workers 4 --threads 8 --timeout 120 --access-logfile - --error-logfile - app:app
 ExecReload=/bin/kill -s HUP \$MAINPID
 KillMode=mixed
 TimeoutStopSec=5
@@ -0,0 +1,364 @@
+"""
+PDF rendering of cost reports.
+
+Kept free of the Flask app so that reports can also be rendered in worker
+processes (see the bulk export endpoint), which import only this module.
+"""
+
+from reportlab.lib.pagesizes import letter, A4
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from io import BytesIO
+from datetime import datetime
+import sqlite3
+
+
+def render_report_pdf(data, cursor=None, user_id=None):
+    """Render the cost report PDF; the sales sections need a cursor and the user's id"""
+    cleaning_cost = data.get('cleaning_cost', 0)
+    products_per_day = data.get('products_per_day', 1)
+    ingredients = data.get('ingredients', {})
+    drinks = data.get('drinks', [])
+    results = data.get('results', [])
+    
+    # Create PDF in memory
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72,
+                          topMargin=72, bottomMargin=18)
+    
+    # Container for the 'Flowable' objects
+    elements = []
+    
+    # Define styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#2c3e50'),
+        spaceAfter=30,
+        alignment=1  # Center alignment
+    )
+    
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=colors.HexColor('#34495e'),
+        spaceAfter=12,
+        spaceBefore=12
+    )
+    
+    # Title
+    title = Paragraph("Coffee Cost Calculator Report", title_style)
+    elements.append(title)
+    
+    # Date
+    date_text = Paragraph(f"<i>Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</i>", 
+                         styles['Normal'])
+    elements.append(date_text)
+    elements.append(Spacer(1, 20))
+    
+    # Fixed Costs Section
+    if cleaning_cost > 0:
+        elements.append(Paragraph("Fixed Daily Costs", heading_style))
+        
+        fixed_cost_data = [
+            ['Cost Type', 'Amount'],
+            ['Daily Cleaning Cost', f"€{cleaning_cost:.2f}"],
+            ['Expected Products per Day', str(int(products_per_day))],
+            ['Cleaning Cost per Product', f"€{(cleaning_cost / products_per_day):.2f}"]
+        ]
+        
+        fixed_cost_table = Table(fixed_cost_data, colWidths=[3*inch, 2*inch])
+        fixed_cost_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e67e22')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+        ]))
+        elements.append(fixed_cost_table)
+        elements.append(Spacer(1, 30))
+    
+    # Ingredients Section
+    elements.append(Paragraph("Ingredient Costs", heading_style))
+    
+    # Define liquid ingredients
+    liquid_ingredients = ['milk', 'water', 'vanilla_syrup']
+    
+    ingredient_data = [['Ingredient', 'Cost per Unit']]
+    for name, cost in ingredients.items():
+        unit = 'L' if name in liquid_ingredients else 'kg'
+        ingredient_data.append([name.replace('_', ' ').title(), f"€{cost:.2f}/{unit}"])
+    
+    ingredient_table = Table(ingredient_data, colWidths=[3*inch, 2*inch])
+    ingredient_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+    ]))
+    elements.append(ingredient_table)
+    elements.append(Spacer(1, 30))
+    
+    # Drinks Section
+    elements.append(Paragraph("Drink Costs Breakdown", heading_style))
+    
+    for result in results:
+        # Find matching drink data for vending price
+        drink_data = next((d for d in drinks if d.get('name') == result['name']), None)
+        vending_price = drink_data.get('vending_price', 0) if drink_data else 0
+        
+        # Drink name with profit info
+        if vending_price > 0:
+            profit = vending_price - result['total_cost']
+            profit_margin = (profit / vending_price) * 100
+            drink_name = Paragraph(
+                f"<b>{result['name']}</b> - Production Cost: €{result['total_cost']:.2f} | "
+                f"Vending Price: €{vending_price:.2f} | "
+                f"Profit: €{profit:.2f} ({profit_margin:.1f}%)", 
+                styles['Heading3']
+            )
+        else:
+            drink_name = Paragraph(f"<b>{result['name']}</b> - Total Cost: €{result['total_cost']:.2f}", 
+                                  styles['Heading3'])
+        elements.append(drink_name)
+        elements.append(Spacer(1, 6))
+        
+        # Breakdown table
+        breakdown_data = [['Item', 'Amount', 'Unit Cost', 'Total']]
+        
+        ingredient_subtotal = 0
+        for item in result['breakdown']:
+            ingredient_name = item['ingredient']
+            amount_in_base = item['amount']
+            ingredient_subtotal += item['total_cost']
+            
+            # Convert to g/ml for display
+            if ingredient_name in liquid_ingredients:
+                amount_display = f"{amount_in_base * 1000:.1f} ml"
+                unit_display = "L"
+            else:
+                amount_display = f"{amount_in_base * 1000:.1f} g"
+                unit_display = "kg"
+            
+            breakdown_data.append([
+                ingredient_name.replace('_', ' ').title(),
+                amount_display,
+                f"€{item['unit_cost']:.2f}/{unit_display}",
+                f"€{item['total_cost']:.2f}"
+            ])
+        
+        # Add cleaning cost row if present
+        if result.get('cleaning_cost_per_product', 0) > 0:
+            breakdown_data.append([
+                'Daily Cleaning Cost',
+                'Per product',
+                f"€{result.get('total_cleaning_cost', 0):.2f}/day",
+                f"€{result['cleaning_cost_per_product']:.2f}"
+            ])
+        
+        breakdown_table = Table(breakdown_data, colWidths=[2*inch, 1.5*inch, 1.5*inch, 1.5*inch])
+        breakdown_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2ecc71')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+        ]))
+        elements.append(breakdown_table)
+        elements.append(Spacer(1, 20))
+    
+    # Sales Statistics Section (if user is logged in)
+    if cursor is not None and user_id is not None:
+        try:
+            # Get sales statistics for last 30 days
+            cursor.execute('''
+                SELECT 
+                    product_name,
+                    SUM(quantity) as total_quantity,
+                    SUM(revenue) as total_revenue,
+                    SUM(unit_price_sum) / SUM(record_count) as avg_price
+                FROM sales_daily
+                WHERE user_id = ? AND sale_date >= DATE('now', '-30 days')
+                GROUP BY product_name
+                ORDER BY total_revenue DESC
+            ''', (user_id,))
+            
+            sales_data = cursor.fetchall()
+            
+            if sales_data:
+                elements.append(Spacer(1, 30))
+                elements.append(Paragraph("Sales Statistics (Last 30 Days)", heading_style))
+                
+                total_revenue = sum(row[2] for row in sales_data)
+                total_items = sum(row[1] for row in sales_data)
+                
+                # Summary box
+                summary_data = [
+                    ['Metric', 'Value'],
+                    ['Total Items Sold', str(int(total_items))],
+                    ['Total Revenue', f"€{total_revenue:.2f}"]
+                ]
+                
+                summary_table = Table(summary_data, colWidths=[3*inch, 2*inch])
+                summary_table.setStyle(TableStyle([
+                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#9b59b6')),
+                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                    ('FONTSIZE', (0, 0), (-1, 0), 12),
+                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+                    ('FONTSIZE', (0, 1), (-1, -1), 10),
+                ]))
+                elements.append(summary_table)
+                elements.append(Spacer(1, 20))
+                
+                # Product breakdown
+                elements.append(Paragraph("Sales by Product", styles['Heading3']))
+                elements.append(Spacer(1, 10))
+                
+                product_data = [['Product', 'Quantity', 'Avg Price', 'Revenue']]
+                for row in sales_data:
+                    product_data.append([
+                        row[0],
+                        str(int(row[1])),
+                        f"€{row[3]:.2f}",
+                        f"€{row[2]:.2f}"
+                    ])
+                
+                product_table = Table(product_data, colWidths=[2.5*inch, 1.5*inch, 1.5*inch, 1.5*inch])
+                product_table.setStyle(TableStyle([
+                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#16a085')),
+                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                    ('FONTSIZE', (0, 0), (-1, 0), 10),
+                    ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+                    ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey),
+                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+                    ('FONTSIZE', (0, 1), (-1, -1), 9),
+                ]))
+                elements.append(product_table)
+                elements.append(Spacer(1, 20))
+                
+                # Cash register reconciliation
+                cursor.execute('''
+                    SELECT cash_in_register, reading_date, id
+                    FROM counter_readings
+                    WHERE user_id = ?
+                    ORDER BY reading_date DESC, id DESC
+                    LIMIT 1
+                ''', (user_id,))
+                
+                latest_reading = cursor.fetchone()
+                
+                if latest_reading:
+                    elements.append(Paragraph("Cash Register Status", styles['Heading3']))
+                    elements.append(Spacer(1, 10))
+                    
+                    # Calculate expected vs actual
+                    actual_cash = latest_reading[0]
+                    last_date = latest_reading[1]
+                    
+                    # Sales since the previous reading, from the revenue rollup
+                    cursor.execute('''
+                        SELECT revenue
+                        FROM reading_revenue
+                        WHERE reading_id = ?
+                    ''', (latest_reading[2],))
+                    
+                    rollup = cursor.fetchone()
+                    sales_since = rollup[0] if rollup else 0
+                    
+                    cursor.execute('''
+                        SELECT 
+                            COALESCE(SUM(CASE WHEN event_type = 'withdrawal' THEN amount ELSE 0 END), 0) as withdrawals,
+                            COALESCE(SUM(CASE WHEN event_type = 'deposit' THEN amount ELSE 0 END), 0) as deposits
+                        FROM cash_register_events
+                        WHERE user_id = ? AND event_date >= ?
+                    ''', (user_id, last_date))
+                    
+                    cash_events = cursor.fetchone()
+                    withdrawals = cash_events[0]
+                    deposits = cash_events[1]
+                    
+                    # Get previous cash
+                    cursor.execute('''
+                        SELECT cash_in_register
+                        FROM counter_readings
+                        WHERE user_id = ? AND (reading_date, id) < (?, ?)
+                        ORDER BY reading_date DESC, id DESC
+                        LIMIT 1
+                    ''', (user_id, last_date, latest_reading[2]))
+                    
+                    prev = cursor.fetchone()
+                    prev_cash = prev[0] if prev else 0
+                    
+                    expected_cash = prev_cash + sales_since + deposits - withdrawals
+                    difference = actual_cash - expected_cash
+                    
+                    cash_data = [
+                        ['Description', 'Amount'],
+                        ['Expected Cash in Register', f"€{expected_cash:.2f}"],
+                        ['Actual Cash in Register', f"€{actual_cash:.2f}"],
+                        ['Difference', f"€{difference:.2f}"],
+                        ['Status', 'OK' if abs(difference) < 5 else ('Warning' if abs(difference) < 10 else 'Check Required')]
+                    ]
+                    
+                    cash_table = Table(cash_data, colWidths=[3*inch, 2*inch])
+                    cash_table.setStyle(TableStyle([
+                        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e74c3c' if abs(difference) > 10 else '#e67e22' if abs(difference) > 5 else '#27ae60')),
+                        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                        ('FONTSIZE', (0, 0), (-1, 0), 12),
+                        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+                        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+                        ('FONTSIZE', (0, 1), (-1, -1), 10),
+                    ]))
+                    elements.append(cash_table)
+            
+        except Exception as e:
+            # If sales tracking fails, just skip it and continue with regular PDF
+            print(f"Sales statistics error in PDF: {e}")
+    
+    # Build PDF
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+_connections = {}  # {database path: read-only connection} of this process
+
+def render_report_in_process(database_path, data, user_id):
+    """Process pool entry point: render with this process's own read-only connection"""
+    conn = _connections.get(database_path)
+    if conn is None:
+        conn = sqlite3.connect(f'file:{database_path}?mode=ro', uri=True, timeout=30)
+        _connections[database_path] = conn
+    return render_report_pdf(data, conn.cursor(), user_id)
@@ -0,0 +1,139 @@
+"""
+Offline rebuild of sales records from counter readings.
+
+Worker side of the `rebuild-sales` command. Each call re-measures one slice
+of a scope's readings, ordered by (reading_date, id), on the process's own
+read-only connection and returns only the intervals whose stored sales
+differ, so the parent never holds more than a slice's worth of changes.
+Kept free of the Flask app so the worker processes import only this module.
+"""
+
+import sqlite3
+
+
+_connections = {}  # {database path: read-only connection} of this process
+
+def _connection(database_path):
+    conn = _connections.get(database_path)
+    if conn is None:
+        conn = sqlite3.connect(f'file:{database_path}?mode=ro', uri=True, timeout=30)
+        _connections[database_path] = conn
+    return conn
+
+def _slice_readings(cursor, scope, scope_params, lower, upper, batch_rows):
+    """Yield (reading id, user id, config id, reading date, {product: count}) from lower to upper inclusive"""
+    conditions = [scope]
+    params = list(scope_params)
+    if lower:
+        conditions.append('(cr.reading_date, cr.id) >= (?, ?)')
+        params.extend(lower)
+    if upper:
+        conditions.append('(cr.reading_date, cr.id) <= (?, ?)')
+        params.extend(upper)
+
+    cursor.execute(f'''
+        SELECT cr.id, cr.user_id, cr.config_id, datetime(cr.reading_date), p.name, cv.count
+        FROM counter_readings cr
+        LEFT JOIN counter_values cv ON cv.reading_id = cr.id
+        LEFT JOIN products p ON p.id = cv.product_id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY cr.reading_date, cr.id, cv.product_id
+    ''', params)
+
+    reading = None
+    while True:
+        rows = cursor.fetchmany(batch_rows)
+        if not rows:
+            break
+        for reading_id, user_id, config_id, reading_date, product_name, count in rows:
+            if reading is None or reading[0] != reading_id:
+                if reading is not None:
+                    yield reading
+                reading = (reading_id, user_id, config_id, reading_date, {})
+            if product_name is not None:
+                reading[4][product_name] = count
+    if reading is not None:
+        yield reading
+
+def _stored_sales(cursor, reading_id):
+    cursor.execute('''
+        SELECT id, user_id, config_id, start_reading_id, product_name, quantity_sold,
+               unit_price, total_revenue, created_at
+        FROM sales_records
+        WHERE end_reading_id = ?
+    ''', (reading_id,))
+    return cursor.fetchall()
+
+def _sales_key(sales):
+    return sorted((user_id, config_id, start_id, product_name, quantity, unit_price, round(revenue, 6))
+                  for user_id, config_id, start_id, product_name, quantity, unit_price, revenue in sales)
+
+def rebuild_slice(database_path, scope, scope_params, lower, upper, fallback_prices,
+                  override_prices=None, batch_rows=1000):
+    """Re-measure the readings after `lower` up to `upper` ((reading_date, id) keys, None for open ends)
+
+    The reading at `lower` is only the start of the first interval; without a
+    lower bound the scope's first reading is the baseline and records no
+    sales. Each product is priced at override_prices, else the unit price
+    stored on the interval, else on the interval before it, else
+    fallback_prices.
+
+    Returns {'readings': readings checked, 'changes': [...], 'unpriced':
+    {product: units}}, each change being {'reading_id', 'user_id',
+    'config_id', 'delete': [stored sales ids], 'old': [...], 'new': [...],
+    'created_at'} with old and new sales as (user_id, config_id, start id,
+    product, quantity, unit price, revenue).
+    """
+    conn = _connection(database_path)
+    cursor = conn.cursor()
+    sales_cursor = conn.cursor()
+
+    checked = 0
+    changes = []
+    unpriced = {}
+    previous = None
+    previous_prices = {}
+    try:
+        for reading_id, user_id, config_id, reading_date, counts in _slice_readings(
+                cursor, scope, scope_params, lower, upper, batch_rows):
+            stored = _stored_sales(sales_cursor, reading_id)
+            stored_prices = {row[4]: row[6] for row in stored}
+            if previous is None and lower:
+                # The slice's first reading belongs to the previous slice
+                previous, previous_prices = (reading_id, counts), stored_prices
+                continue
+
+            checked += 1
+            expected = []
+            if previous is not None:
+                prices = fallback_prices | previous_prices | stored_prices | (override_prices or {})
+                start_id, start_counts = previous
+                for product_name, count in counts.items():
+                    quantity_sold = count - start_counts.get(product_name, 0)
+                    if quantity_sold <= 0:
+                        continue
+                    unit_price = prices.get(product_name)
+                    if unit_price is None:
+                        unpriced[product_name] = unpriced.get(product_name, 0) + quantity_sold
+                        continue
+                    expected.append((user_id, config_id, start_id, product_name,
+                                     quantity_sold, unit_price, quantity_sold * unit_price))
+
+            old = [row[1:8] for row in stored]
+            if _sales_key(old) != _sales_key(expected):
+                changes.append({
+                    'reading_id': reading_id,
+                    'user_id': user_id,
+                    'config_id': config_id,
+                    'delete': [row[0] for row in stored],
+                    'old': old,
+                    'new': expected,
+                    # Re-measured sales stay on the day they were first recorded
+                    'created_at': min((row[8] for row in stored if row[8]), default=reading_date)
+                })
+            previous, previous_prices = (reading_id, counts), stored_prices
+    finally:
+        cursor.close()
+        sales_cursor.close()
+
+    return {'readings': checked, 'changes': changes, 'unpriced': unpriced}
@@ -1,5 +1,6 @@
 let drinkCounter = 0;
 let calculationResults = null;
+let lastCalculation = null; // { etag, results } of the last /api/calculate response
 let currentConfigId = null;
 let currentConfigName = null;
 
@@ -332,9 +333,7 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Always load all sales data on page load
         populateCounterInputs();
-        loadRecentReadings();
-        loadCashRegisterBalance();
-        loadCashEvents();
+        loadDashboard(['readings', 'balance', 'events']);
         
         // Note: Statistics will load when switched to that tab
     }
@@ -478,6 +477,7 @@ function collectData() {
     
     // Collect drinks
     const drinks = [];
+    const drinkKeys = []; // card id of each collected drink, for incremental recalculation
     const drinkCards = document.querySelectorAll('.drink-card');
     
     drinkCards.forEach(card => {
@@ -545,16 +545,20 @@ function collectData() {
                 custom_items: customItems,
                 vending_price: vendingPrice
             });
+            drinkKeys.push(drinkId);
         }
     });
     
-    return {
+    const data = {
         cleaning_cost: cleaningCost,
         products_per_day: productsPerDay,
         ingredients: ingredientCosts,
         tea_bags: teaBags,
         drinks: drinks
     };
+    // Not enumerable, so it is never part of a request or saved configuration
+    Object.defineProperty(data, 'drinkKeys', { value: drinkKeys });
+    return data;
 }
 
 async function calculateCosts() {
@@ -575,16 +579,9 @@ async function calculateCosts() {
     console.log('Drinks:', data.drinks);
     
     try {
-        const response = await fetch('/api/calculate', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            credentials: 'include',
-            body: JSON.stringify(data)
-        });
-        
-        const result = await response.json();
+        const result = currentConfigId
+            ? await recalculateSavedConfig(data)
+            : await calculateFull(data);
         
         console.log('=== Calculation Results ===');
         console.log('Results from backend:', result.results);
@@ -615,6 +612,124 @@ async function calculateCosts() {
     }
 }
 
+async function calculateFull(data) {
+    const headers = {
+        'Content-Type': 'application/json'
+    };
+    if (lastCalculation) {
+        headers['If-None-Match'] = lastCalculation.etag;
+    }
+    
+    const response = await fetch('/api/calculate', {
+        method: 'POST',
+        headers: headers,
+        credentials: 'include',
+        body: JSON.stringify(data)
+    });
+    
+    // 304: the input is unchanged, so the previous results still apply
+    if (response.status === 304) {
+        return { success: true, results: lastCalculation.results };
+    }
+    
+    const result = await response.json();
+    if (result.success && response.headers.get('ETag')) {
+        lastCalculation = { etag: response.headers.get('ETag'), results: result.results };
+    }
+    return result;
+}
+
+// Server-side state of the loaded configuration: only changed prices and
+// drinks are sent, and only drinks whose result changed come back
+let recalcState = null; // { configId, state, data, keys, drinkJson, results }
+
+function changedPrices(previous, current) {
+    const changes = {};
+    Object.entries(current).forEach(([name, price]) => {
+        if (previous[name] !== price) {
+            changes[name] = price;
+        }
+    });
+    Object.keys(previous).forEach(name => {
+        if (!(name in current)) {
+            changes[name] = null;
+        }
+    });
+    return changes;
+}
+
+async function postRecalculation(configId, body) {
+    return fetch(`/api/configs/${configId}/recalculate`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        credentials: 'include',
+        body: JSON.stringify(body)
+    });
+}
+
+async function recalculateSavedConfig(data) {
+    const configId = currentConfigId;
+    const keys = data.drinkKeys;
+    const drinkJson = {};
+    keys.forEach((key, i) => {
+        drinkJson[key] = JSON.stringify(data.drinks[i]);
+    });
+    
+    const fullBody = { config: data, keys: keys };
+    let body = fullBody;
+    const previous = recalcState && recalcState.configId === configId ? recalcState : null;
+    if (previous) {
+        body = {
+            base: previous.state,
+            ingredients: changedPrices(previous.data.ingredients, data.ingredients),
+            tea_bags: changedPrices(previous.data.tea_bags, data.tea_bags),
+            cleaning_cost: data.cleaning_cost,
+            products_per_day: data.products_per_day,
+            drinks: {}
+        };
+        keys.forEach((key, i) => {
+            if (previous.drinkJson[key] !== drinkJson[key]) {
+                body.drinks[key] = data.drinks[i];
+            }
+        });
+        previous.keys.forEach(key => {
+            if (!(key in drinkJson)) {
+                body.drinks[key] = null;
+            }
+        });
+        if (JSON.stringify(previous.keys) !== JSON.stringify(keys)) {
+            body.order = keys;
+        }
+    }
+    
+    let response = await postRecalculation(configId, body);
+    // 409: this worker no longer has our state, start over with the full input
+    if (response.status === 409 && body !== fullBody) {
+        body = fullBody;
+        response = await postRecalculation(configId, body);
+    }
+    
+    const result = await response.json();
+    if (!result.success) {
+        recalcState = null;
+        return result;
+    }
+    
+    const results = body === fullBody ? {} : { ...previous.results };
+    Object.entries(result.results).forEach(([key, drinkResult]) => {
+        if (drinkResult === null) {
+            delete results[key];
+        } else {
+            results[key] = drinkResult;
+        }
+    });
+    
+    recalcState = { configId: configId, state: result.state, data: data, keys: keys, drinkJson: drinkJson, results: results };
+    return { success: true, results: result.order.map(key => results[key]) };
+}
+
 function displayResults(results) {
     const resultsSection = document.getElementById('results');
     const resultsContainer = document.getElementById('results-container');
@@ -765,8 +880,12 @@ async function downloadPDF() {
         return;
     }
     
+    const pdfBtn = document.getElementById('download-pdf-btn');
+    const buttonText = pdfBtn ? pdfBtn.textContent : '';
+    
     try {
-        const response = await fetch('/api/generate-pdf', {
+        // Reports are rendered in the background: queue one, then poll until it is ready
+        const response = await fetch('/api/reports', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -774,33 +893,94 @@ async function downloadPDF() {
             credentials: 'include',
             body: JSON.stringify(calculationResults)
         });
+        const queued = await response.json();
         
-        if (response.ok) {
-            const blob = await response.blob();
-            const url = window.URL.createObjectURL(blob);
+        if (!queued.success) {
+            alert('Error generating PDF: ' + queued.error);
+            return;
+        }
+        
+        if (pdfBtn) {
+            pdfBtn.disabled = true;
+            pdfBtn.textContent = 'Generating PDF...';
+        }
+        
+        let job = null;
+        for (let attempt = 0; attempt < 180; attempt++) {
+            await new Promise(resolve => setTimeout(resolve, attempt < 5 ? 300 : 1000));
+            const statusResponse = await fetch(queued.status_url, { credentials: 'include' });
+            const status = await statusResponse.json();
+            if (!status.success) {
+                alert('Error generating PDF: ' + status.error);
+                return;
+            }
+            if (status.job.status === 'done' || status.job.status === 'failed') {
+                job = status.job;
+                break;
+            }
+        }
+        
+        if (!job) {
+            alert('The PDF is taking longer than expected. Please try again later.');
+        } else if (job.status === 'failed') {
+            alert('Error generating PDF: ' + job.error);
+        } else {
             const a = document.createElement('a');
-            a.href = url;
-            a.download = `coffee_cost_report_${new Date().toISOString().slice(0, 10)}.pdf`;
+            a.href = job.download_url;
             document.body.appendChild(a);
             a.click();
-            window.URL.revokeObjectURL(url);
             document.body.removeChild(a);
-        } else {
-            alert('Error generating PDF');
         }
     } catch (error) {
         alert('Error: ' + error.message);
+    } finally {
+        if (pdfBtn) {
+            pdfBtn.disabled = false;
+            pdfBtn.textContent = buttonText;
+        }
+    }
+}
+
+function exportAllReports() {
+    // The ZIP is streamed while the reports render, so let the browser download it directly
+    window.location.href = '/api/reports/bulk?config_ids=all';
+}
+
+// Read endpoints answer 304 while the data they depend on is unchanged, so
+// the last body of each URL is kept with its ETag and sent back as validator
+const cachedResponses = new Map(); // url -> { etag, data }, least recently used first
+const CACHED_RESPONSES_MAX = 100;
+
+async function fetchJSON(url) {
+    const cached = cachedResponses.get(url);
+    const headers = {};
+    if (cached) {
+        headers['If-None-Match'] = cached.etag;
+    }
+    
+    const response = await fetch(url, { credentials: 'include', headers: headers, cache: 'no-store' });
+    cachedResponses.delete(url);
+    if (response.status === 304 && cached) {
+        cachedResponses.set(url, cached);
+        return cached.data;
+    }
+    
+    const data = await response.json();
+    const etag = response.headers.get('ETag');
+    if (etag && data.success) {
+        cachedResponses.set(url, { etag: etag, data: data });
+        if (cachedResponses.size > CACHED_RESPONSES_MAX) {
+            cachedResponses.delete(cachedResponses.keys().next().value);
+        }
     }
+    return data;
 }
 
 // Configuration Management Functions
 
 async function loadConfigurations() {
     try {
-        const response = await fetch('/api/configs', {
-            credentials: 'include'
-        });
-        const result = await response.json();
+        const result = await fetchJSON('/api/configs');
         
         if (result.success) {
             displayConfigurations(result.configs);
@@ -858,10 +1038,7 @@ async function loadConfiguration(configId) {
         // Clear localStorage when loading a different config
         clearFormState();
         
-        const response = await fetch(`/api/configs/${configId}`, {
-            credentials: 'include'
-        });
-        const result = await response.json();
+        const result = await fetchJSON(`/api/configs/${configId}`);
         
         if (result.success) {
             const config = result.config;
@@ -1022,9 +1199,7 @@ async function loadConfiguration(configId) {
             
             // Update all sales data when configuration is switched
             populateCounterInputs();
-            loadRecentReadings();
-            loadCashRegisterBalance();
-            loadCashEvents();
+            loadDashboard(['readings', 'balance', 'events']);
             
             // Clear results
             calculationResults = null;
@@ -1260,10 +1435,7 @@ let teaBags = {}; // Store tea bag data
 
 async function loadTeaBags() {
     try {
-        const response = await fetch('/api/tea-bags', {
-            credentials: 'include'
-        });
-        const data = await response.json();
+        const data = await fetchJSON('/api/tea-bags');
         
         if (data.success) {
             teaBags = {};
@@ -1482,10 +1654,7 @@ function closeShareModal() {
 
 async function loadSharedUsers(configId) {
     try {
-        const response = await fetch(`/api/configs/${configId}/shared-users`, {
-            credentials: 'include'
-        });
-        const data = await response.json();
+        const data = await fetchJSON(`/api/configs/${configId}/shared-users`);
         
         if (data.success) {
             const container = document.getElementById('sharedUsersList');
@@ -1578,8 +1747,7 @@ function switchTab(tabName) {
         populateCounterInputs();
         loadRecentReadings();
     } else if (tabName === 'register') {
-        loadCashRegisterBalance();
-        loadCashEvents();
+        loadDashboard(['balance', 'events']);
     } else if (tabName === 'statistics') {
         loadSalesStatistics();
     }
@@ -1606,9 +1774,7 @@ function switchMainTab(tabName) {
     if (tabName === 'sales') {
         // Load sales tracking data
         populateCounterInputs();
-        loadRecentReadings();
-        loadCashRegisterBalance();
-        loadCashEvents();
+        loadDashboard(['readings', 'balance', 'events']);
     }
 }
 
@@ -1629,11 +1795,10 @@ async function populateCounterInputs() {
     let lastReadingData = {};
     try {
         const url = currentConfigId 
-            ? `/api/counter-readings?config_id=${currentConfigId}`
-            : '/api/counter-readings';
+            ? `/api/counter-readings?config_id=${currentConfigId}&limit=1`
+            : '/api/counter-readings?limit=1';
         
-        const response = await fetch(url, { credentials: 'include' });
-        const data = await response.json();
+        const data = await fetchJSON(url);
         
         if (data.success && data.readings && data.readings.length > 0) {
             lastReadingData = data.readings[0].counter_data; // Most recent reading
@@ -1797,8 +1962,7 @@ async function submitCounterReading() {
             setCurrentDateTime();  // Reset to current time for next reading
             
             // Reload data and refresh counter inputs
-            loadRecentReadings();
-            loadCashRegisterBalance();
+            loadDashboard(['readings', 'balance']);
             // Re-populate counter inputs to show the updated values
             populateCounterInputs();
         } else {
@@ -1810,70 +1974,184 @@ async function submitCounterReading() {
     }
 }
 
-// Load recent counter readings
-async function loadRecentReadings() {
-    try {
-        const url = currentConfigId 
-            ? `/api/counter-readings?config_id=${currentConfigId}`
-            : '/api/counter-readings';
-        
-        const response = await fetch(url, {
-            credentials: 'include'
-        });
+// History lists (readings, cash events) load one page at a time; the next page
+// is fetched with the cursor from the previous response when the end of the
+// list scrolls into view
+function historyUrl(path, cursor) {
+    const params = new URLSearchParams();
+    if (currentConfigId) {
+        params.set('config_id', currentConfigId);
+    }
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
+    const query = params.toString();
+    return query ? `${path}?${query}` : path;
+}
+
+function createHistoryList({ containerId, path, itemsKey, sortKey, renderItem, emptyHtml }) {
+    const list = { cursor: null, loading: false, generation: 0, observer: null };
+    
+    async function loadPage(reset) {
+        if (reset) {
+            list.generation++;  // responses for an earlier list are dropped
+            list.cursor = null;
+        } else if (list.loading || !list.cursor) {
+            return;
+        }
         
-        const data = await response.json();
+        const generation = list.generation;
+        list.loading = true;
+        try {
+            const data = await fetchJSON(historyUrl(path, list.cursor));
+            if (generation !== list.generation || !data.success) {
+                return;
+            }
+            renderPage(data, reset);
+        } catch (error) {
+            console.error(`Error loading ${itemsKey}:`, error);
+        } finally {
+            if (generation === list.generation) {
+                list.loading = false;
+            }
+        }
+    }
+    
+    function renderPage(data, reset) {
+        const container = document.getElementById(containerId);
+        const items = data[itemsKey] || [];
+        const sentinel = container.querySelector('.history-sentinel');
+        if (reset) {
+            container.innerHTML = items.length === 0 ? emptyHtml : '';
+        } else if (sentinel) {
+            sentinel.remove();
+        }
+        const fragment = document.createDocumentFragment();
+        items.forEach(item => fragment.appendChild(itemElement(item)));
+        container.appendChild(fragment);
         
-        if (data.success && data.readings) {
-            displayRecentReadings(data.readings);
+        list.cursor = data.next_cursor;
+        if (list.observer) {
+            list.observer.disconnect();
+        }
+        if (list.cursor) {
+            const next = document.createElement('div');
+            next.className = 'history-sentinel';
+            container.appendChild(next);
+            list.observer = new IntersectionObserver(entries => {
+                if (entries.some(entry => entry.isIntersecting)) {
+                    loadPage(false);
+                }
+            }, { root: container, rootMargin: '200px' });
+            list.observer.observe(next);
         }
-    } catch (error) {
-        console.error('Error loading readings:', error);
     }
-}
-
-function displayRecentReadings(readings) {
-    const container = document.getElementById('recent-readings');
     
-    if (readings.length === 0) {
-        container.innerHTML = '<p style="color: #999; text-align: center; padding: 20px;">No readings yet</p>';
-        return;
+    // Show a first page fetched elsewhere (the dashboard), replacing the list
+    function showFirstPage(data) {
+        list.generation++;
+        list.loading = false;
+        renderPage(data, true);
     }
     
-    console.log('Displaying recent readings:', readings);
+    // Items carry their id and sort value, so live updates can be placed
+    function itemElement(item) {
+        const template = document.createElement('template');
+        template.innerHTML = renderItem(item).trim();
+        const element = template.content.firstElementChild;
+        element.dataset.id = item.id;
+        element.dataset.sort = item[sortKey];
+        return element;
+    }
     
-    container.innerHTML = readings.map(reading => {
-        const date = new Date(reading.reading_date).toLocaleString();
+    function listedItems(container) {
+        return Array.from(container.children).filter(element => element.dataset.id);
+    }
+    
+    // Add an item in its place in the (newest first) list, unless it is
+    // already shown or belongs to a page that has not been loaded yet
+    function insertItem(item) {
+        const container = document.getElementById(containerId);
+        const items = listedItems(container);
+        if (items.some(element => Number(element.dataset.id) === item.id)) {
+            return;
+        }
         
-        // Check if counter_data exists and is valid
-        let products = '';
-        if (reading.counter_data && typeof reading.counter_data === 'object') {
-            const entries = Object.entries(reading.counter_data);
-            if (entries.length > 0) {
-                products = entries
-                    .map(([name, count]) => `${name}: ${count}`)
-                    .join(', ');
-            } else {
-                products = '<em style="color: #999;">No products recorded</em>';
+        const sort = String(item[sortKey]);
+        const next = items.find(element =>
+            element.dataset.sort < sort || (element.dataset.sort === sort && Number(element.dataset.id) < item.id));
+        if (next) {
+            container.insertBefore(itemElement(item), next);
+        } else if (!list.cursor) {
+            if (items.length === 0) {
+                container.innerHTML = '';
             }
+            container.appendChild(itemElement(item));
+        }
+    }
+    
+    function removeItem(id) {
+        const container = document.getElementById(containerId);
+        const items = listedItems(container);
+        const element = items.find(element => Number(element.dataset.id) === id);
+        if (!element) {
+            return;
+        }
+        element.remove();
+        if (items.length === 1 && !list.cursor) {
+            container.innerHTML = emptyHtml;
+        }
+    }
+    
+    return { load: loadPage, show: showFirstPage, insert: insertItem, remove: removeItem };
+}
+
+function renderReadingItem(reading) {
+    const date = new Date(reading.reading_date).toLocaleString();
+    
+    // Check if counter_data exists and is valid
+    let products = '';
+    if (reading.counter_data && typeof reading.counter_data === 'object') {
+        const entries = Object.entries(reading.counter_data);
+        if (entries.length > 0) {
+            products = entries
+                .map(([name, count]) => `${name}: ${count}`)
+                .join(', ');
         } else {
-            products = '<em style="color: #999;">Invalid data format</em>';
-            console.warn('Invalid counter_data for reading:', reading);
+            products = '<em style="color: #999;">No products recorded</em>';
         }
-        
-        return `
-            <div class="event-item">
-                <div style="flex: 1;">
-                    <strong>${date}</strong><br>
-                    <span style="color: #666;">${products}</span><br>
-                    <span style="color: #27ae60; font-weight: 600;">Cash: €${reading.cash_in_register.toFixed(2)}</span>
-                    ${reading.notes ? `<br><em style="color: #999;">${escapeHtml(reading.notes)}</em>` : ''}
-                </div>
-                <button class="btn btn-danger" onclick="deleteReading(${reading.id})" style="margin-left: 10px; padding: 5px 10px; font-size: 0.85em;">
-                    🗑️ Delete
-                </button>
+    } else {
+        products = '<em style="color: #999;">Invalid data format</em>';
+        console.warn('Invalid counter_data for reading:', reading);
+    }
+    
+    return `
+        <div class="event-item">
+            <div style="flex: 1;">
+                <strong>${date}</strong><br>
+                <span style="color: #666;">${products}</span><br>
+                <span style="color: #27ae60; font-weight: 600;">Cash: €${reading.cash_in_register.toFixed(2)}</span>
+                ${reading.notes ? `<br><em style="color: #999;">${escapeHtml(reading.notes)}</em>` : ''}
             </div>
-        `;
-    }).join('');
+            <button class="btn btn-danger" onclick="deleteReading(${reading.id})" style="margin-left: 10px; padding: 5px 10px; font-size: 0.85em;">
+                🗑️ Delete
+            </button>
+        </div>
+    `;
+}
+
+const readingsList = createHistoryList({
+    containerId: 'recent-readings',
+    path: '/api/counter-readings',
+    itemsKey: 'readings',
+    sortKey: 'reading_date',
+    renderItem: renderReadingItem,
+    emptyHtml: '<p style="color: #999; text-align: center; padding: 20px;">No readings yet</p>'
+});
+
+// Load recent counter readings (older ones load while scrolling)
+async function loadRecentReadings() {
+    await loadDashboard(['readings']);
 }
 
 // Delete a counter reading
@@ -1892,9 +2170,7 @@ async function deleteReading(readingId) {
         
         if (data.success) {
             alert('Reading deleted successfully');
-            loadRecentReadings();
-            loadCashRegisterBalance();
-            loadSalesStatistics();
+            loadDashboard(['readings', 'balance', 'statistics', 'chart']);
         } else {
             alert(data.error || 'Failed to delete reading');
         }
@@ -1904,27 +2180,6 @@ async function deleteReading(readingId) {
     }
 }
 
-// Load cash register balance
-async function loadCashRegisterBalance() {
-    try {
-        const url = currentConfigId 
-            ? `/api/cash-register/balance?config_id=${currentConfigId}`
-            : '/api/cash-register/balance';
-        
-        const response = await fetch(url, {
-            credentials: 'include'
-        });
-        
-        const data = await response.json();
-        
-        if (data.success) {
-            displayCashRegisterBalance(data);
-        }
-    } catch (error) {
-        console.error('Error loading cash register balance:', error);
-    }
-}
-
 function displayCashRegisterBalance(data) {
     document.getElementById('expected-cash').textContent = `€${data.expected_cash.toFixed(2)}`;
     document.getElementById('actual-cash').textContent = `€${data.actual_cash.toFixed(2)}`;
@@ -1980,9 +2235,7 @@ async function recordCashEvent() {
             document.getElementById('cash-event-description').value = '';
             
             // Reload ALL related data (balance, events, readings, counter inputs)
-            loadCashEvents();
-            loadCashRegisterBalance();
-            loadRecentReadings();
+            loadDashboard(['events', 'balance', 'readings']);
             populateCounterInputs();  // Update counter inputs with new cash amount
         } else {
             alert(data.error || 'Failed to record cash event');
@@ -1993,59 +2246,38 @@ async function recordCashEvent() {
     }
 }
 
-// Load cash events
-async function loadCashEvents() {
-    try {
-        const url = currentConfigId 
-            ? `/api/cash-register/events?config_id=${currentConfigId}`
-            : '/api/cash-register/events';
-        
-        const response = await fetch(url, {
-            credentials: 'include'
-        });
-        
-        const data = await response.json();
-        
-        if (data.success && data.events) {
-            displayCashEvents(data.events);
-        }
-    } catch (error) {
-        console.error('Error loading cash events:', error);
-    }
-}
-
-function displayCashEvents(events) {
-    const container = document.getElementById('cash-events-list');
+function renderCashEventItem(event) {
+    const date = new Date(event.event_date).toLocaleString();
+    const icon = event.event_type === 'withdrawal' ? '💸' : '💵';
     
-    if (events.length === 0) {
-        container.innerHTML = '<p style="color: #999; text-align: center; padding: 20px;">No events recorded</p>';
-        return;
-    }
-    
-    container.innerHTML = events.map(event => {
-        const date = new Date(event.event_date).toLocaleString();
-        const icon = event.event_type === 'withdrawal' ? '💸' : '💵';
-        
-        return `
-            <div class="event-item ${event.event_type}" style="display: flex; justify-content: space-between; align-items: center;">
-                <div style="flex: 1;">
-                    <strong>${icon} ${event.event_type.charAt(0).toUpperCase() + event.event_type.slice(1)}</strong><br>
-                    <span style="color: #666;">${date}</span><br>
-                    <em>${escapeHtml(event.description)}</em>
-                </div>
-                <div style="display: flex; align-items: center; gap: 10px;">
-                    <div style="font-size: 1.5em; font-weight: bold; color: ${event.event_type === 'withdrawal' ? '#e74c3c' : '#27ae60'};">
-                        ${event.event_type === 'withdrawal' ? '-' : '+'}€${event.amount.toFixed(2)}
-                    </div>
-                    <button class="btn btn-danger" onclick="deleteCashEvent(${event.id})" style="padding: 5px 10px; font-size: 0.85em;">
-                        🗑️ Delete
-                    </button>
+    return `
+        <div class="event-item ${event.event_type}" style="display: flex; justify-content: space-between; align-items: center;">
+            <div style="flex: 1;">
+                <strong>${icon} ${event.event_type.charAt(0).toUpperCase() + event.event_type.slice(1)}</strong><br>
+                <span style="color: #666;">${date}</span><br>
+                <em>${escapeHtml(event.description)}</em>
+            </div>
+            <div style="display: flex; align-items: center; gap: 10px;">
+                <div style="font-size: 1.5em; font-weight: bold; color: ${event.event_type === 'withdrawal' ? '#e74c3c' : '#27ae60'};">
+                    ${event.event_type === 'withdrawal' ? '-' : '+'}€${event.amount.toFixed(2)}
                 </div>
+                <button class="btn btn-danger" onclick="deleteCashEvent(${event.id})" style="padding: 5px 10px; font-size: 0.85em;">
+                    🗑️ Delete
+                </button>
             </div>
-        `;
-    }).join('');
+        </div>
+    `;
 }
 
+const cashEventsList = createHistoryList({
+    containerId: 'cash-events-list',
+    path: '/api/cash-register/events',
+    itemsKey: 'events',
+    sortKey: 'event_date',
+    renderItem: renderCashEventItem,
+    emptyHtml: '<p style="color: #999; text-align: center; padding: 20px;">No events recorded</p>'
+});
+
 // Delete cash event
 async function deleteCashEvent(eventId) {
     if (!confirm('Delete this cash event? This will also remove the associated auto-created reading.')) {
@@ -2064,9 +2296,7 @@ async function deleteCashEvent(eventId) {
             alert(data.message);
             
             // Reload all data
-            loadCashEvents();
-            loadCashRegisterBalance();
-            loadRecentReadings();
+            loadDashboard(['events', 'balance', 'readings']);
             populateCounterInputs();
         } else {
             alert(data.error || 'Failed to delete event');
@@ -2077,55 +2307,117 @@ async function deleteCashEvent(eventId) {
     }
 }
 
-// Load sales statistics
+// Load sales statistics and the trend chart
 async function loadSalesStatistics() {
-    const days = parseInt(document.getElementById('stats-period').value);
+    await loadDashboard(['statistics', 'chart']);
+}
+
+// Sales tab data comes from /api/dashboard: the sections a view needs are
+// fetched together, from one snapshot, in a single request
+async function loadDashboard(sections) {
+    followLiveUpdates();
+    
+    const params = new URLSearchParams({ sections: sections.join(',') });
+    if (sections.includes('statistics') || sections.includes('chart')) {
+        params.set('days', parseInt(document.getElementById('stats-period').value));
+    }
+    if (currentConfigId) {
+        params.set('config_id', currentConfigId);
+    }
     
     try {
-        const url = currentConfigId 
-            ? `/api/sales-statistics?days=${days}&config_id=${currentConfigId}`
-            : `/api/sales-statistics?days=${days}`;
-        
-        const response = await fetch(url, {
-            credentials: 'include'
-        });
-        
-        const data = await response.json();
+        const data = await fetchJSON(`/api/dashboard?${params}`);
+        if (!data.success) {
+            return;
+        }
         
-        if (data.success && data.statistics) {
+        if (data.readings) {
+            readingsList.show(data.readings);
+        }
+        if (data.balance) {
+            displayCashRegisterBalance(data.balance);
+        }
+        if (data.events) {
+            cashEventsList.show(data.events);
+        }
+        if (data.statistics) {
             displaySalesStatistics(data.statistics);
         }
-        
-        // Also load chart data
-        loadSalesTrendChart(days);
+        if (data.chart) {
+            renderSalesTrendChart(data.chart);
+        }
     } catch (error) {
-        console.error('Error loading sales statistics:', error);
+        console.error('Error loading dashboard:', error);
     }
 }
 
-// Global variable to store chart instance
-let salesTrendChart = null;
+// Live updates: while a configuration is selected, its changes by anyone it
+// is shared with arrive as server-sent events and are patched into the views
+let liveUpdates = null;  // { configId, source }
+let liveStatisticsTimer = null;
 
-async function loadSalesTrendChart(days) {
-    try {
-        const url = currentConfigId 
-            ? `/api/sales-trend-chart?days=${days}&config_id=${currentConfigId}`
-            : `/api/sales-trend-chart?days=${days}`;
-        
-        const response = await fetch(url, {
-            credentials: 'include'
-        });
-        
-        const data = await response.json();
-        
-        if (data.success && data.chart_data) {
-            renderSalesTrendChart(data.chart_data);
+function followLiveUpdates() {
+    if (liveUpdates && liveUpdates.configId === currentConfigId) {
+        return;
+    }
+    if (liveUpdates) {
+        liveUpdates.source.close();
+        liveUpdates = null;
+    }
+    if (!currentConfigId || typeof EventSource === 'undefined') {
+        return;
+    }
+    
+    const configId = currentConfigId;
+    const source = new EventSource(`/api/configs/${configId}/stream`);
+    const on = (kind, apply) => source.addEventListener(kind, event => {
+        if (currentConfigId === configId) {
+            apply(JSON.parse(event.data));
         }
-    } catch (error) {
-        console.error('Error loading sales trend chart:', error);
+    });
+    
+    on('reading_added', reading => {
+        readingsList.insert(reading);
+        refreshLiveStatistics();
+    });
+    on('reading_deleted', change => {
+        readingsList.remove(change.id);
+        refreshLiveStatistics();
+    });
+    on('readings_imported', () => {
+        loadDashboard(['readings']);
+        refreshLiveStatistics();
+    });
+    on('cash_event_added', cashEvent => cashEventsList.insert(cashEvent));
+    on('cash_event_deleted', change => cashEventsList.remove(change.id));
+    on('balance', balance => displayCashRegisterBalance(balance));
+    on('config_saved', () => loadConfigurations());
+    on('config_deleted', () => {
+        source.close();
+        loadConfigurations();
+    });
+    on('reset', () => {
+        loadDashboard(['readings', 'balance', 'events']);
+        refreshLiveStatistics();
+    });
+    
+    liveUpdates = { configId: configId, source: source };
+}
+
+// Statistics are aggregates, so they are refetched (once per burst of changes)
+// rather than patched, and only while they are on screen
+function refreshLiveStatistics() {
+    const statisticsTab = document.getElementById('tab-statistics');
+    if (!statisticsTab || !statisticsTab.classList.contains('active')) {
+        return;
     }
+    clearTimeout(liveStatisticsTimer);
+    liveStatisticsTimer = setTimeout(loadSalesStatistics, 1000);
 }
 
+// Global variable to store chart instance
+let salesTrendChart = null;
+
 function renderSalesTrendChart(chartData) {
     const ctx = document.getElementById('sales-trend-chart');
     if (!ctx) return;
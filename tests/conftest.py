@@ -0,0 +1,57 @@
+import json
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# The app opens its database at import, so point it at a scratch directory first
+os.environ['DATABASE_DIR'] = tempfile.mkdtemp(prefix='coffee-calculator-tests-')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as coffee_app  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    """A test client logged in as a fresh user"""
+    client = coffee_app.app.test_client()
+    email = f'{uuid.uuid4().hex}@example.com'
+    credentials = {'email': email, 'password': 'secret123', 'name': 'Tester'}
+    client.post('/api/register', json=credentials)
+    client.post('/api/login', json=credentials)
+    return client
+
+
+@pytest.fixture
+def config_id(client):
+    """A new configuration of the logged-in user"""
+    response = client.post('/api/configs', json={
+        'name': f'Config {uuid.uuid4().hex[:8]}',
+        'ingredients': {},
+        'drinks': [],
+        'cleaning_cost': 0,
+        'products_per_day': 1
+    })
+    return response.get_json()['id']
+
+
+def submit_reading(client, config_id, latte, cash, reading_date=None):
+    body = {
+        'counter_data': {'Latte': latte},
+        'cash_in_register': cash,
+        'config_id': config_id,
+        'product_prices': {'Latte': 2.0}
+    }
+    if reading_date:
+        body['reading_date'] = reading_date
+    data = client.post('/api/counter-readings', json=body).get_json()
+    assert data['success'], data
+    return data['reading_id']
+
+
+def get_json(client, url):
+    data = client.get(url).get_json()
+    assert data['success'], data
+    return data
@@ -0,0 +1,69 @@
+"""The hot queries are answered from the indexes added by the migrations, never by a table scan"""
+
+import re
+
+import pytest
+
+from conftest import coffee_app
+
+HOT_QUERIES = [
+    # Latest/first reading of a config or of a user's readings without one
+    ('counter_readings', '''
+        SELECT id, reading_date, cash_in_register
+        FROM counter_readings
+        WHERE config_id = ?
+        ORDER BY reading_date DESC, id DESC
+        LIMIT 1
+    ''', (1,)),
+    ('counter_readings', '''
+        SELECT id, reading_date, cash_in_register
+        FROM counter_readings
+        WHERE user_id = ? AND config_id IS NULL
+        ORDER BY reading_date ASC, id ASC
+        LIMIT 1
+    ''', (1,)),
+    # A page of reading history
+    ('counter_readings', '''
+        SELECT id, reading_date, cash_in_register, notes, config_id
+        FROM counter_readings
+        WHERE config_id = ? AND (reading_date, id) < (?, ?)
+        ORDER BY reading_date DESC, id DESC
+        LIMIT 50
+    ''', (1, '2024-01-01T00:00:00', 1)),
+    # Revenue recorded into a reading
+    ('sales_records', '''
+        SELECT COALESCE(SUM(total_revenue), 0), COALESCE(SUM(quantity_sold), 0)
+        FROM sales_records
+        WHERE end_reading_id = ?
+    ''', (1,)),
+    # Sales of a config in a period
+    ('sales_records', '''
+        SELECT product_name, SUM(quantity_sold), SUM(total_revenue), AVG(unit_price)
+        FROM sales_records
+        WHERE config_id = ? AND created_at >= ? AND created_at < ?
+        GROUP BY product_name
+    ''', (1, '2024-01-01', '2024-02-01')),
+    # Cash events of a config in a period, and its withdrawal/deposit totals
+    ('cash_register_events', '''
+        SELECT id, event_date, event_type, amount
+        FROM cash_register_events
+        WHERE config_id = ? AND event_date >= ?
+        ORDER BY event_date
+    ''', (1, '2024-01-01')),
+    ('cash_register_events', '''
+        SELECT
+            COALESCE(SUM(CASE WHEN event_type = 'withdrawal' THEN amount ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN event_type = 'deposit' THEN amount ELSE 0 END), 0)
+        FROM cash_register_events
+        WHERE config_id = ?
+    ''', (1,)),
+]
+
+
+@pytest.mark.parametrize('table, query, params', HOT_QUERIES)
+def test_hot_query_uses_index(table, query, params):
+    with coffee_app.db_pool.connection() as conn:
+        details = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + query, params)]
+
+    assert any(re.match(rf'SEARCH {table} USING (COVERING )?INDEX ', detail) for detail in details), details
+    assert not any(detail.startswith(f'SCAN {table}') for detail in details), details
@@ -0,0 +1,63 @@
+"""Sales, rollups and the cash ledger follow the readings' (reading_date, id) order"""
+
+from conftest import get_json, submit_reading
+
+
+def balance(client, config_id):
+    return get_json(client, f'/api/cash-register/balance?config_id={config_id}')
+
+
+def chart_totals(client, config_id):
+    chart = get_json(client, f'/api/sales-trend-chart?config_id={config_id}&days=100000')['chart_data']
+    return [point['cumulative_revenue'] for point in chart]
+
+
+def test_backdated_reading_keeps_balance_and_chart_totals(client, config_id):
+    submit_reading(client, config_id, 0, 100, '2024-01-01T09:00')
+    submit_reading(client, config_id, 10, 120, '2024-01-03T09:00')
+    # Entered last, dated between the other two
+    submit_reading(client, config_id, 4, 108, '2024-01-02T09:00')
+
+    result = balance(client, config_id)
+    assert result['total_sales'] == 20.0
+    assert result['actual_cash'] == 120.0
+    assert result['difference'] == 0.0
+    assert chart_totals(client, config_id) == [0.0, 8.0, 20.0]
+
+
+def test_deleting_backdated_reading_restores_totals(client, config_id):
+    submit_reading(client, config_id, 0, 100, '2024-01-01T09:00')
+    submit_reading(client, config_id, 10, 120, '2024-01-03T09:00')
+    backdated = submit_reading(client, config_id, 4, 108, '2024-01-02T09:00')
+
+    assert client.delete(f'/api/counter-readings/{backdated}').get_json()['success']
+
+    result = balance(client, config_id)
+    assert result['total_sales'] == 20.0
+    assert result['difference'] == 0.0
+    assert chart_totals(client, config_id) == [0.0, 20.0]
+
+
+def test_cash_event_after_same_day_reading(client, config_id):
+    submit_reading(client, config_id, 0, 100, '2024-01-01T09:00')
+    # Dated now, like a reading entered without a custom date
+    submit_reading(client, config_id, 10, 120)
+
+    response = client.post('/api/cash-register/events', json={
+        'event_type': 'withdrawal',
+        'amount': 50,
+        'description': 'Bank deposit',
+        'config_id': config_id
+    })
+    assert response.get_json()['success']
+
+    result = balance(client, config_id)
+    assert result['total_sales'] == 20.0
+    assert result['withdrawals'] == 50.0
+    assert result['actual_cash'] == 70.0
+    assert result['expected_cash'] == 70.0
+    assert result['difference'] == 0.0
+
+    readings = get_json(client, f'/api/counter-readings?config_id={config_id}')['readings']
+    assert readings[0]['notes'].startswith('Auto-updated after withdrawal')
+    assert readings[0]['cash_in_register'] == 70.0
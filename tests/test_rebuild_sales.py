@@ -0,0 +1,36 @@
+"""The rebuild-sales repair command restores sales and rollups in reading date order"""
+
+from conftest import coffee_app, get_json, submit_reading
+
+
+def test_rebuild_sales_with_backdated_reading(client, config_id):
+    submit_reading(client, config_id, 0, 100, '2024-01-01T09:00')
+    submit_reading(client, config_id, 10, 120, '2024-01-03T09:00')
+    submit_reading(client, config_id, 4, 108, '2024-01-02T09:00')
+
+    # Damage the sales and leave running totals summed in reading id order,
+    # as older versions stored them
+    with coffee_app.db_pool.connection() as conn:
+        conn.execute('UPDATE sales_records SET quantity_sold = 1, total_revenue = 2 WHERE config_id = ?',
+                     (config_id,))
+        conn.execute('''
+            UPDATE reading_revenue
+            SET cumulative_revenue = (
+                SELECT SUM(earlier.revenue) FROM reading_revenue earlier
+                WHERE earlier.config_id = reading_revenue.config_id
+                AND earlier.reading_id <= reading_revenue.reading_id
+            )
+            WHERE config_id = ?
+        ''', (config_id,))
+        conn.commit()
+
+    result = coffee_app.app.test_cli_runner().invoke(args=['rebuild-sales', '--workers', '1'])
+    assert result.exit_code == 0, result.output
+
+    balance = get_json(client, f'/api/cash-register/balance?config_id={config_id}')
+    assert balance['total_sales'] == 20.0
+    assert balance['actual_cash'] == 120.0
+    assert balance['difference'] == 0.0
+
+    chart = get_json(client, f'/api/sales-trend-chart?config_id={config_id}&days=100000')['chart_data']
+    assert [point['cumulative_revenue'] for point in chart] == [0.0, 8.0, 20.0]
@@ -0,0 +1,84 @@
+"""The windowed sales trend chart query against the per-reading queries it replaced"""
+
+import json
+import uuid
+
+from conftest import coffee_app, get_json, submit_reading
+
+
+def chart(client, config_id):
+    return get_json(client, f'/api/sales-trend-chart?config_id={config_id}&days=30')['chart_data']
+
+
+def old_chart(config_id):
+    """chart_data as the old implementation built it, two queries per reading"""
+    with coffee_app.db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT cr.id, cr.reading_date, cr.cash_in_register, cr.counter_data
+            FROM counter_readings cr
+            WHERE cr.config_id = ? AND cr.reading_date >= datetime('now', '-' || ? || ' days')
+            ORDER BY cr.reading_date ASC
+        ''', (config_id, 30))
+        chart_data = []
+        for reading_id, reading_date, cash_in_register, counter_data in cursor.fetchall():
+            cursor.execute('SELECT COALESCE(SUM(total_revenue), 0) FROM sales_records WHERE end_reading_id = ?',
+                           (reading_id,))
+            revenue = cursor.fetchone()[0]
+            cursor.execute('SELECT COALESCE(SUM(total_revenue), 0) FROM sales_records WHERE end_reading_id <= ?',
+                           (reading_id,))
+            cumulative_revenue = cursor.fetchone()[0]
+            chart_data.append({
+                'date': reading_date,
+                'products_sold': sum(json.loads(counter_data).values()),
+                'revenue': round(revenue, 2),
+                'cumulative_revenue': round(cumulative_revenue, 2),
+                'actual_cash': round(cash_in_register, 2)
+            })
+        return chart_data
+
+
+def revenue_before(config_id):
+    """Revenue of every sales record before the config's first reading (other tests' data)"""
+    with coffee_app.db_pool.connection() as conn:
+        return conn.execute('''
+            SELECT COALESCE(SUM(total_revenue), 0) FROM sales_records
+            WHERE end_reading_id < (SELECT MIN(id) FROM counter_readings WHERE config_id = ?)
+        ''', (config_id,)).fetchone()[0]
+
+
+def new_config(client):
+    return client.post('/api/configs', json={
+        'name': f'Config {uuid.uuid4().hex[:8]}', 'ingredients': {}, 'drinks': [],
+        'cleaning_cost': 0, 'products_per_day': 1
+    }).get_json()['id']
+
+
+def test_chart_matches_per_reading_queries(client, config_id):
+    latte = 0
+    for number in range(40):
+        latte += (number * 7) % 5
+        submit_reading(client, config_id, latte, 100 + number * 1.5)
+
+    # The old running total summed every sales record up to the reading,
+    # including those of readings recorded before this config existed
+    offset = revenue_before(config_id)
+    expected = [dict(point, cumulative_revenue=round(point['cumulative_revenue'] - offset, 2))
+                for point in old_chart(config_id)]
+    assert chart(client, config_id) == expected
+
+
+def test_chart_running_total_is_scoped_to_its_config(client):
+    first, second = new_config(client), new_config(client)
+    for number in range(6):
+        submit_reading(client, first, number * 2, 100)
+        submit_reading(client, second, number * 3, 100)
+
+    cumulative = [point['cumulative_revenue'] for point in chart(client, first)]
+    # 2 lattes at €2 per interval, none of the other config's €6
+    assert cumulative == [0.0, 4.0, 8.0, 12.0, 16.0, 20.0]
+
+    # The per-reading queries mixed in the interleaved config's sales
+    offset = revenue_before(first)
+    old_cumulative = [round(point['cumulative_revenue'] - offset, 2) for point in old_chart(first)]
+    assert old_cumulative == [0.0, 4.0, 14.0, 24.0, 34.0, 44.0]